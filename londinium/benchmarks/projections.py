@@ -0,0 +1,52 @@
+""" Throughput of the National Grid projections on one core.
+
+Run from the repository root with ``python benchmarks/projections.py``. Each
+projection is timed forwards and inverse over the same random points around
+London, best of several runs, and reported in points per second.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from londinium.geodesy.projections import NationalGrid, WGS84NationalGrid, FastNationalGrid
+
+
+BBOX = [[-0.54, 0.28], [51.3, 51.7]]
+
+
+def rate(func, points, repeats):
+    """ Points per second of the best of ``repeats`` runs. """
+    func(points[:1000])
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(points)
+        best = min(best, time.perf_counter() - start)
+    return len(points) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', type=int, default=2_000_000, help='Points per run.')
+    parser.add_argument('--repeats', type=int, default=5, help='Runs of each, keeping the best.')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    lon_lat = np.c_[rng.uniform(*BBOX[0], args.n), rng.uniform(*BBOX[1], args.n)]
+
+    print('{:<20}{:>14}{:>14}'.format('projection', 'll_to_en', 'en_to_ll'))
+    for projection in (NationalGrid(), WGS84NationalGrid(), FastNationalGrid()):
+        en = projection.ll_to_en(lon_lat)
+        print('{:<20}{:>14.2e}{:>14.2e}'.format(
+            type(projection).__name__,
+            rate(projection.ll_to_en, lon_lat, args.repeats),
+            rate(projection.en_to_ll, en, args.repeats)))
+
+
+if __name__ == '__main__':
+    main()
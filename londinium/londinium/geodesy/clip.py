@@ -0,0 +1,69 @@
+""" Clipping of polylines in ragged arrays to a rectangle. """
+
+import numpy as np
+
+
+def clip(coordinates, offsets, bbox):
+    """ Parts of polylines inside ``bbox`` = ``[[x_min, x_max], [y_min, y_max]]``.
+
+    Every segment is clipped at once by Liang-Barsky. Runs of visible
+    segments that meet at an uncut vertex are joined back into one piece, so
+    a polyline that leaves and re-enters the box becomes several pieces.
+
+    Returns:
+        coordinates:    (M', 2) flat coordinates of the pieces.
+        offsets:        (P + 1,) offsets of the pieces.
+        pieces:         (P,) index of the input polyline of each piece.
+        sources:        (M',) index of the input vertex of each output vertex,
+                        or -1 where it was made by cutting a segment, so that
+                        per-vertex values can follow the clip.
+    """
+
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    counts = np.diff(offsets)
+    feature = np.repeat(np.arange(len(counts)), counts)
+
+    # A segment from every vertex but the last of each polyline, and a
+    # zero-length one for each single vertex
+    single = (counts == 1)[feature]
+    last = np.zeros(len(coordinates), dtype=bool)
+    last[offsets[1:][counts > 0] - 1] = True
+    a = np.flatnonzero(~last | single)
+    b = a + ~single[a]
+
+    start, d = coordinates[a], coordinates[b] - coordinates[a]
+    (x0, x1), (y0, y1) = bbox
+    t0, t1 = np.zeros(len(a)), np.ones(len(a))
+    visible = np.ones(len(a), dtype=bool)
+    for p, q in ((-d[:, 0], start[:, 0] - x0), (d[:, 0], x1 - start[:, 0]),
+                 (-d[:, 1], start[:, 1] - y0), (d[:, 1], y1 - start[:, 1])):
+        ratio = np.divide(q, p, out=np.zeros_like(q), where=p != 0)
+        t0 = np.where(p < 0, np.maximum(t0, ratio), t0)
+        t1 = np.where(p > 0, np.minimum(t1, ratio), t1)
+        visible &= (p != 0) | (q >= 0)
+    visible &= t0 <= t1
+
+    # A visible segment continues the one before if they meet uncut
+    joined = np.zeros(len(a), dtype=bool)
+    joined[1:] = (visible[1:] & visible[:-1] & (b[:-1] == a[1:])
+                  & (t1[:-1] == 1) & (t0[1:] == 0))
+    first = visible & ~joined
+    final = visible & ~np.r_[joined[1:], False]
+
+    # Each visible segment gives its start point, and the end of a piece
+    # its end point too
+    seg = np.flatnonzero(visible)
+    ends = final[seg]
+    n_out = len(seg) + ends.sum()
+    position = np.arange(len(seg)) + np.cumsum(ends) - ends
+
+    out = np.empty((n_out, 2))
+    sources = np.empty(n_out, dtype=np.int64)
+    out[position] = start[seg] + t0[seg, None] * d[seg]
+    sources[position] = np.where(t0[seg] == 0, a[seg], -1)
+    out[position[ends] + 1] = start[seg[ends]] + t1[seg[ends], None] * d[seg[ends]]
+    sources[position[ends] + 1] = np.where(t1[seg[ends]] == 1, b[seg[ends]], -1)
+
+    piece_offsets = np.r_[position[first[seg]], n_out].astype(np.int64)
+    return out, piece_offsets, feature[a[first]], sources
@@ -4,11 +4,9 @@ import numpy as np
 
 
 def make_canonical_ll(lon_lat):
-    """ Get into standard form, as 2D array in radians. """
+    """ Get into standard form, as 2D array in radians. Heights are dropped. """
 
-    ll = np.reshape(lon_lat, (-1, 2))
-    lon = ll[:, 0] * np.pi/180
-    lat = ll[:, 1] * np.pi/180
+    lon, lat, _ = make_canonical_llh(lon_lat)
 
     return lon, lat
 
@@ -19,3 +17,20 @@ def make_canonical_en(easting_northing):
     en = np.reshape(easting_northing, (-1, 2))
     easting = en[:, 0]
     northing = en[:, 1]
+
+    return easting, northing
+
+
+def make_canonical_llh(lon_lat_height):
+    """ Get (N, 2) or (N, 3) coordinates into radians and heights.
+
+    Heights are zero if none are given.
+    """
+
+    llh = np.asarray(lon_lat_height, dtype=np.float64)
+    llh = np.reshape(llh, (-1, 3 if llh.ndim and llh.shape[-1] == 3 else 2))
+    lon = llh[:, 0] * np.pi/180
+    lat = llh[:, 1] * np.pi/180
+    height = llh[:, 2] if llh.shape[1] == 3 else np.zeros(len(llh))
+
+    return lon, lat, height
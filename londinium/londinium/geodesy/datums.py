@@ -0,0 +1,66 @@
+""" Transformation of coordinates between geodetic datums. """
+
+import numpy as np
+
+from .ellipsoids import WGS84, Airy1830, HelmertTransformation
+
+
+ARCSECOND = np.pi / (180 * 3600)
+
+
+class DatumTransformation(object):
+    """ Move ellipsoidal coordinates from one datum to another.
+
+    Coordinates pass through geocentric cartesian coordinates on the source
+    ellipsoid, a Helmert transformation, and back to ellipsoidal coordinates
+    on the target ellipsoid. Each step takes whole arrays at once.
+
+    Args:
+        source:     :class:`~londinium.geodesy.ellipsoids.Ellipsoid` of the input.
+        target:     :class:`~londinium.geodesy.ellipsoids.Ellipsoid` of the output.
+        helmert:    :class:`~londinium.geodesy.ellipsoids.HelmertTransformation`
+                    from source to target cartesian coordinates.
+    """
+
+    def __init__(self, source, target, helmert):
+        self.source = source
+        self.target = target
+        self.helmert = helmert
+
+    def _key(self):
+        """ Parameters identifying the transformation. """
+        return ((self.source.a, self.source.b, self.target.a, self.target.b)
+                + tuple(self.helmert._t.tolist()) + tuple(self.helmert._r.ravel().tolist()))
+
+    def forward(self, lon_lat):
+        """ Source to target datum, for (N, 2) or (N, 3) coordinates.
+
+        Heights are returned only if given, and are taken as zero otherwise.
+        """
+        xyz = self.helmert.forward(self.source.ll_to_xyz(lon_lat))
+        return self.target.xyz_to_ll(xyz, height=_has_height(lon_lat))
+
+    def backward(self, lon_lat):
+        """ Target to source datum, the inverse of :meth:`forward`. """
+        xyz = self.helmert.backward(self.target.ll_to_xyz(lon_lat))
+        return self.source.xyz_to_ll(xyz, height=_has_height(lon_lat))
+
+
+def _has_height(lon_lat):
+    return np.shape(lon_lat)[-1:] == (3,)
+
+
+# Ordnance Survey parameters, good to about 5 metres across Great Britain
+WGS84_TO_OSGB36 = DatumTransformation(
+    source=WGS84(),
+    target=Airy1830(),
+    helmert=HelmertTransformation(
+        t_x=-446.448,
+        t_y=125.157,
+        t_z=-542.060,
+        s=20.4894e-6,
+        r_x=-0.1502 * ARCSECOND,
+        r_y=-0.2470 * ARCSECOND,
+        r_z=-0.8421 * ARCSECOND,
+    )
+)
@@ -1,7 +1,7 @@
 """ Interconversion between different coordinate systems. """
 
 import numpy as np
-from .coordinates import make_canonical_ll
+from .coordinates import make_canonical_llh
 
 
 class Ellipsoid(object):
@@ -22,39 +22,64 @@ class Ellipsoid(object):
 
 
     def ll_to_xyz(self, lon_lat):
-        """ Convert ellipsoidal coordinates to geocentric cartesian coordinates. """
+        """ Convert ellipsoidal coordinates to geocentric cartesian coordinates.
 
-        lon, lat = make_canonical_ll(lon_lat)
+        Takes (N, 2) longitudes and latitudes in degrees, or (N, 3) with
+        heights above the ellipsoid in metres.
+        """
+
+        lon, lat, height = make_canonical_llh(lon_lat)
         s, c = np.sin(lat), np.cos(lat)
 
         ellipsoid_radius = self.a / np.sqrt(1 - self.e2 * s**2)
 
-        x = (ellipsoid_radius) * np.cos(lon) * c
-        y = (ellipsoid_radius) * np.sin(lon) * c
-        z = ((1 - self.e2) * ellipsoid_radius) * s
+        x = (ellipsoid_radius + height) * np.cos(lon) * c
+        y = (ellipsoid_radius + height) * np.sin(lon) * c
+        z = ((1 - self.e2) * ellipsoid_radius + height) * s
 
         return np.stack((x,y,z), axis=1)
 
 
-    def xyz_to_ll(self, xyz):
-        """ Convert geocentric cartesian coordinates to ellipsoidal coordinates. """
+    def xyz_to_ll(self, xyz, height=False, tol=1e-12, max_iter=10):
+        """ Convert geocentric cartesian coordinates to ellipsoidal coordinates.
+
+        Latitude starts from Bowring's formula and is refined by fixed-point
+        iteration, each point only until its own update is below ``tol``
+        radians. Returns (N, 2) longitudes and
+        latitudes in degrees, or (N, 3) with heights if ``height``.
+        """
 
-        x,y,z = xyz[:0], xyz[:,1], xyz[:,2]
+        xyz = np.reshape(xyz, (-1, 3))
+        x, y, z = xyz[:,0], xyz[:,1], xyz[:,2]
 
-        horizontal_radius = np.linalg.norm(xyz[:,0:2], axis=1)
+        horizontal_radius = np.hypot(x, y)
 
         lon = np.arctan2(y, x)
-        lat = np.arctan2(z, horizontal_radius*(1-self.e2))
 
-        diff = np.ones_like(lat)
-        while np.mean(np.abs(diff)) > 10**-6:
-            s = np.sin(lat)
+        # Bowring's estimate, already within 1e-9 radians near the surface
+        theta = np.arctan2(z * self.a, horizontal_radius * self.b)
+        lat = np.arctan2(z + self.e2 / (1 - self.e2) * self.b * np.sin(theta)**3,
+                         horizontal_radius - self.e2 * self.a * np.cos(theta)**3)
+
+        active = np.arange(len(lat))
+        for _ in range(max_iter):
+            s = np.sin(lat[active])
             ellipsoid_radius = self.a / np.sqrt(1 - self.e2 * s**2)
-            new_lat = np.arctan2(z + self.e2 * ellipsoid_radius * s, horizontal_radius)
-            diff = np.diff(new_lat, lat)
-            lat = new_lat
+            new_lat = np.arctan2(z[active] + self.e2 * ellipsoid_radius * s,
+                                 horizontal_radius[active])
+            moving = np.abs(new_lat - lat[active]) > tol
+            lat[active] = new_lat
+            active = active[moving]
+            if not len(active):
+                break
+
+        ll = [lon * 180/np.pi, lat * 180/np.pi]
+        if height:
+            s, c = np.sin(lat), np.cos(lat)
+            ellipsoid_radius = self.a / np.sqrt(1 - self.e2 * s**2)
+            ll.append(horizontal_radius * c + z * s - self.a**2 / ellipsoid_radius)
 
-        return np.stack((lon * 180/np.pi, lat * 180/np.pi), axis=1)
+        return np.stack(ll, axis=1)
 
 
 class WGS84(Ellipsoid):
@@ -70,7 +95,13 @@ class Airy1830(Ellipsoid):
 
 
 class HelmertTransformation(object):
-    """ Affine transformation between datum geocentric cartesian coordinates. """
+    """ Affine transformation between datum geocentric cartesian coordinates.
+
+    Args:
+        t_x, t_y, t_z:  Translation in metres.
+        s:              Scale change, as a fraction (ppm * 1e-6).
+        r_x, r_y, r_z:  Small rotations in radians.
+    """
 
     def __init__(self, t_x=0, t_y=0, t_z=0, s=0, r_x=0, r_y=0, r_z=0):
         self._t = np.array([t_x, t_y, t_z])
@@ -79,7 +110,9 @@ class HelmertTransformation(object):
                             [-r_y, r_x, 1+s]])
 
     def forward(self, xyz):
-        return np.matmul(self._r, xyz) + self._t
+        """ Transform (N, 3) cartesian coordinates. """
+        return np.matmul(np.reshape(xyz, (-1, 3)), self._r.T) + self._t
 
     def backward(self, xyz):
-        return np.matmul(np.linalg.inv(self._r), np.diff(xyz, self._t))
+        """ Exact inverse of :meth:`forward`. """
+        return np.matmul(np.reshape(xyz, (-1, 3)) - self._t, np.linalg.inv(self._r).T)
@@ -1,12 +1,21 @@
 """ Interconversion between different coordinate systems. """
 
 import numpy as np
-from .coordinates import make_canonical_ll
+from .coordinates import make_canonical_ll, make_canonical_en
 from .ellipsoids import WGS84, Airy1830
+from .datums import WGS84_TO_OSGB36
+from ..util.ragged import flatten, split
 
 
 class TransverseMercator(object):
-    """ A Transverse Mercator projection. """
+    """ A Transverse Mercator projection.
+
+    Arrays are projected in blocks of ``chunk_size`` points, small enough for
+    the intermediate arrays to stay in cache, which is about twice as fast as
+    one pass over millions of points.
+    """
+
+    chunk_size = 2**14
 
     def __init__(self, lon0, lat0, e0, n0, f0, ellipsoid):
         self.lon0 = lon0 * np.pi/180
@@ -16,60 +25,104 @@ class TransverseMercator(object):
         self.f0 = f0
         self.ell = ellipsoid
 
+    def _key(self):
+        """ Parameters identifying the projection, for comparison and hashing. """
+        return (type(self).__name__, self.lon0, self.lat0, self.e0, self.n0, self.f0,
+                self.ell.a, self.ell.b)
+
+    def __eq__(self, other):
+        return isinstance(other, TransverseMercator) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
 
-    def _m(self, lat):
-        """ Intermediate calculation for projections. """
-        lat_, lat_plus = lat-self.lat0, lat+self.lat0
+
+    def _m(self, lat, s=None, c=None):
+        """ Intermediate calculation for projections.
+
+        Multiple-angle terms come from the sine ``s`` and cosine ``c`` of
+        ``lat``, passed in if already known, by angle-sum identities.
+        """
+
+        if s is None:
+            s, c = np.sin(lat), np.cos(lat)
+        s0, c0 = np.sin(self.lat0), np.cos(self.lat0)
+        lat_ = lat-self.lat0
+        s_, c_ = s*c0 - c*s0, c*c0 + s*s0
+        cp = c*c0 - s*s0
 
         n_pow = [1, self.ell.n, self.ell.n**2, self.ell.n**3]
 
         return self.ell.b * self.f0 * (
              np.dot([1, 1,  5/4,   5/4], n_pow) * lat_
-            -np.dot([0, 3,    3,  21/8], n_pow) * np.sin(  lat_) * np.cos(  lat_plus)
-            +np.dot([0, 0, 15/8,  15/8], n_pow) * np.sin(2*lat_) * np.cos(2*lat_plus)
-            -np.dot([0, 0,    0, 35/24], n_pow) * np.sin(3*lat_) * np.cos(3*lat_plus)
+            -np.dot([0, 3,    3,  21/8], n_pow) * s_ * cp
+            +np.dot([0, 0, 15/8,  15/8], n_pow) * (2*s_*c_) * (2*cp*cp - 1)
+            -np.dot([0, 0,    0, 35/24], n_pow) * s_*(3 - 4*s_*s_) * cp*(4*cp*cp - 3)
         )
 
 
+    def _chunks(self, n):
+        for lo in range(0, n, self.chunk_size):
+            yield slice(lo, min(lo + self.chunk_size, n))
+
+
     def ll_to_en(self, lon_lat):
         """ Project from ellipsoid coordinates to plane easting and northing. """
 
         lon, lat = make_canonical_ll(lon_lat)
-        m = self._m(lat)
+        en = np.empty((len(lon), 2))
+        for s in self._chunks(len(lon)):
+            en[s] = self._ll_to_en(lon[s], lat[s])
+        return en
 
+    def _ll_to_en(self, lon, lat):
         s, c = np.sin(lat), np.cos(lat)
+        m = self._m(lat, s, c)
+
+        c2 = c*c
         t2 = (s/c)**2
-        nu  = self.ell.a * self.f0 * (1 - self.ell.e2 * s**2)**-0.5
+        nu  = self.ell.a * self.f0 / np.sqrt(1 - self.ell.e2 * s**2)
         eta2 = (1 - self.ell.e2 * s**2) / (1 - self.ell.e2) - 1
 
-        e_coeffs = [(nu) * c,
-                    (nu/6) * c**3 * (1 - t2 + eta2),
-                    (nu/120) * c**5 * (5 - 18*t2 + t2**2 + 14*eta2 - 58*t2*eta2)]
-
-        n_coeffs = [(nu/2) * s * c,
-                    (nu/24) * s * c**3 * (5 - t2 + 9*eta2),
-                    (nu/720) * s * c**5 * (61 - 58*t2 + t2**2)]
-
         lon_ = lon - self.lon0
-        odd_pow, even_pow = [lon_, lon_**3, lon_**5], [lon_**2, lon_**4, lon_**6]
+        l2 = lon_**2
 
-        e_rel = np.sum(np.multiply(e_coeffs, odd_pow), axis=0)
-        n_rel = np.sum(np.multiply(n_coeffs, even_pow), axis=0) + m
+        # Both series in powers of lon_**2, by Horner's rule
+        e_rel = nu * c * lon_ * (1 + l2 * c2 * (
+            (1 - t2 + eta2) / 6
+            + l2 * c2 * (5 - 18*t2 + t2**2 + 14*eta2 - 58*t2*eta2) / 120))
+        n_rel = m + nu * s * c * l2 * (1/2 + l2 * c2 * (
+            (5 - t2 + 9*eta2) / 24
+            + l2 * c2 * (61 - 58*t2 + t2**2) / 720))
 
         return np.stack((e_rel + self.e0, n_rel + self.n0), axis=1)
 
 
-    def en_to_ll(self, easting_northing):
-        """ Project from plane easting and northing to ellipsoid coordinates. """
+    def en_to_ll(self, easting_northing, tol=1e-5, max_iter=20):
+        """ Project from plane easting and northing to ellipsoid coordinates.
+
+        The latitude of each point's northing is found by iterating until its
+        own meridional arc is within ``tol`` metres. Returns degrees.
+        """
 
         e, n = make_canonical_en(easting_northing)
+        ll = np.empty((len(e), 2))
+        for s in self._chunks(len(e)):
+            ll[s] = self._en_to_ll(e[s], n[s], tol, max_iter)
+        return ll
+
+    def _en_to_ll(self, e, n, tol, max_iter):
         n_ = n-self.n0
         lat = self.lat0 + n_ / (self.ell.a * self.f0)
-        m = self._m(lat)
 
-        while np.mean(np.abs(n_ - m)) > 10**-5:
-            lat = lat + (n_ - m) / (self.ell.a * self.f0)
-            m = self._m(lat)
+        active = np.arange(len(lat))
+        for _ in range(max_iter):
+            residual = n_[active] - self._m(lat[active])
+            moving = np.abs(residual) > tol
+            active = active[moving]
+            if not len(active):
+                break
+            lat[active] += residual[moving] / (self.ell.a * self.f0)
 
         s, sec = np.sin(lat), 1/np.cos(lat)
         t = s*sec
@@ -87,12 +140,32 @@ class TransverseMercator(object):
                       -t/(720*rho*nu**5) * (61 + 90*t**2 + 45*t**4)]
 
         e_ = e - self.e0
-        odd_pow, even_pow = [e_, e_**3, e_**5, e_**7], [e_**2, e_**4, e_**6]
+        e2 = e_**2
 
-        lon_rel = np.sum(np.multiply(lon_coeffs, odd_pow), axis=0)
-        lat_rel = np.sum(np.multiply(lat_coeffs, even_pow), axis=0)
+        # Both series in powers of e_**2, by Horner's rule
+        lon_rel = e_ * (lon_coeffs[0] + e2 * (lon_coeffs[1] + e2 * (lon_coeffs[2] + e2 * lon_coeffs[3])))
+        lat_rel = e2 * (lat_coeffs[0] + e2 * (lat_coeffs[1] + e2 * lat_coeffs[2]))
 
-        return np.stack((lon_rel + self.lon0, lat_rel + self.lat0), axis=1)
+        return np.stack((lon_rel + self.lon0, lat + lat_rel), axis=1) * 180/np.pi
+
+
+    def ll_to_en_ragged(self, coordinates, offsets):
+        """ Project a ragged array of geometries in one call.
+
+        ``coordinates`` is the flat (M, 2) buffer of every geometry and
+        ``offsets`` the (K + 1,) start of each, as in :mod:`londinium.util.ragged`.
+        Returns the projected buffer with the same offsets.
+        """
+        return self.ll_to_en(coordinates), offsets
+
+    def en_to_ll_ragged(self, coordinates, offsets):
+        """ Inverse of :meth:`ll_to_en_ragged`. """
+        return self.en_to_ll(coordinates), offsets
+
+    def ll_to_en_geometries(self, geometries):
+        """ Project a list of geometries, as one ragged array, into a list. """
+        coordinates, offsets = flatten(geometries)
+        return split(*self.ll_to_en_ragged(coordinates, offsets))
 
 
 class UTM29(TransverseMercator):
@@ -108,6 +181,12 @@ class UTM29(TransverseMercator):
 
 
 class NationalGrid(TransverseMercator):
+    """ Ordnance Survey National Grid, for OSGB36 longitudes and latitudes.
+
+    As measured by ``benchmarks/projections.py`` on one core, this projects
+    about 8e6 points a second and inverts about 2.3e6.
+    """
+
     def __init__(self, ellipsoid=Airy1830()):
         super().__init__(
             lon0=-2,
@@ -117,3 +196,166 @@ class NationalGrid(TransverseMercator):
             f0=0.9996012717,
             ellipsoid=ellipsoid
         )
+
+
+class WGS84NationalGrid(NationalGrid):
+    """ National Grid for WGS84 longitudes and latitudes, as from GPS.
+
+    :class:`NationalGrid` takes coordinates on the OSGB36 datum. This moves
+    WGS84 coordinates onto OSGB36 first, which shifts them by up to about
+    120 metres, and back again for :meth:`en_to_ll`.
+
+    The datum step costs more than the projection itself. As measured by
+    ``benchmarks/projections.py`` on one core, this projects about 3e6 points
+    a second and inverts about 1.5e6.
+    """
+
+    def __init__(self, datum=WGS84_TO_OSGB36):
+        self.datum = datum
+        super().__init__()
+
+    def _key(self):
+        return super()._key() + self.datum._key()
+
+    def _ll_to_en(self, lon, lat):
+        ll = self.datum.forward(np.stack((lon, lat), axis=1) * 180/np.pi) * np.pi/180
+        return super()._ll_to_en(ll[:,0], ll[:,1])
+
+    def _en_to_ll(self, e, n, tol, max_iter):
+        return self.datum.backward(super()._en_to_ll(e, n, tol, max_iter))
+
+
+class FastNationalGrid(NationalGrid):
+    """ National Grid approximated by polynomials over a fixed region.
+
+    Within ``bbox`` the projection and its inverse are each a polynomial of
+    total degree ``degree`` in the coordinates scaled to [-1, 1], fitted by
+    least squares to the exact projection at Chebyshev nodes. Evaluating one
+    takes a handful of array products and a small matrix product per block
+    of points, with no trigonometry or iteration. Points outside ``bbox``, or
+    outside the projected ``bbox`` for the inverse, are projected exactly.
+    Fits are cached per region and degree.
+
+    The fit is checked on a 101 by 101 grid over the region, and the largest
+    errors found, in metres, are kept as :attr:`max_error` and
+    :attr:`max_inverse_error`. Over the default region around London, degree 4
+    is within 0.002 mm forwards and 0.04 mm inverse, and degree 3 within 0.6 mm
+    and 2.3 mm.
+
+    As measured by ``benchmarks/projections.py`` on one core, degree 4
+    projects about 2.8e7 points a second in the default region and inverts
+    about 2.9e7.
+
+    Args:
+        bbox:   ``[[lon_min, lon_max], [lat_min, lat_max]]``, as for
+                :class:`~londinium.plotting.plotter.Canvas`.
+        degree: Total degree of the polynomials.
+    """
+
+    _fits = dict()
+
+    def __init__(self, bbox=[[-0.54, 0.28],[51.3, 51.7]], degree=4, ellipsoid=Airy1830()):
+        super().__init__(ellipsoid=ellipsoid)
+        self.bbox = np.array(bbox, dtype=np.float64)
+        self.degree = degree
+
+        key = super()._key() + tuple(self.bbox.ravel()) + (degree,)
+        if key not in self._fits:
+            self._fits[key] = self._fit()
+        (self._ll_box, self._ll_coeffs, self._en_box, self._en_coeffs,
+         self.max_error, self.max_inverse_error) = self._fits[key]
+
+    def _key(self):
+        return super()._key() + tuple(self.bbox.ravel().tolist()) + (self.degree,)
+
+    def _basis(self, u, v):
+        """ Monomials ``u**i * v**j`` with ``i + j`` up to the degree, one row
+        each so that every product is written contiguously.
+        """
+
+        d = self.degree
+        rows = {}
+        basis = np.empty(((d + 1) * (d + 2) // 2, len(u)))
+        for i in range(d + 1):
+            for j in range(d + 1 - i):
+                rows[i, j] = basis[len(rows)]
+        rows[0, 0][:] = 1
+        if d:
+            rows[1, 0][:], rows[0, 1][:] = u, v
+        for k in range(2, d + 1):
+            np.multiply(rows[k-1, 0], u, out=rows[k, 0])
+            np.multiply(rows[0, k-1], v, out=rows[0, k])
+        for (i, j), row in rows.items():
+            if i and j:
+                np.multiply(rows[i, 0], rows[0, j], out=row)
+        return basis
+
+    @staticmethod
+    def _scaling(box):
+        """ Scale and offset of each axis mapping ``box`` onto [-1, 1]. """
+        scale = 2 / (box[:, 1] - box[:, 0])
+        return scale, -box.sum(axis=1) / 2 * scale
+
+    def _fit(self):
+        n = 4 * self.degree + 8
+        nodes = np.cos(np.pi * (np.arange(n) + 0.5) / n)
+        u, v = (x.ravel() for x in np.meshgrid(nodes, nodes))
+        grid = np.linspace(-1, 1, 101)
+        gu, gv = (x.ravel() for x in np.meshgrid(grid, grid))
+
+        def unnormalise(u, v, box):
+            scale, offset = self._scaling(box)
+            return np.stack(((u - offset[0]) / scale[0], (v - offset[1]) / scale[1]), axis=1)
+
+        def exact(ll):
+            return super(FastNationalGrid, self)._ll_to_en(*(ll * np.pi/180).T)
+
+        ll_coeffs = np.linalg.lstsq(self._basis(u, v).T, exact(unnormalise(u, v, self.bbox)),
+                                    rcond=None)[0]
+        check = exact(unnormalise(gu, gv, self.bbox))
+        max_error = np.max(np.linalg.norm(self._basis(gu, gv).T @ ll_coeffs - check, axis=1))
+
+        # The inverse covers the box bounding the projected region
+        en_box = np.stack((check.min(axis=0), check.max(axis=0)), axis=1)
+        en = unnormalise(u, v, en_box)
+        ll = super()._en_to_ll(en[:,0], en[:,1], 1e-6, 20)
+        en_coeffs = np.linalg.lstsq(self._basis(u, v).T, ll, rcond=None)[0]
+
+        check = unnormalise(gu, gv, en_box)
+        max_inverse_error = np.max(np.linalg.norm(
+            exact(self._basis(gu, gv).T @ en_coeffs) - check, axis=1))
+
+        return self.bbox, ll_coeffs, en_box, en_coeffs, max_error, max_inverse_error
+
+    def _approximate(self, points, box, coeffs, exact):
+        """ Evaluate the fit over (N, 2) ``points`` inside ``box``, block by
+        block, and ``exact`` outside it.
+        """
+
+        points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        scale, offset = self._scaling(box)
+        out = np.empty((len(points), 2))
+        for s in self._chunks(len(points)):
+            u = points[s, 0] * scale[0]
+            u += offset[0]
+            v = points[s, 1] * scale[1]
+            v += offset[1]
+
+            # Most blocks lie wholly inside, and need no mask
+            if min(u.min(), v.min()) >= -1 and max(u.max(), v.max()) <= 1:
+                np.matmul(coeffs.T, self._basis(u, v), out=out[s].T)
+                continue
+
+            inside = (np.abs(u) <= 1) & (np.abs(v) <= 1)
+            block = out[s]
+            block[inside] = self._basis(u[inside], v[inside]).T @ coeffs
+            block[~inside] = exact(points[s][~inside])
+        return out
+
+    def ll_to_en(self, lon_lat):
+        exact = lambda ll: super(FastNationalGrid, self)._ll_to_en(*(ll[:, :2] * np.pi/180).T)
+        return self._approximate(lon_lat, self._ll_box, self._ll_coeffs, exact)
+
+    def en_to_ll(self, easting_northing, tol=1e-5, max_iter=20):
+        exact = lambda en: super(FastNationalGrid, self)._en_to_ll(en[:,0], en[:,1], tol, max_iter)
+        return self._approximate(easting_northing, self._en_box, self._en_coeffs, exact)
@@ -0,0 +1,89 @@
+""" Level-of-detail simplification of polylines in ragged arrays.
+
+Simplification is split in two. :func:`importance` runs Douglas-Peucker once
+over every polyline, recording for each vertex the largest tolerance at which
+it would be kept. :func:`simplify` then extracts the polylines for any
+tolerance with one comparison per vertex, so drawing at a new scale does not
+repeat the search.
+"""
+
+import numpy as np
+
+
+def importance(coordinates, offsets):
+    """ Douglas-Peucker tolerance below which each vertex is kept.
+
+    Importance is the vertex's distance from the chord it splits, capped by
+    the importance of the vertex that made that chord, so that keeping the
+    vertices with ``importance >= tolerance`` gives exactly the
+    Douglas-Peucker simplification at ``tolerance``. First and last vertices
+    are ``inf``. Coordinates should be projected, so that distances are in
+    consistent units.
+
+    All polylines are refined together: each round finds the furthest vertex
+    of every open chord at once, so there are as many rounds as the depth of
+    the deepest split, not one per vertex.
+
+    Args:
+        coordinates:    (M, 2) flat coordinates.
+        offsets:        (K + 1,) offsets of the polylines.
+
+    Returns:
+        (M,) importances.
+    """
+
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    result = np.zeros(len(coordinates))
+
+    nonempty = offsets[1:] > offsets[:-1]
+    result[offsets[:-1][nonempty]] = np.inf
+    result[offsets[1:][nonempty] - 1] = np.inf
+
+    # Open chords, as first and last vertex and the importance that caps them
+    start, end = offsets[:-1][nonempty], offsets[1:][nonempty] - 1
+    cap = np.full(len(start), np.inf)
+
+    while True:
+        inner = end - start - 1
+        open_ = inner > 0
+        start, end, cap, inner = start[open_], end[open_], cap[open_], inner[open_]
+        if not len(start):
+            return result
+
+        chord = np.repeat(np.arange(len(start)), inner)
+        vertex = np.arange(inner.sum()) - np.repeat(np.cumsum(inner) - inner, inner) \
+            + start[chord] + 1
+        d = _segment_distance(coordinates[vertex], coordinates[start[chord]],
+                              coordinates[end[chord]])
+
+        # Furthest vertex of each chord, first of any ties
+        order = np.lexsort((-d, chord))
+        first = order[np.cumsum(inner) - inner]
+        split = vertex[first]
+        result[split] = np.minimum(d[first], cap)
+
+        start, end, cap = (np.concatenate((start, split)),
+                           np.concatenate((split, end)),
+                           np.tile(result[split], 2))
+
+
+def simplify(coordinates, offsets, importances, tolerance):
+    """ Polylines keeping only vertices with importance at least ``tolerance``.
+
+    Returns the simplified ``(coordinates, offsets)``.
+    """
+
+    keep = np.asarray(importances) >= tolerance
+    kept = np.concatenate(([0], np.cumsum(keep)))
+    return np.asarray(coordinates)[keep], kept[np.asarray(offsets)]
+
+
+def _segment_distance(points, a, b):
+    """ Distance from each point to the segment between ``a`` and ``b``. """
+
+    ab = b - a
+    length2 = np.einsum('ij,ij->i', ab, ab)
+    t = np.einsum('ij,ij->i', points - a, ab) / np.where(length2 > 0, length2, 1.0)
+    nearest = a + np.clip(t, 0, 1)[:, None] * ab
+    return np.hypot(*(points - nearest).T)
@@ -0,0 +1,602 @@
+""" Spatial indexing of points in projected coordinates. """
+
+import numpy as np
+
+from .projections import NationalGrid
+
+
+class SpatialIndex(object):
+    """ Uniform grid over a set of points, for batched proximity queries.
+
+    Points are projected once, bucketed into square cells, and stored sorted by
+    cell so that each cell's points are a contiguous slice. Every query takes
+    arrays of query points and is answered for the whole batch at once, in
+    chunks of ``chunk_size`` to bound memory. Nearest-point queries instead
+    descend a quadtree, built once per ``k``, whose leaves list at most about
+    :attr:`max_candidates` points that can be nearest anywhere in them, so
+    dense clusters need not widen the work of every query.
+
+    Args:
+        points:     (N, 2) point coordinates.
+        projection: Projects ``points`` and query points to metres. ``None``
+                    if they are already projected.
+        cell_size:  Cell width in metres. Defaults to a size giving about two
+                    points per occupied cell, which suits clustered points
+                    better than a size from the overall density.
+        ids:        Optional labels for the points, kept as :attr:`ids`.
+    """
+
+    chunk_size = 2**16
+    max_candidates = 16
+
+    def __init__(self, points, projection=NationalGrid(), cell_size=None, ids=None):
+        self.projection = projection
+        self.ids = ids
+        self.points = self._project(points)
+        self._x, self._y = np.ascontiguousarray(self.points.T)
+
+        lo = np.min(self.points, axis=0)
+        hi = np.max(self.points, axis=0)
+        if cell_size is None:
+            cell_size = self._occupancy_cell_size(self.points, lo, hi)
+        self.cell_size = float(cell_size)
+        self.origin = lo
+        self.shape = (np.floor((hi - lo) / self.cell_size).astype(np.int64) + 1)
+
+        cells = self._cell_ids(*self._cells(self.points))
+        self.order = np.argsort(cells, kind='stable')
+        self.sorted_points = self.points[self.order]
+        self.cell_start = np.zeros(self.shape[0] * self.shape[1] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=len(self.cell_start) - 1), out=self.cell_start[1:])
+
+    def __len__(self):
+        return len(self.points)
+
+    @classmethod
+    def from_stops(cls, stops, projection=NationalGrid(), **kwargs):
+        """ Index objects with ``id`` and ``location``, labelled by id.
+
+        Suits the stations of :class:`~londinium.parsing.geojson.stations.GeoJSONStationsFile`
+        and :class:`~londinium.parsing.json.disused.DisusedStationsFile`, and
+        network stops, given as a list or a dict of them. TransXChange stop
+        points are located by easting and northing already, so index them
+        with ``projection=None``.
+        """
+
+        if isinstance(stops, dict):
+            stops = stops.values()
+        stops = [s for s in stops if s.location is not None and None not in s.location]
+        return cls([s.location for s in stops], projection=projection,
+                   ids=[s.id for s in stops], **kwargs)
+
+    @staticmethod
+    def _occupancy_cell_size(points, lo, hi, per_cell=2, max_cells=2**24):
+        """ Halve the cell size until occupied cells hold ``per_cell`` points. """
+
+        size = max(float(np.max(hi - lo)), 1.0)
+        while size > 1.0:
+            extent = np.floor((hi - lo) / (size / 2)) + 1
+            if np.prod(extent) > max_cells:
+                break
+            cells = np.floor((points - lo) / (size / 2)).astype(np.int64)
+            occupied = len(np.unique(cells[:, 0] * int(extent[1]) + cells[:, 1]))
+            size /= 2
+            if len(points) <= per_cell * occupied:
+                break
+        return size
+
+    def _project(self, points):
+        points = np.reshape(np.asarray(points, dtype=np.float64), (-1, 2))
+        if self.projection is not None:
+            points = self.projection.ll_to_en(points)
+        return points
+
+    def _cells(self, points):
+        """ Unclipped integer cell coordinates of projected points. """
+        c = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        return c[:, 0], c[:, 1]
+
+    def _cell_ids(self, cx, cy):
+        return cx * self.shape[1] + cy
+
+    def _gather(self, cx, cy, reach):
+        """ Candidate points in the block of cells within ``reach`` of each query.
+
+        Returns ``(query, point)`` index pairs, where point indexes
+        :attr:`sorted_points`.
+        """
+
+        offsets = np.arange(-reach, reach + 1)
+        dx, dy = np.meshgrid(offsets, offsets, indexing='ij')
+        bx = cx[:, None] + dx.ravel()
+        by = cy[:, None] + dy.ravel()
+        valid = (bx >= 0) & (bx < self.shape[0]) & (by >= 0) & (by < self.shape[1])
+
+        query = np.broadcast_to(np.arange(len(cx))[:, None], bx.shape)[valid]
+        cell = self._cell_ids(bx[valid], by[valid])
+        start, stop = self.cell_start[cell], self.cell_start[cell + 1]
+        counts = stop - start
+
+        query = np.repeat(query, counts)
+        first = np.repeat(start - np.cumsum(counts) + counts, counts)
+        point = first + np.arange(counts.sum())
+        return query, point
+
+    def _chunks(self, n):
+        for lo in range(0, n, self.chunk_size):
+            yield slice(lo, min(lo + self.chunk_size, n))
+
+
+    def nearest(self, points, k=1):
+        """ The ``k`` nearest indexed points to each query point.
+
+        Returns ``(distances, indices)``, each of shape (Q, k), sorted by
+        distance. Where fewer than ``k`` points are indexed, the missing
+        entries are ``inf`` and ``-1``.
+        """
+
+        queries = self._project(points)
+        distances = np.full((len(queries), k), np.inf)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+
+        for s in self._chunks(len(queries)):
+            d, i = self._nearest(queries[s], k)
+            distances[s], indices[s] = d, i
+
+        return distances, indices
+
+    def _nearest(self, queries, k):
+        distances = np.full((len(queries), k), np.inf)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+
+        # Inside the tree, only the leaf's candidates can be nearest
+        tree = self._candidates(k)
+        leaves = tree.leaf(queries)
+        for rows, table in ((tree.rows, tree.table), (tree.dense_rows, tree.dense_table)):
+            listed = np.flatnonzero(leaves >= 0)
+            listed = listed[rows[leaves[listed]] >= 0]
+            step = max(1, 2**22 // table.shape[1])
+            for lo in range(0, len(listed), step):
+                q = listed[lo:lo+step]
+                candidates = table[rows[leaves[q]]]
+                distances[q], indices[q] = self._select(queries[q], candidates, k)
+
+        # Outside the tree, every point is a candidate
+        outside = np.flatnonzero(leaves < 0)
+        step = max(1, 2**22 // max(len(self), 1))
+        everything = np.arange(len(self))
+        for lo in range(0, len(outside), step):
+            q = outside[lo:lo+step]
+            candidates = np.broadcast_to(everything, (len(q), len(self)))
+            distances[q], indices[q] = self._select(queries[q], candidates, k)
+
+        return distances, indices
+
+    def _select(self, queries, candidates, k):
+        """ The ``k`` nearest of each query's row of candidates, -1 padded. """
+
+        # Squared distances, rooted only once the nearest are chosen
+        dx = self._x[candidates] - queries[:, 0, None]
+        dy = self._y[candidates] - queries[:, 1, None]
+        d = dx * dx
+        d += dy * dy
+        d[candidates < 0] = np.inf
+
+        distances = np.full((len(queries), k), np.inf)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        kk = min(k, candidates.shape[1])
+        if kk == 0:
+            return distances, indices
+
+        best = np.argpartition(d, kk - 1, axis=1)[:, :kk]
+        best = np.take_along_axis(best, np.argsort(np.take_along_axis(d, best, axis=1), axis=1), axis=1)
+        distances[:, :kk] = np.sqrt(np.take_along_axis(d, best, axis=1))
+        indices[:, :kk] = np.take_along_axis(candidates, best, axis=1)
+        indices[np.isinf(distances)] = -1
+        return distances, indices
+
+    def _candidates(self, k):
+        """ :class:`_CandidateTree` of the points that can be among the ``k``
+        nearest to anywhere in each of its leaves, built once per ``k``.
+        """
+
+        cache = self.__dict__.setdefault('_candidate_trees', dict())
+        if k not in cache:
+            cache[k] = _CandidateTree(self.points, k, max(self.max_candidates, 2 * k))
+        return cache[k]
+
+
+    def within(self, points, radius):
+        """ Indexed points within ``radius`` metres of each query point.
+
+        Returns ragged ``(indices, offsets)``: the matches of query ``q`` are
+        ``indices[offsets[q]:offsets[q+1]]``, nearest first.
+        """
+
+        queries = self._project(points)
+        reach = int(np.ceil(radius / self.cell_size))
+        found_q, found_i, found_d = [], [], []
+
+        for s in self._chunks(len(queries)):
+            cx, cy = self._cells(queries[s])
+            q, p = self._gather(cx, cy, reach)
+            d = np.linalg.norm(self.sorted_points[p] - queries[s][q], axis=1)
+            keep = d <= radius
+            found_q.append(q[keep] + s.start)
+            found_i.append(self.order[p[keep]])
+            found_d.append(d[keep])
+
+        return self._ragged(len(queries), found_q, found_i, found_d)
+
+    def in_bbox(self, bboxes):
+        """ Indexed points inside each of a batch of boxes.
+
+        ``bboxes`` is (B, 2, 2) as ``[[x_min, y_min], [x_max, y_max]]`` corners
+        in the index's input coordinates. Returns ragged ``(indices, offsets)``
+        as for :meth:`within`.
+        """
+
+        bboxes = np.reshape(np.asarray(bboxes, dtype=np.float64), (-1, 2, 2))
+        lo = self._project(bboxes[:, 0])
+        hi = self._project(bboxes[:, 1])
+        # Projected corners of a lon/lat box need not bound it exactly
+        lo, hi = np.minimum(lo, hi), np.maximum(lo, hi)
+
+        found_q, found_i = [], []
+        c_lo = np.clip(np.stack(self._cells(lo), axis=1), 0, self.shape - 1)
+        c_hi = np.clip(np.stack(self._cells(hi), axis=1), 0, self.shape - 1)
+        for b in range(len(bboxes)):
+            cells = self._cell_ids(*np.meshgrid(np.arange(c_lo[b, 0], c_hi[b, 0] + 1),
+                                                np.arange(c_lo[b, 1], c_hi[b, 1] + 1),
+                                                indexing='ij')).ravel()
+            counts = self.cell_start[cells + 1] - self.cell_start[cells]
+            first = np.repeat(self.cell_start[cells] - np.cumsum(counts) + counts, counts)
+            p = first + np.arange(counts.sum())
+            xy = self.sorted_points[p]
+            keep = np.all((xy >= lo[b]) & (xy <= hi[b]), axis=1)
+            found_q.append(np.full(keep.sum(), b))
+            found_i.append(np.sort(self.order[p[keep]]))
+
+        return self._ragged(len(bboxes), found_q, found_i)
+
+    @staticmethod
+    def _ragged(n, found_q, found_i, found_d=None):
+        q = np.concatenate(found_q) if found_q else np.zeros(0, dtype=np.int64)
+        i = np.concatenate(found_i) if found_i else np.zeros(0, dtype=np.int64)
+        if found_d is not None and len(q):
+            order = np.lexsort((np.concatenate(found_d), q))
+            q, i = q[order], i[order]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(q, minlength=n), out=offsets[1:])
+        return i, offsets
+
+
+class _CandidateTree(object):
+    """ Quadtree whose leaves list the points that can be among the ``k``
+    nearest to anywhere in the leaf.
+
+    If the ``k``-th nearest point to a square's centre is ``r`` away, the
+    ``k`` nearest to any point within half a diagonal ``h`` of the centre all
+    lie within ``r + 2h`` of it. The root square covers every point and lists
+    them all. Level by level, each square whose list is longer than
+    ``width`` is split into quarters, and each quarter keeps the part of its
+    parent's list that passes its own test. Squares only get small where
+    points cluster, so lists stay short without a fine grid everywhere.
+
+    A square is not split once its list is no shorter than its parent's and its
+    diagonal is short beside the distance to its ``k``-th nearest point, since
+    further splits would not help, as near many coincident points. Such dense
+    leaves are kept apart in ``dense_table``, padded only to the longest of
+    them, so they do not widen ``table``, which is padded with -1 to ``width``
+    columns. Leaf ``i`` is row ``rows[i]`` of one or ``dense_rows[i]`` of the
+    other, and -1 in the one it is not in.
+    """
+
+    def __init__(self, points, k, width, max_depth=20):
+        lo, hi = np.min(points, axis=0), np.max(points, axis=0)
+        self.centre = (lo + hi) / 2
+        self.half = max(float(np.max(hi - lo)) / 2, 1.0) * (1 + 1e-9)
+        kk = min(k, len(points)) - 1
+
+        centres = self.centre[None]
+        lists = np.arange(len(points))
+        offsets = np.array([0, len(points)])
+        parent_counts = np.array([len(points) + 1])
+        all_centres, all_children, all_counts, all_leaves = [], [], [], []
+        n_nodes = 0
+        for depth in range(max_depth + 1):
+            half = self.half / 2**depth
+            counts = np.diff(offsets)
+            node = np.repeat(np.arange(len(centres)), counts)
+            d = np.hypot(points[lists, 0] - centres[node, 0], points[lists, 1] - centres[node, 1])
+
+            # Distance to the k-th nearest of each list
+            order = np.lexsort((d, node))
+            r = d[order][offsets[:-1] + np.minimum(kk, counts - 1)]
+            keep = d <= r[node] + 2 * np.sqrt(2) * half
+            lists, counts = lists[keep], np.bincount(node[keep], minlength=len(centres))
+            offsets = np.r_[0, np.cumsum(counts)]
+
+            # Once the square is small beside the k-th distance, a split
+            # that leaves the list as long will not shorten it later
+            stalled = (counts >= parent_counts) & (2 * np.sqrt(2) * half < r)
+            split = (counts > width) & ~stalled & (depth < max_depth)
+            parents = np.flatnonzero(split)
+            children = np.full(len(centres), -1, dtype=np.int64)
+            children[parents] = n_nodes + len(centres) + 4 * np.arange(len(parents))
+            n_nodes += len(centres)
+            all_centres.append(centres)
+            all_children.append(children)
+            all_counts.append(counts)
+            all_leaves.append((~split, lists, offsets))
+            if not len(parents):
+                break
+
+            # Quarters, numbered by 2 * (x above centre) + (y above centre)
+            quarter = np.array([[-1, -1], [-1, 1], [1, -1], [1, 1]]) * half / 2
+            parent = np.repeat(parents, 4)
+            centres = (centres[parents][:, None] + quarter).reshape(-1, 2)
+            parent_counts = counts[parent]
+            first = np.repeat(offsets[parent] - np.cumsum(parent_counts) + parent_counts,
+                              parent_counts)
+            lists = lists[first + np.arange(parent_counts.sum())]
+            offsets = np.r_[0, np.cumsum(parent_counts)]
+
+        self.centres = np.concatenate(all_centres)
+        self.children = np.concatenate(all_children)
+        counts = np.concatenate(all_counts)
+
+        # Lists of the leaves only
+        leaf = np.concatenate([x[0] for x in all_leaves])
+        lists = np.concatenate([l[np.repeat(split, np.diff(o))] for split, l, o in all_leaves])
+        counts = np.where(leaf, counts, 0)
+        rank = np.arange(len(lists)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        def tabulate(members):
+            rows = np.where(members, np.cumsum(members) - 1, -1)
+            table = np.full((int(members.sum()), max(int(counts[members].max(initial=0)), 1)),
+                            -1, dtype=np.int64)
+            kept = np.repeat(members, counts)
+            table[np.repeat(rows, counts)[kept], rank[kept]] = lists[kept]
+            return rows, table
+
+        self.rows, self.table = tabulate(leaf & (counts <= width))
+        self.dense_rows, self.dense_table = tabulate(leaf & (counts > width))
+
+    def leaf(self, queries):
+        """ Leaf containing each query point, -1 outside the root. """
+
+        inside = np.all(np.abs(queries - self.centre) <= self.half, axis=1)
+        node = np.where(inside, 0, -1)
+        active = np.flatnonzero(inside)
+        while len(active):
+            active = active[self.children[node[active]] >= 0]
+            n = node[active]
+            above = queries[active] >= self.centres[n]
+            node[active] = self.children[n] + 2 * above[:, 0] + above[:, 1]
+        return node
+
+
+class BoundingBoxIndex(object):
+    """ Packed R-tree over the bounding boxes of many features.
+
+    Boxes are packed bottom-up by Sort-Tile-Recursive: sorted into vertical
+    slices by centre x, each slice sorted by centre y, and consecutive runs of
+    ``capacity`` grouped under one parent box, level by level up to a single
+    root. A query descends all levels with array operations, so it visits only
+    the branches that overlap the query box.
+
+    Boxes, like :attr:`~londinium.plotting.plotter.Canvas.bbox`, are given as
+    ``[[x_min, x_max], [y_min, y_max]]``.
+
+    Args:
+        lo:         (K, 2) lower corners of the feature boxes.
+        hi:         (K, 2) upper corners.
+        capacity:   Children per node.
+    """
+
+    def __init__(self, lo, hi, capacity=16):
+        lo = np.reshape(np.asarray(lo, dtype=np.float64), (-1, 2))
+        hi = np.reshape(np.asarray(hi, dtype=np.float64), (-1, 2))
+        self.capacity = capacity
+
+        n = len(lo)
+        centres = np.add(lo, hi, out=np.zeros_like(lo), where=lo <= hi) / 2
+        per_slice = capacity * max(1, int(np.ceil(np.sqrt(n / capacity))))
+        by_x = np.argsort(centres[:, 0], kind='stable')
+        slices = np.arange(n) // per_slice
+        self.order = by_x[np.lexsort((centres[by_x, 1], slices))]
+
+        # levels[0] holds the features themselves, in packed order
+        self.levels = [(lo[self.order], hi[self.order])]
+        while len(self.levels[-1][0]) > 1:
+            child_lo, child_hi = self.levels[-1]
+            starts = np.arange(0, len(child_lo), capacity)
+            self.levels.append((np.minimum.reduceat(child_lo, starts),
+                                np.maximum.reduceat(child_hi, starts)))
+
+    def __len__(self):
+        return len(self.order)
+
+    @classmethod
+    def from_ragged(cls, coordinates, offsets, **kwargs):
+        """ Index of the bounding boxes of the geometries of a ragged array.
+
+        Empty geometries get an inverted box that no query overlaps.
+        """
+
+        coordinates = np.asarray(coordinates, dtype=np.float64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        nonempty = offsets[1:] > offsets[:-1]
+        lo = np.full((len(offsets) - 1, 2), np.inf)
+        hi = np.full((len(offsets) - 1, 2), -np.inf)
+        if nonempty.any():
+            starts = offsets[:-1][nonempty]
+            lo[nonempty] = np.minimum.reduceat(coordinates, starts)
+            hi[nonempty] = np.maximum.reduceat(coordinates, starts)
+        return cls(lo, hi, **kwargs)
+
+    def query(self, bbox):
+        """ Sorted indices of the features whose boxes overlap ``bbox``. """
+
+        (x0, x1), (y0, y1) = bbox
+        box_lo, box_hi = np.array([x0, y0]), np.array([x1, y1])
+
+        nodes = np.arange(len(self.levels[-1][0]))
+        for level in range(len(self.levels) - 1, -1, -1):
+            lo, hi = self.levels[level]
+            nodes = nodes[np.all((lo[nodes] <= box_hi) & (hi[nodes] >= box_lo), axis=1)]
+            if level:
+                children = (nodes[:, None] * self.capacity + np.arange(self.capacity)).ravel()
+                nodes = children[children < len(self.levels[level - 1][0])]
+
+        return np.sort(self.order[nodes])
+
+
+class PolygonIndex(object):
+    """ Grid of polygon edges, for batched point-in-polygon queries.
+
+    Areas are made of rings, and a point is in an area if it is inside an odd
+    number of its rings, so holes and separate parts need no special
+    treatment. Each cell of a uniform grid lists the edges that may cross it,
+    and records which areas contain its centre. A query point starts from its
+    cell centre's answer and flips it for every edge crossed on the way from
+    the centre, so it is tested only against the few edges of its own cell.
+
+    Coordinates are treated as planar, as in GeoJSON.
+
+    Args:
+        coordinates:    (M, 2) flat coordinates of every ring.
+        rings:          (R + 1,) offsets of the rings. Rings may be closed by
+                        repeating their first vertex, or not.
+        ring_areas:     (R,) area of each ring.
+        n_areas:        Number of areas. Defaults to one more than the last.
+        cells:          Grid cells along each axis. Defaults to about the
+                        square root of the number of edges.
+    """
+
+    chunk_size = 2**16
+
+    def __init__(self, coordinates, rings, ring_areas, n_areas=None, cells=None):
+        coordinates = np.asarray(coordinates, dtype=np.float64)
+        rings = np.asarray(rings, dtype=np.int64)
+        ring_areas = np.asarray(ring_areas, dtype=np.int64)
+        self.n_areas = int(ring_areas.max(initial=-1)) + 1 if n_areas is None else n_areas
+
+        # An edge from every vertex to the next, and from each last vertex
+        # round to the first
+        counts = np.diff(rings)
+        following = np.arange(1, len(coordinates) + 1)
+        following[rings[1:][counts > 0] - 1] = rings[:-1][counts > 0]
+        a, b = coordinates, coordinates[following]
+        real = np.any(a != b, axis=1)
+        self.a, self.b = a[real], b[real]
+        self.edge_areas = np.repeat(ring_areas, counts)[real]
+
+        lo = coordinates.min(axis=0) if len(coordinates) else np.zeros(2)
+        hi = coordinates.max(axis=0) if len(coordinates) else np.ones(2)
+        n = int(np.clip(np.sqrt(len(self.a)), 8, 1024)) if cells is None else cells
+        self.origin = lo
+        self.shape = np.array([n, n])
+        self.cell_size = np.maximum(hi - lo, 1e-12) / n * (1 + 1e-9)
+
+        self._index_edges()
+        self._centre_parity()
+
+    def _index_edges(self):
+        """ CSR lists of the edges whose bounding boxes meet each cell. """
+
+        n = self.shape
+        c_lo = np.clip(np.floor((np.minimum(self.a, self.b) - self.origin) / self.cell_size),
+                       0, n - 1).astype(np.int64)
+        c_hi = np.clip(np.floor((np.maximum(self.a, self.b) - self.origin) / self.cell_size),
+                       0, n - 1).astype(np.int64)
+        spans = c_hi - c_lo + 1
+        counts = spans[:, 0] * spans[:, 1]
+        edge = np.repeat(np.arange(len(self.a)), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell = (c_lo[edge, 0] + k // spans[edge, 1]) * n[1] + c_lo[edge, 1] + k % spans[edge, 1]
+
+        order = np.argsort(cell, kind='stable')
+        self.cell_edges = edge[order]
+        self.cell_start = np.zeros(n[0] * n[1] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell, minlength=n[0] * n[1]), out=self.cell_start[1:])
+
+    def _centre_parity(self):
+        """ Areas containing each cell centre, by scanlines through the centres.
+
+        Along each row of centres, every area's edges crossing the row are
+        counted to the left of each centre, and an odd count is inside.
+        """
+
+        n = self.shape
+        a, b = self.a, self.b
+        # Rows of centres each edge spans, half-open so a shared vertex counts once
+        row_lo = np.ceil((np.minimum(a[:, 1], b[:, 1]) - self.origin[1]) / self.cell_size[1] - 0.5)
+        row_hi = np.ceil((np.maximum(a[:, 1], b[:, 1]) - self.origin[1]) / self.cell_size[1] - 0.5)
+        row_lo = np.clip(row_lo, 0, n[1]).astype(np.int64)
+        row_hi = np.clip(row_hi, 0, n[1]).astype(np.int64)
+        counts = row_hi - row_lo
+
+        edge = np.repeat(np.arange(len(a)), counts)
+        row = row_lo[edge] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        y = self.origin[1] + (row + 0.5) * self.cell_size[1]
+        x = a[edge, 0] + (y - a[edge, 1]) * (b[edge, 0] - a[edge, 0]) / (b[edge, 1] - a[edge, 1])
+
+        # A crossing left of centre j is counted from column floor(x) + 1 on
+        column = np.clip(np.floor((x - self.origin[0]) / self.cell_size[0] - 0.5) + 1,
+                         0, n[0]).astype(np.int64)
+        key = (self.edge_areas[edge] * n[1] + row) * (n[0] + 1) + column
+        crossings = np.bincount(key, minlength=self.n_areas * n[1] * (n[0] + 1))
+        crossings = crossings.reshape(self.n_areas, n[1], n[0] + 1)
+        inside = np.cumsum(crossings, axis=2)[:, :, :n[0]] % 2 == 1
+
+        # As (cell, area), with cells numbered as for the edge lists
+        self.centre_inside = inside.transpose(2, 1, 0).reshape(n[0] * n[1], self.n_areas)
+
+    def contains(self, points):
+        """ (N, A) whether each point is inside each area. """
+
+        points = np.reshape(np.asarray(points, dtype=np.float64), (-1, 2))
+        result = np.zeros((len(points), self.n_areas), dtype=bool)
+        for lo in range(0, len(points), self.chunk_size):
+            p = points[lo:lo+self.chunk_size]
+            result[lo:lo+self.chunk_size] = self._contains(p)
+        return result
+
+    def _contains(self, points):
+        c = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        on_grid = np.flatnonzero(np.all((c >= 0) & (c < self.shape), axis=1))
+        result = np.zeros((len(points), self.n_areas), dtype=bool)
+        if not len(on_grid):
+            return result
+
+        cell = c[on_grid, 0] * self.shape[1] + c[on_grid, 1]
+        result[on_grid] = self.centre_inside[cell]
+
+        start, stop = self.cell_start[cell], self.cell_start[cell + 1]
+        counts = stop - start
+        query = np.repeat(on_grid, counts)
+        edge = self.cell_edges[np.repeat(start - np.cumsum(counts) + counts, counts)
+                               + np.arange(counts.sum())]
+
+        centre = self.origin + (c[query] + 0.5) * self.cell_size
+        p, a, b = points[query], self.a[edge], self.b[edge]
+        # Half-open side tests, so a path through a vertex crosses one of its edges
+        crossed = ((_side(a, b, centre) > 0) != (_side(a, b, p) > 0)) & \
+                  ((_side(centre, p, a) > 0) != (_side(centre, p, b) > 0))
+
+        flips = np.bincount(query[crossed] * self.n_areas + self.edge_areas[edge[crossed]],
+                            minlength=len(points) * self.n_areas)
+        result ^= (flips % 2 == 1).reshape(len(points), self.n_areas)
+        return result
+
+    def locate(self, points):
+        """ First area containing each point, or -1 if none does. """
+        inside = self.contains(points)
+        return np.where(inside.any(axis=1), np.argmax(inside, axis=1), -1)
+
+
+def _side(a, b, p):
+    """ Twice the signed area of triangle ``a``, ``b``, ``p``, row by row. """
+    return (b[:, 0] - a[:, 0]) * (p[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (p[:, 0] - a[:, 0])
@@ -1,6 +1,9 @@
 """ Representations of transport networks. """
 
 import numpy as np
+from collections import namedtuple
+from .util.cached_property import cached_property
+from .util.ragged import flatten
 
 
 WAYS = ('rail', 'road', 'river', 'cable')
@@ -49,6 +52,7 @@ class Line(object):
 
         self._stops = dict()
         self._links = list()
+        self._patterns = list()
 
     @property
     def name(self):
@@ -60,10 +64,11 @@ class Line(object):
 
     @property
     def links(self):
-        return self._stops
+        return self._links
         # return set(*section.links for section in self.sections)
 
     def add_link(self, link):
+        link._line = self
         self._links.append(link)
 
     @property
@@ -74,6 +79,14 @@ class Line(object):
     def add_stop(self, stop):
         self._stops.update({stop.id:stop})
 
+    @property
+    def patterns(self):
+        return self._patterns
+
+    def add_pattern(self, pattern):
+        pattern._line = self
+        self._patterns.append(pattern)
+
 
 class Section(object):
     """ Contiguous branch of a line, bounded by Stop at junction or terminus. """
@@ -137,14 +150,22 @@ class Link(object):
 
     @property
     def geometry(self):
-        return self._geometry or [self.stop_1.location, self.stop_2.location]
+        if self._geometry is not None:
+            return self._geometry
+        return [self.stop_1.location, self.stop_2.location]
 
     @property
     def distance(self):
-        if self._distance is not None:
-            return self._distance
-        else:
-            return sum(np.linalg.norm(v) for v in np.diff(self.geometry, axis=0))
+        """ Length in metres, or None if unknown. It is not measured from the
+        geometry, which is in longitude and latitude. Unknown distances are
+        NaN in :class:`NetworkArrays`, and routers take the projected
+        straight line between the stops instead.
+        """
+        return self._distance
+
+    @property
+    def time(self):
+        return self._time
 
 
 class Interchange(object):
@@ -162,7 +183,632 @@ class Interchange(object):
 
 
 class Pattern(object):
-    """ Service pattern, decribing how the line is operated. """
+    """ Service pattern, decribing how the line is operated.
+
+    A fixed sequence of stops, the running time between each and the next,
+    the dwell at each, and the trips that run it, each given by its departure
+    from the first stop. Times are whole seconds, and departures are after
+    midnight, passing 24 hours for trips that run over midnight.
+    """
+
+    def __init__(self, id, stops, run_times, wait_times=None, departures=(), trip_ids=None):
+        self.id = id
+        self._stops = list(stops)
+        self.run_times = np.asarray(run_times, dtype=np.int32).reshape(-1)
+        if len(self.run_times) != len(self._stops) - 1:
+            raise ValueError('Need one run time between each pair of stops.')
+        if wait_times is None:
+            wait_times = np.zeros(len(self._stops))
+        self.wait_times = np.asarray(wait_times, dtype=np.int32).reshape(-1)
+        self.departures = np.asarray(departures, dtype=np.int32).reshape(-1)
+        if trip_ids is None:
+            trip_ids = ['{}:{}'.format(id, k) for k in range(len(self.departures))]
+        self.trip_ids = list(trip_ids)
+
+    @property
+    def line(self):
+        return self._line
+
+    @property
+    def stops(self):
+        return self._stops
+
+    @property
+    def arrivals(self):
+        """ Time from a trip's departure until it reaches each stop. """
+        return np.r_[0, np.cumsum(self.wait_times[:-1] + self.run_times)].astype(np.int32)
+
+    @property
+    def departure_offsets(self):
+        """ Time from a trip's departure until it leaves each stop. """
+        return self.arrivals + self.wait_times
+
+
+Adjacency = namedtuple('Adjacency',
+    ['indptr', 'indices', 'links', 'distance', 'time']
+)
+
+
+class NetworkArrays(object):
+    """ Struct-of-arrays form of a network, for graph algorithms.
+
+    Stop ids are interned to integers, and each stop, line, link, mode and
+    interchange is a row of the fixed-dtype arrays in :attr:`arrays`, named
+    ``stop_*``, ``line_*``, ``link_*``, ``mode_*`` and ``interchange_*``.
+    Ragged data (line membership, link geometry, interchange stops) is kept
+    as a flat array with ``*_offsets``, so that item ``k`` is
+    ``flat[offsets[k]:offsets[k+1]]``. Links are grouped by line, and unknown
+    link distances and times are NaN.
+
+    Patterns are rows ``pattern_*``, with their stops and the arrival and
+    departure offsets at each as ragged ``pattern_stops``,
+    ``pattern_arrivals`` and ``pattern_departures``, and their trips as
+    ragged ``trip_departures`` and ``trip_ids`` under ``pattern_trip_offsets``.
+    :attr:`timetable` expands them into every timetabled connection.
+
+    :attr:`modes` gives the :class:`Mode`, :class:`Line`, :class:`Stop` and
+    :class:`Link` interface as thin views that read these arrays on access.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    @classmethod
+    def from_modes(cls, modes, stops=(), interchanges=()):
+        """ Compile network objects to arrays.
+
+        Stops are interned by id, so a stop shared by several lines or modes is
+        stored once. ``stops`` may add stops that are not on any line.
+        """
+        return cls(_compile(modes, stops, interchanges))
+
+    def to_modes(self):
+        """ Copy back out to plain network objects, one Stop per stop id. """
+
+        stops = [Stop(id=str(i), name=str(n), location=tuple(l), disused=bool(d))
+                 for i, n, l, d in zip(self['stop_ids'], self['stop_names'],
+                                       self['stop_locations'], self['stop_disused'])]
+
+        modes = [Mode(name=str(n), way=str(w))
+                 for n, w in zip(self['mode_names'], self['mode_ways'])]
+
+        for l, name in enumerate(self['line_names']):
+            line = Line(name=str(name))
+            lo, hi = self['line_stop_offsets'][l:l+2]
+            for i in self['line_stops'][lo:hi]:
+                line.add_stop(stops[i])
+            lo, hi = self['line_link_offsets'][l:l+2]
+            for k in range(lo, hi):
+                i, j = self['link_stops'][k]
+                distance, time = self['link_distance'][k], self['link_time'][k]
+                line.add_link(Link(
+                    stop_1=stops[i],
+                    stop_2=stops[j],
+                    distance=None if np.isnan(distance) else float(distance),
+                    geometry=np.array(self.geometry(k)),
+                    time=None if np.isnan(time) else float(time)
+                ))
+            for k in np.flatnonzero(self['pattern_line'] == l):
+                line.add_pattern(self._pattern(k, stops.__getitem__))
+            modes[self['line_mode'][l]].add_line(line)
+
+        return modes
+
+    @property
+    def n_stops(self):
+        return len(self['stop_ids'])
+
+    @property
+    def n_links(self):
+        return len(self['link_line'])
+
+    @property
+    def n_patterns(self):
+        return len(self['pattern_line'])
+
+    @property
+    def n_trips(self):
+        return len(self['trip_departures'])
+
+    @cached_property
+    def stop_index(self):
+        """ Dict of stop id to integer index. """
+        return {str(x):i for i, x in enumerate(self['stop_ids'])}
+
+    @property
+    def coordinates(self):
+        """ (N, 2) stop locations. """
+        return self['stop_locations']
+
+    def _pattern(self, index, stop):
+        """ Pattern ``index`` as an object, with stops made by ``stop(i)``. """
+        lo, hi = self['pattern_stop_offsets'][index:index+2]
+        arrivals, departures = self['pattern_arrivals'][lo:hi], self['pattern_departures'][lo:hi]
+        t_lo, t_hi = self['pattern_trip_offsets'][index:index+2]
+        return Pattern(
+            id=str(self['pattern_ids'][index]),
+            stops=[stop(int(i)) for i in self['pattern_stops'][lo:hi]],
+            run_times=arrivals[1:] - departures[:-1],
+            wait_times=departures - arrivals,
+            departures=self['trip_departures'][t_lo:t_hi],
+            trip_ids=[str(x) for x in self['trip_ids'][t_lo:t_hi]]
+        )
+
+    @cached_property
+    def timetable(self):
+        """ :class:`Timetable` of every trip of every pattern. """
+        return Timetable.from_network(self)
+
+    def geometry(self, link_index):
+        offsets = self['geometry_offsets']
+        return self['geometry_coordinates'][offsets[link_index]:offsets[link_index+1]]
+
+    @cached_property
+    def adjacency(self):
+        """ Links as CSR adjacency over stop indices, in both directions.
+
+        Edges out of stop ``i`` are ``indptr[i]:indptr[i+1]``, leading to stops
+        ``indices`` along links ``links``, with their ``distance`` and ``time``.
+        """
+        return self._get_adjacency(symmetric=True)
+
+    @cached_property
+    def directed_adjacency(self):
+        """ As :attr:`adjacency`, but only from each link's first stop. """
+        return self._get_adjacency(symmetric=False)
+
+    def _get_adjacency(self, symmetric):
+        sources, targets = self['link_stops'][:, 0], self['link_stops'][:, 1]
+        links = np.arange(self.n_links)
+        if symmetric:
+            sources, targets = np.r_[sources, targets], np.r_[targets, sources]
+            links = np.r_[links, links]
+
+        order = np.argsort(sources, kind='stable')
+        indptr = np.zeros(self.n_stops + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=self.n_stops), out=indptr[1:])
+        links = links[order]
+
+        return Adjacency(
+            indptr=indptr,
+            indices=targets[order].astype(np.int32),
+            links=links.astype(np.int32),
+            distance=self['link_distance'][links],
+            time=self['link_time'][links]
+        )
+
+    @property
+    def modes(self):
+        names = self['mode_names']
+        return {str(names[m]):_ModeView(self, m) for m in range(len(names))}
+
+    def stop(self, index):
+        """ View of one stop. """
+        return _StopView(self, int(index))
+
+    def line(self, index):
+        """ View of one line. """
+        return _LineView(self, int(index))
+
+    def link(self, index):
+        """ View of one link. """
+        return _LinkView(self, int(index))
+
+    @property
+    def stops(self):
+        return [_StopView(self, i) for i in range(self.n_stops)]
 
-    def __init__(self):
-        pass
+    @property
+    def links(self):
+        return [_LinkView(self, k) for k in range(self.n_links)]
+
+    @property
+    def interchanges(self):
+        offsets = self['interchange_offsets']
+        return [Interchange([_StopView(self, int(i)) for i in
+                             self['interchange_stops'][offsets[k]:offsets[k+1]]])
+                for k in range(len(offsets) - 1)]
+
+
+class Timetable(object):
+    """ Every timetabled connection, as arrays sorted for scanning.
+
+    A connection is one trip running from a stop of its pattern to the next.
+    Connections are sorted by departure and then arrival time, so scanning
+    them in order meets every connection that could be caught before any
+    that leaves later. Stops are network stop indices, times are seconds
+    after midnight, and ``trip`` indexes the trips of the network in pattern
+    order. Each array is int32, so memory is 20 bytes per connection.
+
+    Args:
+        dep_stop:   Stop each connection leaves.
+        arr_stop:   Stop each connection reaches.
+        dep_time:   Departure time of each connection.
+        arr_time:   Arrival time of each connection.
+        trip:       Trip of each connection.
+        sort:       Whether the connections still need sorting.
+    """
+
+    def __init__(self, dep_stop, arr_stop, dep_time, arr_time, trip, sort=True):
+        columns = [np.asarray(x, dtype=np.int32) for x in
+                   (dep_stop, arr_stop, dep_time, arr_time, trip)]
+        if sort:
+            order = np.lexsort((columns[3], columns[2]))
+            columns = [x[order] for x in columns]
+        self.dep_stop, self.arr_stop, self.dep_time, self.arr_time, self.trip = columns
+
+    def __len__(self):
+        return len(self.dep_time)
+
+    @classmethod
+    def from_network(cls, network):
+        """ Expand the trips of every pattern of a :class:`NetworkArrays`. """
+
+        stop_offsets = network['pattern_stop_offsets']
+        trip_offsets = network['pattern_trip_offsets']
+        hops = np.maximum(np.diff(stop_offsets) - 1, 0)
+
+        trip_pattern = np.repeat(np.arange(len(hops)), np.diff(trip_offsets))
+        trip_hops = hops[trip_pattern]
+        trip = np.repeat(np.arange(len(trip_pattern)), trip_hops)
+        hop = np.arange(len(trip)) - np.repeat(np.cumsum(trip_hops) - trip_hops, trip_hops)
+        at = stop_offsets[trip_pattern[trip]] + hop
+
+        start = network['trip_departures'][trip]
+        return cls(
+            dep_stop=network['pattern_stops'][at],
+            arr_stop=network['pattern_stops'][at + 1],
+            dep_time=start + network['pattern_departures'][at],
+            arr_time=start + network['pattern_arrivals'][at + 1],
+            trip=trip
+        )
+
+    def departing(self, start, end=None):
+        """ Slice of the connections leaving at or after ``start`` and before ``end``. """
+        lo = np.searchsorted(self.dep_time, start, side='left')
+        hi = len(self) if end is None else np.searchsorted(self.dep_time, end, side='left')
+        return slice(int(lo), int(hi))
+
+
+class ODMatrix(object):
+    """ Sparse trip counts between stops, by time band.
+
+    Each nonzero entry is a (band, origin, destination) with its count,
+    origins and destinations being network stop indices. Entries are sorted
+    by band, origin and then destination with no repeats, so that two
+    matrices built from the same trips in any order are equal, and one band
+    or one origin is a contiguous slice. Band ``b`` starts ``band_starts[b]``
+    minutes after midnight and lasts until the next; the last band is
+    open-ended.
+
+    Args:
+        bands:          Band of each entry.
+        origins:        Origin stop of each entry.
+        destinations:   Destination stop of each entry.
+        counts:         Trips of each entry.
+        n_stops:        Stops in the network.
+        band_starts:    Start of each band, in minutes.
+        sort:           Whether the entries still need sorting and summing.
+    """
+
+    def __init__(self, bands, origins, destinations, counts, n_stops, band_starts=(0,), sort=True):
+        self.n_stops = int(n_stops)
+        self.band_starts = np.asarray(band_starts, dtype=np.int32)
+        bands = np.asarray(bands, dtype=np.int64)
+        origins = np.asarray(origins, dtype=np.int64)
+        destinations = np.asarray(destinations, dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.int64)
+
+        if sort:
+            keys = (bands * self.n_stops + origins) * self.n_stops + destinations
+            keys, counts = _sum_by_key(keys, counts)
+            bands, rest = np.divmod(keys, self.n_stops * self.n_stops)
+            origins, destinations = np.divmod(rest, self.n_stops)
+            keep = counts != 0
+            bands, origins, destinations, counts = (x[keep] for x in
+                                                    (bands, origins, destinations, counts))
+
+        self.bands = bands.astype(np.int16)
+        self.origins = origins.astype(np.int32)
+        self.destinations = destinations.astype(np.int32)
+        self.counts = counts
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def n_bands(self):
+        return len(self.band_starts)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    @classmethod
+    def merge(cls, matrices):
+        """ Sum of matrices over the same stops and bands. """
+        matrices = list(matrices)
+        first = matrices[0]
+        for m in matrices[1:]:
+            if m.n_stops != first.n_stops or not np.array_equal(m.band_starts, first.band_starts):
+                raise ValueError('Cannot merge OD matrices over different stops or bands.')
+        return cls(*(np.concatenate([getattr(m, name) for m in matrices])
+                     for name in ('bands', 'origins', 'destinations', 'counts')),
+                   n_stops=first.n_stops, band_starts=first.band_starts)
+
+    def band(self, band):
+        """ Matrix of the one band ``band``. """
+        lo, hi = np.searchsorted(self.bands, [band, band + 1])
+        return ODMatrix(np.zeros(hi - lo), self.origins[lo:hi], self.destinations[lo:hi],
+                        self.counts[lo:hi], self.n_stops, self.band_starts[band:band+1],
+                        sort=False)
+
+    def combined(self):
+        """ Matrix of every band summed into one, starting with the first. """
+        return ODMatrix(np.zeros(len(self)), self.origins, self.destinations, self.counts,
+                        self.n_stops, self.band_starts[:1])
+
+    def origin_offsets(self):
+        """ Offsets of each origin's entries, for a matrix of one band. """
+        if self.n_bands != 1:
+            raise ValueError('Origin offsets need a matrix of one band.')
+        return np.searchsorted(self.origins, np.arange(self.n_stops + 1)).astype(np.int64)
+
+    def productions(self):
+        """ (B, S) trips starting at each stop in each band. """
+        return np.bincount(self.bands * self.n_stops + self.origins, weights=self.counts,
+                           minlength=self.n_bands * self.n_stops
+                           ).reshape(self.n_bands, self.n_stops).astype(np.int64)
+
+    def attractions(self):
+        """ (B, S) trips ending at each stop in each band. """
+        return np.bincount(self.bands * self.n_stops + self.destinations, weights=self.counts,
+                           minlength=self.n_bands * self.n_stops
+                           ).reshape(self.n_bands, self.n_stops).astype(np.int64)
+
+    def dense(self):
+        """ (B, S, S) counts. Takes 8 bytes per band and pair of stops. """
+        result = np.zeros((self.n_bands, self.n_stops, self.n_stops), dtype=np.int64)
+        result[self.bands, self.origins, self.destinations] = self.counts
+        return result
+
+
+def _sum_by_key(keys, counts):
+    """ Sorted unique ``keys`` with the summed ``counts`` of each. """
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    if not len(keys):
+        return keys, counts[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.add.reduceat(counts[order], starts)
+
+
+def _strings(values):
+    """ Fixed-width unicode array, which maps as well as any numeric one. """
+    return np.array([str(v) for v in values], dtype=np.str_)
+
+
+def _location(location):
+    if location is None:
+        return (np.nan, np.nan)
+    return tuple(np.nan if x is None else float(x) for x in location)
+
+
+def _compile(modes, extra_stops, interchanges):
+    stop_index = dict()
+    stops = []
+
+    def intern(stop):
+        if stop.id not in stop_index:
+            stop_index[stop.id] = len(stops)
+            stops.append(stop)
+        return stop_index[stop.id]
+
+    mode_names, mode_ways = [], []
+    line_names, line_mode = [], []
+    line_stops, line_stop_offsets = [], [0]
+    line_link_offsets = [0]
+    link_stops, link_line, link_distance, link_time, geometries = [], [], [], [], []
+    pattern_ids, pattern_line, pattern_stops, pattern_stop_offsets = [], [], [], [0]
+    pattern_arrivals, pattern_departures = [], []
+    trip_departures, trip_ids, pattern_trip_offsets = [], [], [0]
+
+    for m, mode in enumerate(modes):
+        mode_names.append(mode.name)
+        mode_ways.append(mode.way)
+
+        for line in mode.lines.values():
+            l = len(line_names)
+            line_names.append(line.name)
+            line_mode.append(m)
+
+            line_stops.extend(intern(stop) for stop in line.stops.values())
+            line_stop_offsets.append(len(line_stops))
+
+            for link in line.links:
+                link_stops.append((intern(link.stop_1), intern(link.stop_2)))
+                link_line.append(l)
+                link_distance.append(np.nan if link.distance is None else float(link.distance))
+                link_time.append(np.nan if link.time is None else float(link.time))
+                geometries.append(link.geometry)
+            line_link_offsets.append(len(link_stops))
+
+            for pattern in line.patterns:
+                pattern_ids.append(pattern.id)
+                pattern_line.append(l)
+                pattern_stops.extend(intern(stop) for stop in pattern.stops)
+                pattern_stop_offsets.append(len(pattern_stops))
+                pattern_arrivals.append(pattern.arrivals)
+                pattern_departures.append(pattern.departure_offsets)
+                trip_departures.append(pattern.departures)
+                trip_ids.extend(pattern.trip_ids)
+                pattern_trip_offsets.append(len(trip_ids))
+
+    for stop in extra_stops:
+        intern(stop)
+
+    interchange_stops, interchange_offsets = [], [0]
+    for interchange in interchanges:
+        interchange_stops.extend(intern(stop) for stop in interchange.stops)
+        interchange_offsets.append(len(interchange_stops))
+
+    geometry_coordinates, geometry_offsets = flatten(geometries)
+
+    def times(arrays):
+        return np.concatenate(arrays).astype(np.int32) if arrays else np.zeros(0, dtype=np.int32)
+
+    return {
+        'mode_names': _strings(mode_names),
+        'mode_ways': _strings(mode_ways),
+        'line_names': _strings(line_names),
+        'line_mode': np.array(line_mode, dtype=np.int32),
+        'line_stop_offsets': np.array(line_stop_offsets, dtype=np.int64),
+        'line_stops': np.array(line_stops, dtype=np.int32),
+        'line_link_offsets': np.array(line_link_offsets, dtype=np.int64),
+        'stop_ids': _strings(stop.id for stop in stops),
+        'stop_names': _strings(stop.name for stop in stops),
+        'stop_locations': np.array([_location(stop.location) for stop in stops],
+                                   dtype=np.float64).reshape(-1, 2),
+        'stop_disused': np.array([bool(stop.disused) for stop in stops], dtype=np.bool_),
+        'link_stops': np.array(link_stops, dtype=np.int32).reshape(-1, 2),
+        'link_line': np.array(link_line, dtype=np.int32),
+        'link_distance': np.array(link_distance, dtype=np.float64),
+        'link_time': np.array(link_time, dtype=np.float64),
+        'geometry_offsets': geometry_offsets,
+        'geometry_coordinates': geometry_coordinates,
+        'interchange_offsets': np.array(interchange_offsets, dtype=np.int64),
+        'interchange_stops': np.array(interchange_stops, dtype=np.int32),
+        'pattern_ids': _strings(pattern_ids),
+        'pattern_line': np.array(pattern_line, dtype=np.int32),
+        'pattern_stop_offsets': np.array(pattern_stop_offsets, dtype=np.int64),
+        'pattern_stops': np.array(pattern_stops, dtype=np.int32),
+        'pattern_arrivals': times(pattern_arrivals),
+        'pattern_departures': times(pattern_departures),
+        'pattern_trip_offsets': np.array(pattern_trip_offsets, dtype=np.int64),
+        'trip_departures': times(trip_departures),
+        'trip_ids': _strings(trip_ids),
+    }
+
+
+class _ModeView(Mode):
+    """ Mode reading from NetworkArrays. """
+
+    def __init__(self, network, index):
+        self._network = network
+        self._index = index
+
+    @property
+    def name(self):
+        return str(self._network['mode_names'][self._index])
+
+    @property
+    def way(self):
+        return str(self._network['mode_ways'][self._index])
+
+    @property
+    def lines(self):
+        n = self._network
+        indices = np.flatnonzero(n['line_mode'] == self._index)
+        return {str(n['line_names'][l]):_LineView(n, l) for l in indices}
+
+
+class _LineView(Line):
+    """ Line reading from NetworkArrays. """
+
+    def __init__(self, network, index):
+        self._network = network
+        self._index = index
+
+    @property
+    def name(self):
+        return str(self._network['line_names'][self._index])
+
+    @property
+    def stops(self):
+        n = self._network
+        lo, hi = n['line_stop_offsets'][self._index:self._index+2]
+        stops = (_StopView(n, int(i)) for i in n['line_stops'][lo:hi])
+        return {stop.id:stop for stop in stops}
+
+    @property
+    def links(self):
+        n = self._network
+        lo, hi = n['line_link_offsets'][self._index:self._index+2]
+        return [_LinkView(n, k, self) for k in range(lo, hi)]
+
+    @property
+    def patterns(self):
+        n = self._network
+        patterns = [n._pattern(k, n.stop) for k in np.flatnonzero(n['pattern_line'] == self._index)]
+        for pattern in patterns:
+            pattern._line = self
+        return patterns
+
+
+class _StopView(Stop):
+    """ Stop reading from NetworkArrays. """
+
+    elevation = None
+
+    def __init__(self, network, index):
+        self._network = network
+        self._index = index
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def id(self):
+        return str(self._network['stop_ids'][self._index])
+
+    @property
+    def name(self):
+        return str(self._network['stop_names'][self._index])
+
+    @property
+    def location(self):
+        return self._network['stop_locations'][self._index]
+
+    @property
+    def disused(self):
+        return bool(self._network['stop_disused'][self._index])
+
+
+class _LinkView(Link):
+    """ Link reading from NetworkArrays. """
+
+    def __init__(self, network, index, line=None):
+        self._network = network
+        self._index = index
+        self._line = line if line is not None else _LineView(
+            network, int(network['link_line'][index]))
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def stop_1(self):
+        return _StopView(self._network, int(self._network['link_stops'][self._index, 0]))
+
+    @property
+    def stop_2(self):
+        return _StopView(self._network, int(self._network['link_stops'][self._index, 1]))
+
+    @property
+    def geometry(self):
+        return self._network.geometry(self._index)
+
+    @property
+    def distance(self):
+        d = self._network['link_distance'][self._index]
+        return None if np.isnan(d) else float(d)
+
+    @property
+    def time(self):
+        t = self._network['link_time'][self._index]
+        return None if np.isnan(t) else float(t)
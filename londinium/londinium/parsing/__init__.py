@@ -1,2 +1,2 @@
-from .read import read_repo_data_files, read_tfl_data
+from .read import read_repo_data_files, read_tfl_data, read_geojson_network
 from .datapaths import get_datapaths
@@ -0,0 +1 @@
+from .oyster import *
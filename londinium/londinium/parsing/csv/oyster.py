@@ -0,0 +1,281 @@
+""" For reading exports of Oyster card journeys. """
+
+import io
+import os
+import re
+import csv
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from ...network import ODMatrix, _sum_by_key
+from ...util.cached_property import cached_property
+
+
+DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+# Minutes after midnight starting the early, AM peak, inter-peak, PM peak
+# and evening bands
+TIME_BANDS = (0, 420, 600, 960, 1140)
+
+# Entry times are kept to this many minutes
+SLOT = 15
+
+# Station fields that are not stations
+NON_STATIONS = frozenset(['Bus', 'Unstarted', 'Unfinished', 'Not Applicable', ''])
+
+
+OysterRecords = namedtuple('OysterRecords',
+    ['stations', 'days', 'slots', 'origins', 'destinations', 'counts', 'rows', 'dropped']
+)
+
+
+class OysterJourneysFile(object):
+    """ Journeys of an Oyster export such as ``Nov09JnyExport.csv``, as
+    counts between stations.
+
+    The file is read ``chunk_bytes`` at a time, cut at line ends, and each
+    chunk is reduced to counts of journeys by day, :data:`SLOT` minutes of
+    entry, entry station and exit station before the next is read, so memory
+    is bounded by the chunk size and the number of distinct journeys rather
+    than by the file. With ``workers`` set, chunks are read in a pool of that
+    many processes. Their counts are merged in file order and sorted by key,
+    so the :attr:`records` are the same however the file was read, and may be
+    kept in a :class:`~londinium.util.cache.ParseCache`.
+
+    Station names are as in the file. :meth:`od_matrix` matches them to the
+    stops of a network and bins entry times into bands.
+
+    Args:
+        path:           CSV file with a header row.
+        cache:          :class:`~londinium.util.cache.ParseCache` for the records.
+        chunk_bytes:    Bytes read at a time.
+        workers:        Processes reading chunks, or None to read serially.
+    """
+
+    PARSER_VERSION = 1
+
+    COLUMNS = ('daytype', 'StartStn', 'EndStation', 'EntTime')
+
+    def __init__(self, path, cache=None, chunk_bytes=2**24, workers=None):
+        self.path = path
+        self.cache = cache
+        self.chunk_bytes = chunk_bytes
+        self.workers = workers
+
+    @cached_property
+    def records(self):
+        if self.cache is not None:
+            return self.cache.fetch(self.path, self, self._get_records)
+        return self._get_records()
+
+    def _get_records(self):
+        """ Journey counts keyed by day, slot, origin and destination.
+
+        Day ``d`` is ``DAYS[d]``, slot ``s`` is entry from ``s * SLOT``
+        minutes after midnight, and origins and destinations index the sorted
+        ``stations``. ``rows`` is the number of journeys read and ``dropped``
+        those without a known day or an entry time.
+        """
+
+        columns, ranges = self._chunks()
+        read = partial(_read_chunk, self.path, columns=columns)
+        if self.workers is None:
+            chunks = (read(r) for r in ranges)
+            return _merge(chunks)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            return _merge(pool.map(read, ranges))
+
+    def _chunks(self):
+        """ Column indices of :attr:`COLUMNS`, and byte ranges of whole lines. """
+
+        size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as f:
+            header = next(csv.reader([f.readline().decode('utf-8-sig')]))
+            start = f.tell()
+            bounds = [start]
+            while bounds[-1] < size:
+                f.seek(max(bounds[-1] + self.chunk_bytes, bounds[-1] + 1) - 1)
+                f.readline()
+                bounds.append(min(f.tell(), size))
+
+        header = [h.strip() for h in header]
+        missing = [c for c in self.COLUMNS if c not in header]
+        if missing:
+            raise ValueError('{} has no column {}.'.format(self.path, ', '.join(missing)))
+        columns = tuple(header.index(c) for c in self.COLUMNS)
+        return columns, list(zip(bounds[:-1], bounds[1:]))
+
+    @property
+    def stations(self):
+        return list(self.records.stations)
+
+    def station_stops(self, network, aliases=None):
+        """ Stop index of each of :attr:`stations` in ``network``, -1 if none.
+
+        Names are matched to stop names by :func:`station_key`, the first
+        stop taking a name. A name that does not match, such as one with a
+        line suffix like ``'Hammersmith D'``, is tried without its last word
+        if that word is a short code. ``aliases`` maps station names as in
+        the file to stop ids, and is tried first.
+        """
+
+        aliases = aliases or {}
+        by_key = {}
+        for i, name in enumerate(network['stop_names']):
+            by_key.setdefault(station_key(str(name)), i)
+
+        result = np.full(len(self.records.stations), -1, dtype=np.int64)
+        for k, name in enumerate(self.records.stations):
+            if name in aliases:
+                result[k] = network.stop_index[aliases[name]]
+                continue
+            if name in NON_STATIONS:
+                continue
+            key = station_key(name)
+            if key not in by_key:
+                head, _, last = key.rpartition(' ')
+                if head and len(last) <= 3:
+                    key = head
+            result[k] = by_key.get(key, -1)
+        return result
+
+    def unmatched(self, network, aliases=None):
+        """ List of (name, journeys) of stations not matched to a stop, most
+        journeys first.
+        """
+        r = self.records
+        stops = self.station_stops(network, aliases)
+        journeys = (np.bincount(r.origins, weights=r.counts, minlength=len(r.stations))
+                    + np.bincount(r.destinations, weights=r.counts, minlength=len(r.stations)))
+        missing = [k for k in np.flatnonzero(stops < 0) if r.stations[k] not in NON_STATIONS]
+        return sorted(((str(r.stations[k]), int(journeys[k])) for k in missing),
+                      key=lambda x: (-x[1], x[0]))
+
+    def od_matrix(self, network, band_starts=TIME_BANDS, days=None, aliases=None):
+        """ :class:`~londinium.network.ODMatrix` of journeys between the
+        stops of ``network``.
+
+        Journeys are put in bands by entry time. ``band_starts`` should be
+        multiples of :data:`SLOT`, and journeys entering before the first
+        band are left out, as are those at unmatched stations. ``days``
+        selects days by name from :data:`DAYS`.
+        """
+
+        r = self.records
+        stops = self.station_stops(network, aliases)
+        origins, destinations = stops[r.origins], stops[r.destinations]
+        bands = np.searchsorted(band_starts, r.slots.astype(np.int64) * SLOT, side='right') - 1
+
+        keep = (origins >= 0) & (destinations >= 0) & (bands >= 0)
+        if days is not None:
+            keep &= np.isin(r.days, [DAYS.index(d) for d in days])
+        return ODMatrix(bands[keep], origins[keep], destinations[keep], r.counts[keep],
+                        n_stops=network.n_stops, band_starts=band_starts)
+
+
+def station_key(name):
+    """ Station name lowercased with only letters, digits and single spaces,
+    and ``&`` spelled ``and``.
+    """
+    name = name.lower().replace('&', ' and ')
+    name = re.sub(r"[^a-z0-9 ]", '', name)
+    return ' '.join(name.split())
+
+
+# Bits of each field of a packed record key
+_BITS = (3, 8, 20, 20)
+_SHIFTS = (48, 40, 20, 0)
+
+
+def _read_chunk(path, bounds, columns):
+    """ Stations and packed keys with counts of the journeys in one byte
+    range. Module-level so it can run in a pool.
+    """
+
+    start, end = bounds
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8', errors='replace')
+
+    width = max(columns) + 1
+    fields = [[] for _ in columns]
+    appends = [(c, f.append) for c, f in zip(columns, fields)]
+    for row in csv.reader(io.StringIO(text)):
+        if len(row) >= width:
+            for c, append in appends:
+                append(row[c])
+    if not fields[0]:
+        return [], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), 0, 0
+
+    # Fields are interned once per distinct value rather than once per row
+    def intern(values, lookup):
+        table = {v: lookup(v.strip()) for v in sorted(set(values))}
+        return np.fromiter(map(table.__getitem__, values), dtype=np.int64, count=len(values))
+
+    day_index = {d: i for i, d in enumerate(DAYS)}
+    days = intern(fields[0], lambda v: day_index.get(v, -1))
+    names = {}
+    origins = intern(fields[1], lambda v: names.setdefault(v, len(names)))
+    destinations = intern(fields[2], lambda v: names.setdefault(v, len(names)))
+    slots = intern(fields[3], lambda v: int(v) // SLOT if v.isdigit() else -1)
+
+    keep = (days >= 0) & (slots >= 0) & (slots < 2**_BITS[1])
+    keys = ((days << _SHIFTS[0]) | (slots << _SHIFTS[1])
+            | (origins << _SHIFTS[2]) | destinations)[keep]
+    keys, counts = _sum_by_key(keys, np.ones(len(keys), dtype=np.int64))
+    return list(names), keys, counts, len(keep), int(np.sum(~keep))
+
+
+def _unpack(keys):
+    return [(keys >> shift) & ((1 << bits) - 1) for bits, shift in zip(_BITS, _SHIFTS)]
+
+
+def _merge(chunks):
+    """ :class:`OysterRecords` of chunks of :func:`_read_chunk`, in order.
+
+    Chunks are summed into the running total once they hold as many entries
+    as it does, so that each entry is sorted a logarithmic number of times.
+    """
+
+    names = {}
+    keys, counts = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    pending, n_pending = [], 0
+    rows = dropped = 0
+    for chunk_names, chunk_keys, chunk_counts, chunk_rows, chunk_dropped in chunks:
+        local = np.array([names.setdefault(n, len(names)) for n in chunk_names] or [0],
+                         dtype=np.int64)
+        day, slot, o, d = _unpack(chunk_keys)
+        pending.append(((day << _SHIFTS[0]) | (slot << _SHIFTS[1])
+                        | (local[o] << _SHIFTS[2]) | local[d], chunk_counts))
+        n_pending += len(chunk_keys)
+        rows += chunk_rows
+        dropped += chunk_dropped
+        if n_pending >= len(keys):
+            keys, counts = _sum_by_key(np.concatenate([keys] + [k for k, _ in pending]),
+                                       np.concatenate([counts] + [c for _, c in pending]))
+            pending, n_pending = [], 0
+
+    keys = np.concatenate([keys] + [k for k, _ in pending])
+    counts = np.concatenate([counts] + [c for _, c in pending])
+
+    # Renumber stations in name order, so records do not depend on chunking
+    stations = sorted(names)
+    rank = np.zeros(max(len(names), 1), dtype=np.int64)
+    rank[[names[n] for n in stations]] = np.arange(len(stations))
+    day, slot, o, d = _unpack(keys)
+    keys, counts = _sum_by_key((day << _SHIFTS[0]) | (slot << _SHIFTS[1])
+                               | (rank[o] << _SHIFTS[2]) | rank[d], counts)
+    day, slot, o, d = _unpack(keys)
+
+    return OysterRecords(
+        stations=np.array(stations, dtype=np.str_),
+        days=day.astype(np.int8),
+        slots=slot.astype(np.int16),
+        origins=o.astype(np.int32),
+        destinations=d.astype(np.int32),
+        counts=counts,
+        rows=rows,
+        dropped=dropped
+    )
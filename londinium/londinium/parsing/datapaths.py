@@ -10,7 +10,7 @@ from collections import namedtuple
 from abc import abstractmethod
 
 from .json import DisusedStationsFile, OSIFile
-from .geojson import GeoJSONLinesFile, GeoJSONStationsFile
+from .geojson import GeoJSONAreasFile, GeoJSONLinesFile, GeoJSONStationsFile
 
 
 def get_datapaths(tfl_data_basedir, repo_data_basedir,
@@ -150,9 +150,9 @@ class RepoDataPaths(_DataPaths):
             nr=(self.abspath(rail_lines), GeoJSONLinesFile)
         )
         self.areas=self.AreasPaths(
-            london=(self.abspath(greater_london), None),
-            river=(self.abspath(river_thames), None),
-            zones=(self.abspath(zone_boundaries), None)
+            london=(self.abspath(greater_london), GeoJSONAreasFile),
+            river=(self.abspath(river_thames), GeoJSONAreasFile),
+            zones=(self.abspath(zone_boundaries), GeoJSONAreasFile)
         )
         self.osis = self.OSIPaths(
             json=(self.abspath(osis_json), OSIFile),
@@ -1,4 +1,157 @@
 """ For reading geojson files containing areas. """
 
 import geojson
-from collections import defaultdict
+import numpy as np
+from collections import namedtuple
+from ...geodesy.spatial import BoundingBoxIndex, PolygonIndex
+from ...util.cached_property import cached_property
+
+
+GeoJSONAreasRecords = namedtuple('GeoJSONAreasRecords',
+    ['properties', 'coordinates', 'rings', 'polygons', 'areas']
+)
+
+
+class GeoJSONAreasFile(object):
+    """ Polygons and multipolygons, such as fare zones or the Thames.
+
+    The file may hold a feature collection or a single feature. Every ring of
+    every area is kept in one flat buffer, with per-area bounding boxes and a
+    :class:`~londinium.geodesy.spatial.PolygonIndex` of the edges built on
+    first use, so that whole arrays of points can be placed at once.
+    """
+
+    PARSER_VERSION = 1
+
+    def __init__(self, path, cache=None):
+        self.path = path
+        self.cache = cache
+
+    @cached_property
+    def root(self):
+        return self._get_root()
+
+    def _get_root(self):
+        with open(self.path, 'r') as f:
+            root = geojson.load(f)
+        return root
+
+    @cached_property
+    def records(self):
+        if self.cache is not None:
+            return self.cache.fetch(self.path, self, self._get_records)
+        return self._get_records()
+
+    def _get_records(self):
+        """ Feature properties, with every ring in one flat buffer.
+
+        Ring ``r`` has coordinates ``coordinates[rings[r]:rings[r+1]]``,
+        polygon ``p`` has rings ``polygons[p]:polygons[p+1]``, outer ring
+        first, and area ``a`` has polygons ``areas[a]:areas[a+1]``.
+        """
+
+        root = self.root
+        features = root.features if root.type == 'FeatureCollection' else [root]
+
+        rings, polygon_counts, area_counts = [], [], []
+        for f in features:
+            if f.geometry.type == 'Polygon':
+                polygons = [f.geometry.coordinates]
+            elif f.geometry.type == 'MultiPolygon':
+                polygons = f.geometry.coordinates
+            else:
+                polygons = []
+            for polygon in polygons:
+                rings.extend(np.reshape(ring, (-1, 2)) for ring in polygon)
+                polygon_counts.append(len(polygon))
+            area_counts.append(len(polygons))
+
+        def offsets(counts):
+            result = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=result[1:])
+            return result
+
+        return GeoJSONAreasRecords(
+            properties=[dict(f.properties or {}) for f in features],
+            coordinates=(np.concatenate(rings).astype(np.float64) if rings
+                         else np.zeros((0, 2))),
+            rings=offsets([len(r) for r in rings]),
+            polygons=offsets(polygon_counts),
+            areas=offsets(area_counts)
+        )
+
+    @cached_property
+    def ring_areas(self):
+        """ Area of each ring. """
+        r = self.records
+        polygon_areas = np.repeat(np.arange(len(r.areas) - 1), np.diff(r.areas))
+        return np.repeat(polygon_areas, np.diff(r.polygons))
+
+    @cached_property
+    def bboxes(self):
+        """ (A, 2, 2) bounding box ``[[x_min, x_max], [y_min, y_max]]`` of each area. """
+        index = self.bbox_index
+        lo, hi = index.levels[0]
+        result = np.empty((len(index), 2, 2))
+        result[index.order, :, 0] = lo
+        result[index.order, :, 1] = hi
+        return result
+
+    @cached_property
+    def bbox_index(self):
+        """ :class:`~londinium.geodesy.spatial.BoundingBoxIndex` of the areas. """
+        r = self.records
+        # Each area's rings are contiguous, so its coordinates are too
+        vertex_offsets = r.rings[r.polygons[r.areas]]
+        return BoundingBoxIndex.from_ragged(r.coordinates, vertex_offsets)
+
+    @cached_property
+    def polygon_index(self):
+        """ :class:`~londinium.geodesy.spatial.PolygonIndex` of the areas' edges. """
+        r = self.records
+        return PolygonIndex(r.coordinates, r.rings, self.ring_areas,
+                            n_areas=len(r.areas) - 1)
+
+    def contains(self, points):
+        """ (N, A) whether each of (N, 2) longitudes and latitudes is in each area. """
+        return self.polygon_index.contains(points)
+
+    def locate(self, points):
+        """ Index of the first area containing each point, -1 if none does. """
+        return self.polygon_index.locate(points)
+
+    @property
+    def areas(self):
+        return self._get_areas()
+
+    def _get_areas(self):
+        r = self.records
+        for i, properties in enumerate(r.properties):
+            polygons = []
+            for p in range(r.areas[i], r.areas[i+1]):
+                polygons.append([r.coordinates[r.rings[k]:r.rings[k+1]]
+                                 for k in range(r.polygons[p], r.polygons[p+1])])
+            yield self._Area(properties, polygons, self.bboxes[i])
+
+
+    class _Area(object):
+        """"""
+
+        def __init__(self, properties, polygons, bbox):
+            self.e = properties
+            self._polygons = polygons
+            self._bbox = bbox
+
+        @property
+        def name(self):
+            if 'name' in self.e:
+                return self.e['name']
+
+        @property
+        def polygons(self):
+            """ List of polygons, each a list of (N, 2) rings, outer ring first. """
+            return self._polygons
+
+        @property
+        def bbox(self):
+            return self._bbox
@@ -1,15 +1,25 @@
 """ For reading geojson files containing lines. """
 
 import geojson
-from collections import defaultdict
+import numpy as np
+from collections import defaultdict, namedtuple
+from ...geodesy.spatial import BoundingBoxIndex
 from ...util.cached_property import cached_property
 
 
+GeoJSONLinesRecords = namedtuple('GeoJSONLinesRecords',
+    ['properties', 'coordinates', 'offsets']
+)
+
+
 class GeoJSONLinesFile(object):
     """"""
 
-    def __init__(self, path):
+    PARSER_VERSION = 3
+
+    def __init__(self, path, cache=None):
         self.path = path
+        self.cache = cache
 
     @cached_property
     def root(self):
@@ -20,13 +30,45 @@ class GeoJSONLinesFile(object):
             root = geojson.load(f)
         return root
 
+    @cached_property
+    def records(self):
+        if self.cache is not None:
+            return self.cache.fetch(self.path, self, self._get_records)
+        return self._get_records()
+
+    def _get_records(self):
+        """ Feature properties, with every geometry in one flat buffer.
+
+        Feature ``i`` has coordinates ``coordinates[offsets[i]:offsets[i+1]]``.
+        """
+        features = self.root.features
+        geometries = [np.reshape(f.geometry.coordinates, (-1, 2)) for f in features]
+        offsets = np.zeros(len(geometries) + 1, dtype=np.int64)
+        np.cumsum([len(g) for g in geometries], out=offsets[1:])
+        coordinates = np.concatenate(geometries or [np.zeros((0, 2))]).astype(np.float64)
+        return GeoJSONLinesRecords(
+            properties=[dict(f.properties) for f in features],
+            coordinates=coordinates,
+            offsets=offsets
+        )
+
+    @cached_property
+    def bbox_index(self):
+        """ :class:`~londinium.geodesy.spatial.BoundingBoxIndex` of the
+        features, in the order of :attr:`links`.
+        """
+        r = self.records
+        return BoundingBoxIndex.from_ragged(r.coordinates, r.offsets)
+
     @property
     def links(self):
         return self._get_links()
 
     def _get_links(self):
-        for feature in self.root.features:
-            yield self._Link(feature)
+        r = self.records
+        for i, properties in enumerate(r.properties):
+            s = slice(r.offsets[i], r.offsets[i+1])
+            yield self._Link(properties, r.coordinates[s])
 
     @property
     def lines(self):
@@ -45,24 +87,25 @@ class GeoJSONLinesFile(object):
     class _Link(object):
         """"""
 
-        def __init__(self, e):
-            self.e = e
+        def __init__(self, properties, geometry):
+            self.e = properties
+            self._geometry = geometry
 
         @property
         def id(self):
-            return self.e.properties['id']
+            return self.e['id']
 
         @property
         def link_lines(self):
             return self._get_link_lines()
 
         def _get_link_lines(self):
-            for line in self.e.properties['lines']:
+            for line in self.e['lines']:
                 yield self._LinkLine(line)
 
         @property
         def geometry(self):
-            return self.e.geometry.coordinates
+            return self._geometry
 
         class _LinkLine(object):
             """"""
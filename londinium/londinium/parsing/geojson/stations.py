@@ -1,15 +1,24 @@
 """ For reading geojson files containing stations. """
 
 import geojson
-from collections import defaultdict
+import numpy as np
+from collections import defaultdict, namedtuple
 from ...util.cached_property import cached_property
 
 
+GeoJSONStationsRecords = namedtuple('GeoJSONStationsRecords',
+    ['properties', 'coordinates']
+)
+
+
 class GeoJSONStationsFile(object):
     """"""
 
-    def __init__(self, path):
+    PARSER_VERSION = 1
+
+    def __init__(self, path, cache=None):
         self.path = path
+        self.cache = cache
 
     @cached_property
     def root(self):
@@ -20,64 +29,85 @@ class GeoJSONStationsFile(object):
             root = geojson.load(f)
         return root
 
+    @cached_property
+    def records(self):
+        if self.cache is not None:
+            return self.cache.fetch(self.path, self, self._get_records)
+        return self._get_records()
+
+    def _get_records(self):
+        """ Feature properties, with station locations as an (N, 2) array. """
+        features = self.root.features
+        return GeoJSONStationsRecords(
+            properties=[dict(f.properties) for f in features],
+            coordinates=np.array([f.geometry.coordinates for f in features], dtype=np.float64)
+        )
+
     @property
     def stations(self):
         return self._get_stations()
 
     def _get_stations(self):
-        for feature in self.root.features:
-            yield self._Station(feature)
+        r = self.records
+        for properties, location in zip(r.properties, r.coordinates):
+            yield self._Station(properties, location)
 
 
     class _Station(object):
         """"""
 
-        def __init__(self, e):
-            self.e = e
+        def __init__(self, properties, location):
+            self.e = properties
+            self._location = location
 
         @property
         def id(self):
-            return self.e.properties['id']
+            return self.e['id']
 
         @property
         def alt_id(self):
-            if 'alt_id' in self.e.properties:
-                return self.e.properties['alt_id']
+            if 'alt_id' in self.e:
+                return self.e['alt_id']
 
         @property
         def nlc_id(self):
-            if 'nlc_id' in self.e.properties:
-                return self.e.properties['nlc_id']
+            if 'nlc_id' in self.e:
+                return self.e['nlc_id']
+
+        @property
+        def tlc_id(self):
+            if 'tlc_id' in self.e:
+                return self.e['tlc_id']
 
         @property
         def other_mode_ids(self):
             ids = []
-            if 'altmodeid' in self.e.properties:
-                ids.append(self.e.properties['altmodeid'])
-            if 'altmodeid2' in self.e.properties:
-                ids.append(self.e.properties['altmodeid2'])
+            if 'altmodeid' in self.e:
+                ids.append(self.e['altmodeid'])
+            if 'altmodeid2' in self.e:
+                ids.append(self.e['altmodeid2'])
             return ids
 
         @property
         def name(self):
-            return self.e.properties['name']
+            return self.e['name']
 
         @property
         def lines(self):
-            return list(line['name'] for line in self.e.properties['lines'])
+            return list(line['name'] for line in self.e['lines'])
 
         @property
         def cartography(self):
-            c = self.e.properties['cartography']
+            c = self.e['cartography']
             name = c['display_name'] if 'display_name' in c else self.name
-            x = c.labelX if 'labelX' in c else 0
-            y = c.labelY if 'labelY' in c else 0
+            x = c['labelX'] if 'labelX' in c else 0
+            y = c['labelY'] if 'labelY' in c else 0
             return {name: (x,y)}
 
         @property
         def zone(self):
-            return self.e.properties['zone']
+            return self.e['zone']
 
         @property
         def location(self):
-            return self.e.geometry.coordinates
+            return self._location
@@ -7,12 +7,17 @@ from ...util.cached_property import cached_property
 class DisusedStationsFile(object):
     """"""
 
-    def __init__(self, path):
+    PARSER_VERSION = 1
+
+    def __init__(self, path, cache=None):
         self.path = path
+        self.cache = cache
 
 
     @cached_property
     def root(self):
+        if self.cache is not None:
+            return self.cache.fetch(self.path, self, self._get_root)
         return self._get_root()
 
     def _get_root(self):
@@ -51,7 +56,7 @@ class DisusedStationsFile(object):
         @property
         def location(self):
             lat, long = self.e['coordinates'].split()
-            return (float(lat), float(long))
+            return (float(long), float(lat))
 
         @property
         def date_closed(self):
@@ -7,13 +7,18 @@ from ...util.cached_property import cached_property
 class OSIFile(object):
     """"""
 
-    def __init__(self, path, format='json'):
+    PARSER_VERSION = 1
+
+    def __init__(self, path, format='json', cache=None):
         self.path = path
         self.format='json'
+        self.cache = cache
 
 
     @cached_property
     def root(self):
+        if self.cache is not None:
+            return self.cache.fetch(self.path, self, self._get_root)
         return self._get_root()
 
     def _get_root(self):
@@ -1,32 +1,117 @@
 """ Handle files of known structure into objects for easy data access. """
 
+import numpy as np
 from glob import glob
 from .transxchange.files import TransXChangeFile, TransXChangeLinesFromFiles
 from .json import DisusedStationsFile, OSIFile
 from .geojson import GeoJSONLinesFile, GeoJSONStationsFile
-# from ..network import Mode #, Line, Section, Stop, Link, Interchange, Pattern
+from ..network import Mode, Line, Stop, Link #, Section, Interchange, Pattern
+from ..geodesy.projections import NationalGrid
 
 
-def read_repo_data_files(*paths):
-    """ Obtain file-parsing objects from data paths"""
+TFL_MODE_WAYS = {
+    'boat': 'river',
+    'bus': 'road',
+    'cablecar': 'cable',
+    'dlr': 'rail',
+    'tram': 'rail',
+    'underground': 'rail',
+}
+
+
+def read_repo_data_files(*paths, cache=None):
+    """ Obtain file-parsing objects from data paths, optionally sharing a
+    :class:`~londinium.util.cache.ParseCache` between them. """
 
     files = []
     for path, parser in paths:
-        files.append(parser(path))
+        files.append(parser(path, cache=cache))
 
     return files
 
 
-def read_tfl_data():
-    """ Work in progress. """
+def read_tfl_data(tfl_paths, modes=tuple(TFL_MODE_WAYS), streaming=True, workers=None,
+                  cache=None, day=None):
+    """ Build a Mode per TfL timetable folder from its TransXChange files.
+
+    Timetables are streamed by default so that the bus files, which are too
+    large to hold as whole trees, can be read alongside the others. Set
+    ``workers`` to parse each mode's files in a process pool, ``cache`` to
+    reuse records extracted on earlier runs, and ``day`` to keep only the
+    journeys running on that day of the week.
+    """
 
-    modes = dict()
+    result = dict()
 
-    for m in ('boat', 'cablecar', 'dlr', 'tram', 'underground'): # 'bus',
+    for m in modes:
 
-        paths = glob(DPATHS.tfl.timetables._asdict()[m])
+        paths = sorted(glob(tfl_paths.timetables._asdict()[m]))
 
-        mode = modes[m] = Mode(name=m, way='rail')
-        txc = TransXChangeLinesFromFiles(paths)
+        mode = result[m] = Mode(name=m, way=TFL_MODE_WAYS[m])
+        txc = TransXChangeLinesFromFiles(paths, streaming=streaming, workers=workers,
+                                         cache=cache, day=day)
 
         for line in txc.network: mode.add_line(line)
+
+    return result
+
+
+def read_geojson_network(lines_file, stations_file, name='tfl', way='rail',
+                         projection=NationalGrid()):
+    """ Build a Mode from GeoJSON lines whose links name their end stations.
+
+    Stops are shared between lines, and may be referred to by any of their
+    other-mode ids. Links that are closed, or whose ends are not in
+    ``stations_file``, are left out. Link distances are measured along the
+    geometry as projected by ``projection``.
+    """
+
+    stops = dict()
+    for station in stations_file.stations:
+        stop = Stop(id=station.id, name=station.name, location=tuple(station.location))
+        stops[station.id] = stop
+        for alt_id in station.other_mode_ids:
+            stops.setdefault(alt_id, stop)
+
+    mode = Mode(name=name, way=way)
+
+    for geo_line in lines_file.lines:
+
+        line = Line(name=geo_line.name)
+
+        for geo_link in geo_line.links:
+            for link_line in geo_link.link_lines:
+                if link_line.name != geo_line.name:
+                    continue
+                if 'closed' in link_line.e or 'start_sid' not in link_line.e:
+                    continue
+
+                start, end = link_line.endpoints[:2]
+                if start not in stops or end not in stops:
+                    continue
+                stop_1, stop_2 = stops[start], stops[end]
+
+                geometry = geo_link.geometry
+                if (np.linalg.norm(np.subtract(geometry[0], stop_1.location)) >
+                    np.linalg.norm(np.subtract(geometry[-1], stop_1.location))):
+                    geometry = geometry[::-1]
+                en = projection.ll_to_en(geometry)
+                ends = projection.ll_to_en([stop_1.location, stop_2.location])
+
+                # Some geometries are stubs, much shorter than the link
+                distance = max(np.sum(np.linalg.norm(np.diff(en, axis=0), axis=1)),
+                               np.linalg.norm(ends[1] - ends[0]))
+
+                line.add_stop(stop_1)
+                line.add_stop(stop_2)
+                line.add_link(Link(
+                    stop_1=stop_1,
+                    stop_2=stop_2,
+                    distance=float(distance),
+                    geometry=geometry
+                ))
+
+        if line.links:
+            mode.add_line(line)
+
+    return mode
@@ -1,5 +1,62 @@
 """ For parsing TransXChange xml files. Deliberately incomplete. """
 
+import re
+
+
+DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# Days meant by each child element of DaysOfWeek
+DAYS_OF_WEEK = dict({day:(day,) for day in DAYS},
+    MondayToFriday=DAYS[:5],
+    MondayToSaturday=DAYS[:6],
+    MondayToSunday=DAYS,
+    Weekend=DAYS[5:],
+    NotMonday=DAYS[1:],
+    NotTuesday=DAYS[:1] + DAYS[2:],
+    NotWednesday=DAYS[:2] + DAYS[3:],
+    NotThursday=DAYS[:3] + DAYS[4:],
+    NotFriday=DAYS[:4] + DAYS[5:],
+    NotSaturday=DAYS[:5] + DAYS[6:],
+    NotSunday=DAYS[:6],
+)
+
+DURATION = re.compile(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d*)?)S)?)?$')
+
+
+def duration(text):
+    """ Whole seconds of an ISO 8601 duration such as ``PT1H2M30S``, 0 if missing. """
+    if not text:
+        return 0
+    match = DURATION.match(text.strip())
+    if match is None:
+        raise ValueError('Cannot read duration {!r}.'.format(text))
+    d, h, m, s = (float(x) if x else 0 for x in match.groups())
+    return int(round(((d * 24 + h) * 60 + m) * 60 + s))
+
+
+def number(text):
+    """ Float of a numeric field, None if it is missing or empty. """
+    if text is None or not text.strip():
+        return None
+    return float(text)
+
+
+def time_of_day(text):
+    """ Seconds after midnight of a time such as ``06:10:00``. """
+    h, m, s = (int(x) for x in text.strip().split(':'))
+    return (h * 60 + m) * 60 + s
+
+
+def operating_days(e, ns):
+    """ Days of the week in the OperatingProfile of an element, or None if
+    it has none.
+    """
+    days = e.find('./ns:OperatingProfile/ns:RegularDayType/ns:DaysOfWeek', namespaces=ns)
+    if days is None:
+        return None
+    names = (x.tag.rpartition('}')[2] for x in days)
+    return frozenset(day for name in names for day in DAYS_OF_WEEK.get(name, ()))
+
 
 class TXCStopPoint(object):
     def __init__(self, e, ns):
@@ -7,7 +64,9 @@ class TXCStopPoint(object):
         self.name = e.find('ns:Descriptor', namespaces=ns).findtext('ns:CommonName', namespaces=ns)
 
         self.locality = e.findtext('./ns:Place/ns:NptgLocalityRef', namespaces=ns)
-        self.location = (e.findtext('./ns:Place/ns:Location/ns:Easting', namespaces=ns), e.findtext('./ns:Place/ns:Location/ns:Northing', namespaces=ns))
+        # National Grid easting and northing, None where missing
+        self.location = (number(e.findtext('./ns:Place/ns:Location/ns:Easting', namespaces=ns)),
+                         number(e.findtext('./ns:Place/ns:Location/ns:Northing', namespaces=ns)))
 
 
 class TXCRouteSection(object):
@@ -20,7 +79,7 @@ class TXCRouteSection(object):
             self.id = e.get('id')
             self.fra = e.findtext('./ns:From/ns:StopPointRef', namespaces=ns)
             self.to = e.findtext('./ns:To/ns:StopPointRef', namespaces=ns)
-            self.distance = e.findtext('ns:Distance', namespaces=ns)
+            self.distance = number(e.findtext('ns:Distance', namespaces=ns))
             self.direction = e.findtext('ns:Direction',namespaces= ns)
 
 
@@ -32,6 +91,33 @@ class TXCRoute(object):
         self.route_sections = [x.text for x in e.findall('ns:RouteSectionRef', namespaces=ns)]
 
 
+class TXCJourneyPatternSection(object):
+    def __init__(self, e, ns):
+        self.id = e.get('id')
+        self.timing_links = [self.TXCJourneyPatternTimingLink(x, ns)
+                             for x in e.findall('ns:JourneyPatternTimingLink', namespaces=ns)]
+
+    class TXCJourneyPatternTimingLink(object):
+        def __init__(self, e, ns):
+            self.id = e.get('id')
+            self.fra = e.findtext('./ns:From/ns:StopPointRef', namespaces=ns)
+            self.to = e.findtext('./ns:To/ns:StopPointRef', namespaces=ns)
+            self.fra_wait = duration(e.findtext('./ns:From/ns:WaitTime', namespaces=ns))
+            self.to_wait = duration(e.findtext('./ns:To/ns:WaitTime', namespaces=ns))
+            self.run_time = duration(e.findtext('ns:RunTime', namespaces=ns))
+            self.route_link = e.findtext('ns:RouteLinkRef', namespaces=ns)
+
+
+class TXCVehicleJourney(object):
+    def __init__(self, e, ns):
+        self.id = e.findtext('ns:VehicleJourneyCode', namespaces=ns)
+        self.journey_pattern = e.findtext('ns:JourneyPatternRef', namespaces=ns)
+        self.departure_time = time_of_day(e.findtext('ns:DepartureTime', namespaces=ns))
+
+        # Days of the week it runs, or None if it follows the service's
+        self.days = operating_days(e, ns)
+
+
 class TXCService(object):
     def __init__(self, e, ns):
         self.id = e.findtext('ns:ServiceCode', namespaces=ns)
@@ -49,8 +135,14 @@ class TXCService(object):
 
         self.operator = e.findtext('ns:RegisteredOperatorRef', namespaces=ns)
 
+        # Days of the week its journeys run by default, or None for every day
+        self.days = operating_days(e, ns)
+
         self.description = e.findtext('ns:Description', namespaces=ns)
 
+        patterns = e.findall('./ns:StandardService/ns:JourneyPattern', namespaces=ns)
+        self.journey_patterns = {x.id:x for x in (self.TXCJourneyPattern(p, ns) for p in patterns)}
+
         if any((l.id != self.id) for l in [self.line]):
             raise ValueError('line ids do not match')
 
@@ -61,3 +153,10 @@ class TXCService(object):
         def __init__(self, e, ns):
             self.id = e.get('id')
             self.name = e.findtext('ns:LineName', namespaces=ns)
+
+    class TXCJourneyPattern(object):
+        def __init__(self, e, ns):
+            self.id = e.get('id')
+            self.direction = e.findtext('ns:Direction', namespaces=ns)
+            self.route = e.findtext('ns:RouteRef', namespaces=ns)
+            self.sections = [x.text for x in e.findall('ns:JourneyPatternSectionRefs', namespaces=ns)]
@@ -1,16 +1,23 @@
 """ Script for plotting a transformed tube map. """
 
+import os.path
 import numpy as np
 import matplotlib.pyplot as plt
 
 from londinium.parsing import get_datapaths, read_repo_data_files
+from londinium.util.cache import ParseCache
 from londinium.plotting.styles import line_colour_map, line_plot_order
 from londinium.plotting.plotter import Canvas
+from londinium.plotting.cache import ProjectedGeometryCache
 from londinium.plotting.distortions import PolarDistortion
 
 
 TFL_DATA_BASEDIR = '/mnt/c/Users/magic/Datasets/TfL'
 REPO_DATA_BASEDIR = './data'
+PARSE_CACHE_DIR = os.path.expanduser('~/.cache/londinium')
+
+# Kept across calls to main, so redrawing under a new distortion reuses projections
+GEOMETRY_CACHE = ProjectedGeometryCache()
 
 DPATHS = get_datapaths(
     tfl_data_basedir=TFL_DATA_BASEDIR,
@@ -18,7 +25,7 @@ DPATHS = get_datapaths(
 )
 
 
-def main():
+def main(distortion=PolarDistortion()):
     
     (nr_lines, tfl_lines, nr_all_stations, nr_z16_stations, tfl_stations, disused_stations, osis) = read_repo_data_files(
         DPATHS.repo.lines.nr,
@@ -27,22 +34,25 @@ def main():
         DPATHS.repo.stations.nr.z16,
         DPATHS.repo.stations.tfl,
         DPATHS.repo.stations.disused,
-        DPATHS.repo.osis.json
+        DPATHS.repo.osis.json,
+        cache=ParseCache(PARSE_CACHE_DIR)
     )
 
 
     tfl_lookup = {x.id:x for x in tfl_stations.stations}
 
-    canvas = Canvas(distortion=PolarDistortion(),figsize=(20,30),
-    dpi=150)
+    canvas = Canvas(distortion=distortion,figsize=(20,30),
+    dpi=150, geometry_cache=GEOMETRY_CACHE)
 
-    for line in tfl_lines.lines:
-        for link in line.links:
-            canvas.plot(link.geometry,
-                    color=line_colour_map[line.name].hex,
-                    lw=1.2,
-                    zorder=line_plot_order.index(line.name))
+    links = [(line.name, link) for line in tfl_lines.lines for link in line.links]
+    canvas.plot_lines([link.geometry for _, link in links],
+            ids=[('tfl', link.id) for _, link in links],
+            lod=True,
+            colors=[line_colour_map[name].hex for name, _ in links],
+            linewidths=1.2,
+            zorders=[line_plot_order.index(name) for name, _ in links])
 
+    colors, sizes, edges, zorders = [], [], [], []
     for station in tfl_stations.stations:
         if len(station.lines) > 1 or station.name in osis.stations:
             color = '#FFFFFF'
@@ -54,44 +64,50 @@ def main():
             size = 2
             edge = color
             z = line_plot_order.index(station.lines[0])
-
-        canvas.plot(station.location,
-                mfc=color,
-                mec=edge,
-                marker='o',
-                ms=size,
-                zorder=z)
-
-
-    for station in disused_stations.stations:
-        canvas.plot(station.location,
-                mfc='#888888',
-                mec='#888888',
-                marker='o',
-                ms=2,
-                zorder=99)
-
-
-    for osi in osis.osis:
-        segment = [tfl_lookup[osi.a].location] + [tfl_lookup[osi.b].location]
-        canvas.plot(segment,
-                color='#000000',
-                lw=3,
-                zorder=97)
-        canvas.plot(segment,
-                color='#FFFFFF',
-                lw=1,
-                zorder=99)
-
-
-    for nr_link in nr_lines.links:
-        canvas.plot(
-            nr_link.geometry,
+        colors.append(color)
+        sizes.append(size)
+        edges.append(edge)
+        zorders.append(z)
+
+    canvas.plot_points([station.location for station in tfl_stations.stations],
+            ids=[('tfl', station.id) for station in tfl_stations.stations],
+            colors=colors,
+            edgecolors=edges,
+            sizes=sizes,
+            zorders=zorders)
+
+
+    canvas.plot_points([station.location for station in disused_stations.stations],
+            ids=[('disused', station.id) for station in disused_stations.stations],
+            colors='#888888',
+            sizes=2,
+            zorders=99)
+
+
+    segments = [[tfl_lookup[osi.a].location, tfl_lookup[osi.b].location] for osi in osis.osis]
+    segment_ids = [('osi', osi.a, osi.b) for osi in osis.osis]
+    canvas.plot_lines(segments,
+            ids=segment_ids,
+            colors='#000000',
+            linewidths=3,
+            zorders=97)
+    canvas.plot_lines(segments,
+            ids=segment_ids,
+            colors='#FFFFFF',
+            linewidths=1,
+            zorders=99)
+
+
+    # National Rail links have no ids, so go by their position in the file
+    nr_links = list(nr_lines.links)
+    canvas.plot_lines([nr_link.geometry for nr_link in nr_links],
+            ids=[('nr', k) for k in range(len(nr_links))],
+            lod=True,
             check_bbox=True,
-            color='#DDDDDD',
-            lw=1,
-            zorder=line_plot_order.index('National Rail')
-        )
+            bbox_index=nr_lines.bbox_index,
+            colors='#DDDDDD',
+            linewidths=1,
+            zorders=line_plot_order.index('National Rail'))
 
     canvas.show()
 
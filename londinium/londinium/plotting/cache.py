@@ -0,0 +1,72 @@
+""" In-memory cache of projected geometry, so redrawing only re-distorts. """
+
+from collections import OrderedDict
+
+from ..util.ragged import flatten, split
+
+
+class ProjectedGeometryCache(object):
+    """ Least-recently-used store of projected geometries.
+
+    Entries are keyed by a feature id together with the projection, so the
+    same feature drawn under two projections is held twice, and a projection
+    compares equal to another with the same parameters. When the stored
+    coordinates exceed ``max_points``, the least recently used are evicted.
+
+    Args:
+        max_points: Most coordinates to hold across all entries.
+    """
+
+    def __init__(self, max_points=2**23):
+        self.max_points = max_points
+        self.n_points = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def project(self, ids, geometries, projection):
+        """ Projected (N, 2) geometries, projecting only those not stored.
+
+        Misses are projected together in one ragged call. ``geometries`` are
+        only read for misses, so may be a lazy sequence indexed like ``ids``.
+        """
+
+        keys = [(i, projection) for i in ids]
+        missing = [k for k, key in enumerate(keys) if key not in self._entries]
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+
+        if missing:
+            coordinates, offsets = flatten([geometries[k] for k in missing])
+            projected = split(*projection.ll_to_en_ragged(coordinates, offsets))
+            for k, geometry in zip(missing, projected):
+                self._store(keys[k], geometry)
+
+        result = []
+        for key in keys:
+            self._entries.move_to_end(key)
+            result.append(self._entries[key])
+        self._evict()
+        return result
+
+    def _store(self, key, geometry):
+        # A copy, so evicting an entry frees it apart from its batch
+        geometry = geometry.copy()
+        geometry.flags.writeable = False
+        self._entries[key] = geometry
+        self.n_points += len(geometry)
+
+    def _evict(self):
+        while self.n_points > self.max_points and self._entries:
+            _, geometry = self._entries.popitem(last=False)
+            self.n_points -= len(geometry)
+
+    def clear(self):
+        self._entries.clear()
+        self.n_points = 0
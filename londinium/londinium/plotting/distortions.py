@@ -3,6 +3,9 @@
 import numpy as np
 from abc import abstractmethod
 
+from ..geodesy.spatial import SpatialIndex
+from ..util.cached_property import cached_property
+
 
 class Distortion(object):
     """ Some transformation to apply to spatial geometries before plotting."""
@@ -49,3 +52,397 @@ class PolarDistortion(Distortion):
 
     def radial_transform(self, r):
         return self._radial_transform(r)
+
+
+class GridDistortion(Distortion):
+    """ A warp sampled once on a regular grid, then interpolated.
+
+    ``values`` holds where each grid node is sent. Points are warped by
+    bilinear (``order=1``) or bicubic Catmull-Rom (``order=3``) interpolation
+    between nodes, so the cost per point does not depend on how the warp was
+    made. Beyond the grid, the edge cells are extended linearly.
+
+    Args:
+        values:     (nx, ny, 2) warped positions of the grid nodes.
+        origin:     Position of node (0, 0).
+        spacing:    Distance between nodes, one value or one per axis.
+        order:      1 for bilinear, 3 for bicubic interpolation.
+    """
+
+    def __init__(self, values, origin, spacing, order=1):
+        if order not in (1, 3):
+            raise ValueError('order must be 1 or 3.')
+        self.values = np.asarray(values, dtype=np.float64)
+        self.origin = np.reshape(np.asarray(origin, dtype=np.float64), (1,2))
+        self.spacing = np.broadcast_to(np.asarray(spacing, dtype=np.float64), (2,)).reshape(1,2)
+        self.order = order
+        if min(self.values.shape[:2]) < order + 1:
+            raise ValueError('Need at least {0} by {0} nodes.'.format(order + 1))
+        super().__init__()
+
+    @classmethod
+    def from_distortion(cls, distortion, bbox, shape=(256, 256), order=1):
+        """ Sample any distortion over ``bbox`` = ``[[x_min, x_max], [y_min, y_max]]``. """
+
+        (x0, x1), (y0, y1) = bbox
+        x, y = np.linspace(x0, x1, shape[0]), np.linspace(y0, y1, shape[1])
+        nodes = np.stack(np.meshgrid(x, y, indexing='ij'), axis=2).reshape(-1, 2)
+        values = np.reshape(distortion(nodes), (shape[0], shape[1], 2))
+        return cls(values, origin=[x0, y0], spacing=[x[1] - x[0], y[1] - y[0]], order=order)
+
+    @classmethod
+    def from_control_points(cls, sources, targets, bbox, shape=(256, 256), order=1,
+                            smoothing=0.0):
+        """ Rubber-sheet warp taking each of ``sources`` to its ``targets``.
+
+        Displacements are spread between the control points by a thin-plate
+        spline, exact at the points unless ``smoothing`` is positive, and
+        sampled over ``bbox`` as for :meth:`from_distortion`.
+
+        The grid only follows the spline between nodes, so it misses the
+        targets where control points are much closer together than the grid
+        spacing. Use :class:`SplineDistortion` where they must be met.
+        """
+
+        return cls.from_distortion(SplineDistortion(sources, targets, smoothing), bbox,
+                                   shape=shape, order=order)
+
+    chunk_size = 2**14
+
+    def __call__(self, geometry):
+        points = np.reshape(geometry, (-1,2))
+        out = np.empty((len(points), 2))
+        for lo in range(0, len(points), self.chunk_size):
+            out[lo:lo+self.chunk_size] = self._interpolate(points[lo:lo+self.chunk_size], self.order)
+        return out
+
+    def _interpolate(self, points, order):
+        nx, ny = self.values.shape[:2]
+        f = (points - self.origin) / self.spacing
+
+        if order == 3:
+            # Bicubic within the grid, on nodes padded by one linearly
+            # extrapolated ring, and beyond it the edge value extended by the
+            # bilinear slope, so the warp is continuous everywhere
+            g = np.clip(f, 0, [nx - 1, ny - 1])
+            i = np.clip(np.floor(g).astype(np.int64), 0, [nx - 2, ny - 2])
+            t = g - i
+            wx, wy = _catmull_rom(t[:,0]), _catmull_rom(t[:,1])
+            stencil = (i[:,0] * (ny + 2) + i[:,1])[:,None] \
+                + (np.arange(4)[:,None] * (ny + 2) + np.arange(4)).ravel()
+            weights = (np.transpose(wx)[:,:,None] * np.transpose(wy)[:,None,:]).reshape(-1, 16)
+            out = np.empty((len(points), 2))
+            for d in range(2):
+                out[:, d] = np.einsum('ij,ij->i', weights, self._padded_components[d].take(stencil))
+
+            outside = np.flatnonzero(np.any(f != g, axis=1))
+            if len(outside):
+                edge = self.origin + g[outside] * self.spacing
+                out[outside] += (self._interpolate(points[outside], 1)
+                                 - self._interpolate(edge, 1))
+            return out
+
+        i = np.clip(np.floor(f).astype(np.int64), 0, [nx - 2, ny - 2])
+        tx, ty = f[:,0] - i[:,0], f[:,1] - i[:,1]
+        node = i[:,0] * ny + i[:,1]
+        v = self._components
+        out = np.empty((len(points), 2))
+        for d in range(2):
+            low = v[d, node] + ty * (v[d, node + 1] - v[d, node])
+            high = v[d, node + ny] + ty * (v[d, node + ny + 1] - v[d, node + ny])
+            out[:, d] = low + tx * (high - low)
+        return out
+
+    @cached_property
+    def _components(self):
+        """ Warped x and y of the nodes as two flat rows, for fast gathers. """
+        return np.ascontiguousarray(self.values.reshape(-1, 2).T)
+
+    @cached_property
+    def _padded_components(self):
+        """ :attr:`_components` of the nodes ringed by one more, each continuing
+        the line through its two inner neighbours.
+        """
+        padded = np.pad(self.values, ((1, 1), (1, 1), (0, 0)), mode='reflect',
+                        reflect_type='odd')
+        return np.ascontiguousarray(padded.reshape(-1, 2).T)
+
+    @cached_property
+    def _inverse_lookup(self):
+        """ Coarse cell of the grid covering each cell of a lookup grid over
+        the warped plane.
+
+        The grid is coarsened to at most 64 cells a side, and every coarse
+        cell is marked over the bounding box of its warped corners. Returns
+        the coarse node positions, the lookup grid's origin, cell size and
+        shape, and its table of coarse cells, -1 where none lands.
+        """
+
+        nx, ny = self.values.shape[:2]
+        stride = max(1, -(-max(nx, ny) // 64))
+        i = np.unique(np.r_[np.arange(0, nx, stride), nx - 1])
+        j = np.unique(np.r_[np.arange(0, ny, stride), ny - 1])
+        nodes = self.values[np.ix_(i, j)]
+        sources = self.origin + np.stack(np.meshgrid(i, j, indexing='ij'), axis=2) * self.spacing
+
+        corners = np.stack((nodes[:-1, :-1], nodes[1:, :-1], nodes[:-1, 1:], nodes[1:, 1:]))
+        lo, hi = corners.min(axis=0).reshape(-1, 2), corners.max(axis=0).reshape(-1, 2)
+        origin = lo.min(axis=0)
+        shape = np.array([2 * len(i), 2 * len(j)])
+        size = (hi.max(axis=0) - origin) / shape * (1 + 1e-9)
+
+        c_lo = np.floor((lo - origin) / size).astype(np.int64)
+        c_hi = np.floor((hi - origin) / size).astype(np.int64)
+        spans = c_hi - c_lo + 1
+        counts = spans[:,0] * spans[:,1]
+        cell = np.repeat(np.arange(len(lo)), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        x = c_lo[cell, 0] + k // spans[cell, 1]
+        y = c_lo[cell, 1] + k % spans[cell, 1]
+
+        table = np.full(shape[0] * shape[1], -1, dtype=np.int64)
+        table[x * shape[1] + y] = cell
+        centres = (sources[:-1, :-1] + sources[1:, 1:]).reshape(-1, 2) / 2
+        return centres, nodes.reshape(-1, 2), sources.reshape(-1, 2), origin, size, shape, table
+
+    def inverse(self, points, tol=1e-3, max_iter=20):
+        """ Approximate positions that the warp sends to ``points``, for picking.
+
+        Starts from a coarse cell of the grid whose warped bounds contain the
+        point, or else the coarse node warped nearest to it, then takes
+        Newton steps on the interpolated warp, each point only until it moves
+        less than ``tol``. Where the warp folds, this finds one preimage.
+        """
+
+        points = np.reshape(np.asarray(points, dtype=np.float64), (-1,2))
+        centres, nodes, sources, origin, size, shape, table = self._inverse_lookup
+
+        c = np.floor((points - origin) / size).astype(np.int64)
+        inside = np.all((c >= 0) & (c < shape), axis=1)
+        cell = np.full(len(points), -1, dtype=np.int64)
+        cell[inside] = table[c[inside, 0] * shape[1] + c[inside, 1]]
+        guess = np.empty((len(points), 2))
+        guess[cell >= 0] = centres[cell[cell >= 0]]
+
+        lost = np.flatnonzero(cell < 0)
+        for lo in range(0, len(lost), 1024):
+            q = lost[lo:lo+1024]
+            d = np.linalg.norm(points[q, None] - nodes[None], axis=2)
+            guess[q] = sources[np.argmin(d, axis=1)]
+
+        h = self.spacing[0] * 1e-3
+        active = np.arange(len(points))
+        for _ in range(max_iter):
+            p = guess[active]
+            value = self(p)
+            jx = (self(p + [h[0], 0]) - value) / h[0]
+            jy = (self(p + [0, h[1]]) - value) / h[1]
+            residual = points[active] - value
+
+            det = jx[:,0] * jy[:,1] - jx[:,1] * jy[:,0]
+            det = np.where(np.abs(det) > 1e-12, det, np.nan)
+            step = np.stack((jy[:,1] * residual[:,0] - jy[:,0] * residual[:,1],
+                             jx[:,0] * residual[:,1] - jx[:,1] * residual[:,0]), axis=1) / det[:,None]
+            step = np.nan_to_num(step)
+
+            guess[active] = p + step
+            active = active[np.linalg.norm(step, axis=1) > tol]
+            if not len(active):
+                break
+
+        return guess
+
+
+class SplineDistortion(Distortion):
+    """ Rubber-sheet warp taking each of ``sources`` to its ``targets``.
+
+    Displacements are spread between the control points by a thin-plate
+    spline, exact at the points unless ``smoothing`` is positive. The spline
+    is evaluated at every point drawn, at a cost in proportion to the number
+    of control points, so for many points it may be sampled once with
+    :meth:`GridDistortion.from_distortion` at the price of accuracy near the
+    control points.
+
+    Args:
+        sources:    (N, 2) control points.
+        targets:    (N, 2) positions they are sent to.
+        smoothing:  Regularisation trading exactness for smoothness.
+    """
+
+    def __init__(self, sources, targets, smoothing=0.0):
+        self.sources = np.reshape(np.asarray(sources, dtype=np.float64), (-1, 2))
+        self.targets = np.reshape(np.asarray(targets, dtype=np.float64), (-1, 2))
+        self._spline = _ThinPlateSpline(self.sources, self.targets - self.sources, smoothing)
+        super().__init__()
+
+    def __call__(self, geometry):
+        points = np.reshape(np.asarray(geometry, dtype=np.float64), (-1,2))
+        return points + self._spline(points)
+
+
+class TravelTimeDistortion(GridDistortion):
+    """ Warp about an origin station, so that distance from it is in
+    proportion to travel time.
+
+    Every point is moved along its bearing from the origin to a distance of
+    ``speed`` times its travel time. A point's travel time is blended, by
+    inverse distance weighting, from its ``neighbours`` nearest stations:
+    their times from the origin plus the walk to each at ``walk_speed``. The
+    blend is exact at stations and smooth between them.
+
+    The warp is held as a :class:`GridDistortion` over ``bbox``. Each grid
+    node's nearest stations and weights do not depend on the origin, so they
+    are found once, and setting :attr:`station` only reweights a row of
+    ``matrix``.
+
+    Args:
+        positions:  (N, 2) projected positions of network stops, indexed by stop.
+        matrix:     A :class:`~londinium.routing.matrix.TravelTimeMatrix`.
+        bbox:       ``[[x_min, x_max], [y_min, y_max]]`` region to warp.
+        station:    Network stop index of the origin station. Defaults to the
+                    first station of ``matrix``.
+        speed:      Metres drawn per second of travel. Defaults, per origin,
+                    to the median straight-line speed to reachable stations,
+                    which keeps the map about its undistorted size.
+        shape:      Grid nodes along each axis.
+        neighbours: Stations blended at each point.
+        walk_speed: Metres per second walked to a station.
+        order:      1 for bilinear, 3 for bicubic interpolation.
+    """
+
+    def __init__(self, positions, matrix, bbox, station=None, speed=None, shape=(256, 256),
+                 neighbours=8, walk_speed=1.3, order=1):
+        self.matrix = matrix
+        self.stations = np.asarray(positions, dtype=np.float64)[matrix.stops]
+        self.speed = speed
+        self.neighbours = min(neighbours, len(self.stations))
+        self.walk_speed = walk_speed
+
+        (x0, x1), (y0, y1) = bbox
+        x, y = np.linspace(x0, x1, shape[0]), np.linspace(y0, y1, shape[1])
+        self.nodes = np.stack(np.meshgrid(x, y, indexing='ij'), axis=2)
+        super().__init__(self.nodes, origin=[x0, y0], spacing=[x[1] - x[0], y[1] - y[0]],
+                         order=order)
+        self._station = None
+        self.station = int(matrix.stops[0]) if station is None else station
+
+    @classmethod
+    def from_router(cls, router, matrix, bbox=None, margin=2000.0, **kwargs):
+        """ Warp over the stations of ``router``, with ``bbox`` defaulting to
+        their extent plus ``margin`` metres.
+        """
+
+        if bbox is None:
+            stations = router.positions[matrix.stops]
+            lo, hi = stations.min(axis=0) - margin, stations.max(axis=0) + margin
+            bbox = [[lo[0], hi[0]], [lo[1], hi[1]]]
+        return cls(router.positions, matrix, bbox, **kwargs)
+
+    @property
+    def station(self):
+        """ Network stop index of the origin station. Setting it rebuilds the warp. """
+        return self._station
+
+    @station.setter
+    def station(self, stop):
+        if self.matrix.rows[stop] < 0:
+            raise ValueError('Stop {} is not a station of the matrix.'.format(stop))
+        self._station = stop
+        self.values = self._warp_nodes(self.matrix.row(stop).astype(np.float64))
+        # The interpolation tables depend on the values
+        for name in ('_components', '_padded_components', '_inverse_lookup'):
+            self.__dict__.pop(name, None)
+
+    @cached_property
+    def _node_weights(self):
+        """ Nearest stations of every grid node, their walk times and
+        inverse-distance weights, each (nodes, neighbours).
+        """
+
+        index = SpatialIndex(self.stations, projection=None)
+        distances, stations = index.nearest(self.nodes.reshape(-1, 2), k=self.neighbours)
+        # A node on a station takes its time alone
+        weights = 1 / np.maximum(distances, 1e-6)**2
+        return stations, distances / self.walk_speed, weights
+
+    def _warp_nodes(self, times):
+        """ Grid node positions for station ``times`` from the origin. """
+
+        stations, walks, weights = self._node_weights
+        centre = self.stations[self.matrix.rows[self._station]]
+
+        reachable = np.isfinite(times)
+        offsets = self.stations[reachable] - centre
+        distances = np.linalg.norm(offsets, axis=1)
+        speed = self.speed
+        if speed is None:
+            moved = distances > 0
+            speed = np.median(distances[moved] / times[reachable][moved]) if moved.any() else 1.0
+
+        # Unreachable stations are left out of the blend, or if a node can
+        # reach none, it goes as far as the furthest reachable station
+        weights = np.where(reachable[stations], weights, 0.0)
+        node_times = np.einsum('ij,ij->i', weights, np.where(reachable[stations],
+                                                             times[stations] + walks, 0.0))
+        total = weights.sum(axis=1)
+        node_times = np.where(total > 0, node_times / np.maximum(total, 1e-300),
+                              np.max(times[reachable]))
+
+        v = self.nodes.reshape(-1, 2) - centre
+        r = np.linalg.norm(v, axis=1, keepdims=True)
+        values = centre + v / np.maximum(r, 1e-9) * (speed * node_times)[:, None]
+        return values.reshape(self.nodes.shape)
+
+
+def _catmull_rom(t):
+    """ Weights of the four nodes around fractional position ``t``. """
+    t2, t3 = t*t, t*t*t
+    return [(-t3 + 2*t2 - t) / 2,
+            (3*t3 - 5*t2 + 2) / 2,
+            (-3*t3 + 4*t2 + t) / 2,
+            (t3 - t2) / 2]
+
+
+class _ThinPlateSpline(object):
+    """ Smooth interpolant of values at scattered 2D points. """
+
+    def __init__(self, points, values, smoothing=0.0):
+        self.points = points
+        n = len(points)
+        a = np.zeros((n + 3, n + 3))
+        a[:n, :n] = self._kernel(points, points) + smoothing * np.eye(n)
+        a[:n, n] = a[n, :n] = 1
+        a[:n, n+1:] = points
+        a[n+1:, :n] = points.T
+        b = np.zeros((n + 3, values.shape[1]))
+        b[:n] = values
+        self.coeffs = np.linalg.solve(a, b)
+
+    @staticmethod
+    def _kernel(p, q):
+        r2 = np.sum((p[:,None] - q[None]) ** 2, axis=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(r2 > 0, 0.5 * r2 * np.log(r2), 0.0)
+
+    def __call__(self, points):
+        n = len(self.points)
+        out = np.empty((len(points), self.coeffs.shape[1]))
+        rows = max(1, 2**16 // max(n, 1))
+
+        # Squared distances by matrix product, about the points' centre to
+        # keep the cancellation small, and the kernel computed in place
+        centre = self.points.mean(axis=0)
+        q = self.points - centre
+        qq = np.einsum('ij,ij->i', q, q)
+        for lo in range(0, len(points), rows):
+            p = points[lo:lo+rows]
+            c = p - centre
+            r2 = c @ (-2 * q.T)
+            r2 += qq
+            r2 += np.einsum('ij,ij->i', c, c)[:,None]
+            np.maximum(r2, 1e-300, out=r2)
+            k = np.log(r2)
+            k *= r2
+            k *= 0.5
+            out[lo:lo+rows] = k @ self.coeffs[:n] + self.coeffs[n] + p @ self.coeffs[n+1:]
+        return out
@@ -2,24 +2,43 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 
 from .styles import line_colour_map, line_plot_order
 from ..geodesy.projections import NationalGrid
 from .distortions import NoDistortion
+from ..geodesy.clip import clip
+from ..geodesy.simplify import importance, simplify
+from ..geodesy.spatial import BoundingBoxIndex
+from ..util.ragged import flatten, split
 
 
 class Canvas(object):
-    """ Matplotlib canvas on which to draw map. """
+    """ Matplotlib canvas on which to draw map.
+
+    With a ``geometry_cache``, a
+    :class:`~londinium.plotting.cache.ProjectedGeometryCache`, geometries
+    drawn with ids are projected once and reused, so drawing them again under
+    another distortion only re-runs the distortion.
+
+    Lines drawn with ``lod`` are simplified to the :meth:`tolerance` of the
+    figure, so that no dropped vertex would have moved a line by more than
+    ``lod_pixels`` pixels. ``None`` draws every vertex.
+    """
 
     def __init__(self,
                  projection=NationalGrid(),
                  distortion=NoDistortion(),
                  bbox=[[-0.54, 0.28],[51.3, 51.7]],
+                 geometry_cache=None,
+                 lod_pixels=0.5,
                  **kwargs):
 
         self.projection = projection
         self.distortion = distortion
         self.bbox = bbox
+        self.geometry_cache = geometry_cache
+        self.lod_pixels = lod_pixels
 
         self.make_axes(**kwargs)
 
@@ -31,24 +50,255 @@ class Canvas(object):
         self.ax.set_axis_off()
 
 
-    def plot(self, geometry, check_bbox=False, **kwargs):
+    def plot(self, geometry, check_bbox=False, id=None, **kwargs):
         geom = np.reshape(geometry, (-1,2))
         if check_bbox:
             if not self.is_inside_bbox(geom):
-                pass
-        easting_northing = self.projection.ll_to_en(geom)
-        new_geom = self.distortion(easting_northing)
+                return
+        if id is not None and self.geometry_cache is not None:
+            new_geom = self.distortion(self.geometry_cache.project([id], [geom], self.projection)[0])
+        else:
+            new_geom = self.transform(geom)
 
         self.ax.plot(new_geom[:,0], new_geom[:,1], **kwargs)
 
 
+    def transform(self, geometry):
+        """ Project and distort an (N, 2) array of longitudes and latitudes. """
+        return self.distortion(self.projection.ll_to_en(geometry))
+
+    def _project(self, geometries, offsets=None, ids=None):
+        """ Projected ragged array of geometries, through the cache if given ids. """
+
+        if ids is None or self.geometry_cache is None:
+            if offsets is None:
+                geometries, offsets = flatten(geometries)
+            return self.projection.ll_to_en_ragged(geometries, offsets)
+
+        if offsets is not None:
+            geometries = split(geometries, offsets)
+        return flatten(self.geometry_cache.project(ids, geometries, self.projection))
+
+    def tolerance(self, samples=16):
+        """ Projected distance that spans at most :attr:`lod_pixels` pixels.
+
+        The pixel size is taken from the figure size and dpi over the
+        distorted extent of :attr:`bbox`. Since a distortion may magnify some
+        places more than others, it is divided by the greatest local
+        magnification, found by finite differences on a ``samples`` square
+        grid over the box.
+        """
+
+        if self.lod_pixels is None:
+            return 0.0
+
+        lon = np.linspace(self.bbox[0][0], self.bbox[0][1], samples)
+        lat = np.linspace(self.bbox[1][0], self.bbox[1][1], samples)
+        grid = self.projection.ll_to_en(np.stack(np.meshgrid(lon, lat), axis=2).reshape(-1, 2))
+        h = max(np.ptp(grid, axis=0).max() * 1e-4, 1e-9)
+        warped = self.distortion(np.concatenate((grid, grid + [h, 0], grid + [0, h])))
+        base, dx, dy = np.split(warped, 3)
+        jacobians = np.stack((dx - base, dy - base), axis=2) / h
+        magnification = np.linalg.norm(jacobians, ord=2, axis=(1,2)).max()
+
+        pixels = self.f.get_size_inches() * self.f.dpi
+        per_pixel = np.max(np.ptp(base, axis=0) / pixels)
+        return self.lod_pixels * per_pixel / max(magnification, 1e-300)
+
+    def _viewport(self, samples=16):
+        """ Bounds of the projected :attr:`bbox`, whose edges may curve. """
+
+        (x0, x1), (y0, y1) = self.bbox
+        x, y = np.linspace(x0, x1, samples), np.linspace(y0, y1, samples)
+        edges = np.concatenate((np.stack((x, np.full(samples, y0)), axis=1),
+                                np.stack((x, np.full(samples, y1)), axis=1),
+                                np.stack((np.full(samples, x0), y), axis=1),
+                                np.stack((np.full(samples, x1), y), axis=1)))
+        en = self.projection.ll_to_en(edges)
+        lo, hi = en.min(axis=0), en.max(axis=0)
+        return [[lo[0], hi[0]], [lo[1], hi[1]]]
+
+    def plot_lines(self, geometries, offsets=None, ids=None, lod=False, colors='k',
+                   linewidths=1.0, zorders=0, check_bbox=False, bbox_index=None, **kwargs):
+        """ Draw many polylines, one LineCollection per z-order.
+
+        All geometries are projected and distorted in one pass. Styles may be
+        one value for every line or a sequence with one value per line.
+
+        Args:
+            geometries: List of (N, 2) geometries, or with ``offsets``, the flat
+                        coordinates of a ragged array.
+            offsets:    Offsets into flat ``geometries``.
+            ids:        Feature ids of the lines, to look up and store their
+                        projections in :attr:`geometry_cache`.
+            lod:        Draw the lines simplified to :meth:`tolerance`, by
+                        the :func:`~londinium.geodesy.simplify.importance`
+                        of their vertices in this canvas's projection.
+            colors:     Line colours.
+            linewidths: Line widths.
+            zorders:    Drawing order. Lines sharing one share a collection.
+            check_bbox: Draw only lines reaching into :attr:`bbox`, clipped to
+                        the bounds of its projection, so that lines out of
+                        view are neither projected nor distorted.
+            bbox_index: :class:`~londinium.geodesy.spatial.BoundingBoxIndex`
+                        of ``geometries``, such as
+                        :attr:`~londinium.parsing.geojson.lines.GeoJSONLinesFile.bbox_index`,
+                        to find those in view. Built on the fly if not given.
+            kwargs:     Passed to every LineCollection.
+        """
+
+        if offsets is not None:
+            geometries = split(geometries, offsets)
+        n = len(geometries)
+        colors, linewidths = self._per_item(colors, n), self._per_item(linewidths, n)
+        zorders = np.broadcast_to(zorders, (n,))
+
+        # Indices of the input lines that the drawn lines come from
+        items = np.arange(n)
+        if check_bbox:
+            if bbox_index is None:
+                bbox_index = BoundingBoxIndex.from_ragged(*flatten(geometries))
+            items = bbox_index.query(self.bbox)
+            geometries = [geometries[i] for i in items]
+            ids = None if ids is None else [ids[i] for i in items]
+
+        coordinates, offsets = self._project(geometries, None, ids)
+        if check_bbox:
+            coordinates, offsets, pieces, _ = clip(coordinates, offsets, self._viewport())
+            items = items[pieces]
+        if lod and self.lod_pixels is not None:
+            # Importances of the clipped pieces, whose cut ends are always kept
+            coordinates, offsets = simplify(coordinates, offsets, importance(coordinates, offsets),
+                                            self.tolerance())
+        segments = split(self.distortion(coordinates), offsets)
+        n = len(segments)
+        colors, linewidths = [colors[i] for i in items], [linewidths[i] for i in items]
+        zorders = zorders[items]
+
+        collections = []
+        for z, items in self._layers(zorders, n):
+            collection = LineCollection([segments[i] for i in items],
+                                        colors=[colors[i] for i in items],
+                                        linewidths=[linewidths[i] for i in items],
+                                        zorder=z, **kwargs)
+            self.ax.add_collection(collection)
+            collections.append(collection)
+        self.ax.autoscale_view()
+        return collections
+
+    def plot_points(self, locations, ids=None, colors='k', edgecolors=None, sizes=6.0,
+                    zorders=0, marker='o', check_bbox=False, **kwargs):
+        """ Draw many markers, one PathCollection per z-order.
+
+        Ids, styles and ``check_bbox`` are given as for :meth:`plot_lines`.
+        ``sizes`` are marker diameters in points, as for ``ms`` in
+        :meth:`plot`, and ``edgecolors`` default to the face colours.
+        """
+
+        locations = np.reshape(locations, (-1,2))
+        n = len(locations)
+        colors, sizes = self._per_item(colors, n), self._per_item(sizes, n)
+        edgecolors = colors if edgecolors is None else self._per_item(edgecolors, n)
+        zorders = np.broadcast_to(zorders, (n,))
+        kwargs.setdefault('linewidths', 1.0)
+
+        if check_bbox:
+            (x0, x1), (y0, y1) = self.bbox
+            x, y = locations[:,0], locations[:,1]
+            inside = np.flatnonzero((x >= x0) & (x <= x1) & (y >= y0) & (y <= y1))
+            locations = locations[inside]
+            ids = None if ids is None else [ids[i] for i in inside]
+            colors, sizes, edgecolors = ([v[i] for i in inside] for v in (colors, sizes, edgecolors))
+            zorders = zorders[inside]
+
+        points, _ = self._project(locations, np.arange(len(locations) + 1), ids)
+        points = self.distortion(points)
+        n = len(points)
+
+        collections = []
+        for z, items in self._layers(zorders, n):
+            collection = self.ax.scatter(points[items,0], points[items,1],
+                                         s=np.square([sizes[i] for i in items]),
+                                         c=[colors[i] for i in items],
+                                         edgecolors=[edgecolors[i] for i in items],
+                                         marker=marker, zorder=z, **kwargs)
+            collections.append(collection)
+        return collections
+
+    def plot_contours(self, locations, values, levels, colors=None, zorder=0, **kwargs):
+        """ Fill the bands of a raster between successive ``levels``.
+
+        ``locations`` are the (H, W, 2) longitudes and latitudes of the
+        raster's cells, such as those of an
+        :class:`~londinium.routing.isochrones.Isochrones` grid. They are
+        projected and distorted like any geometry, so the bands bend with the
+        map. NaN and infinite values are left empty. Returns the
+        QuadContourSet.
+        """
+
+        locations = np.asarray(locations, dtype=np.float64)
+        xy = self.transform(locations.reshape(-1, 2)).reshape(locations.shape)
+        return self.ax.contourf(xy[..., 0], xy[..., 1], np.ma.masked_invalid(values),
+                                levels=levels, colors=colors, zorder=zorder, **kwargs)
+
+    def plot_flows(self, geometries, loads, offsets=None, max_width=8.0, scale=None,
+                   colors='k', zorders=0, **kwargs):
+        """ Draw lines with widths in proportion to their loads.
+
+        ``loads`` has one value per geometry, such as the
+        :attr:`~londinium.routing.assignment.Loads.links` of an assignment
+        summed over both directions, with the link geometries of its network::
+
+            canvas.plot_flows(network['geometry_coordinates'], loads.links.sum(axis=1),
+                              offsets=network['geometry_offsets'])
+
+        A load of ``scale``, by default the largest, is drawn ``max_width``
+        points wide, and lines with no load are not drawn. Other arguments
+        are as for :meth:`plot_lines`.
+        """
+
+        if offsets is not None:
+            geometries = split(geometries, offsets)
+        loads = np.asarray(loads, dtype=np.float64)
+        n = len(geometries)
+        if len(loads) != n:
+            raise ValueError('Expected {} loads, got {}.'.format(n, len(loads)))
+        colors = self._per_item(colors, n)
+        zorders = np.broadcast_to(zorders, (n,))
+
+        scale = scale or max(float(loads.max(initial=0)), 1e-300)
+        items = np.flatnonzero(loads > 0)
+        return self.plot_lines([geometries[i] for i in items],
+                               colors=[colors[i] for i in items],
+                               linewidths=(max_width * loads[items] / scale).tolist(),
+                               zorders=zorders[items], **kwargs)
+
+    @staticmethod
+    def _per_item(value, n):
+        """ A list of one style value per item, from one value or a sequence. """
+        if isinstance(value, str) or np.ndim(value) == 0:
+            return [value] * n
+        if len(value) != n:
+            raise ValueError('Expected {} style values, got {}.'.format(n, len(value)))
+        return list(value)
+
+    @staticmethod
+    def _layers(zorders, n):
+        """ Item indices grouped by z-order, lowest first. """
+        zorders = np.broadcast_to(zorders, (n,))
+        levels, inverse = np.unique(zorders, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(levels) + 1))
+        return [(levels[k], order[bounds[k]:bounds[k+1]]) for k in range(len(levels))]
+
+
     def show(self):
         plt.show()
 
 
     def is_inside_bbox(self, geometry):
         if (np.amax(geometry[:,0]) < self.bbox[0][0] or
-            np.amax(geometry[:,0]) > self.bbox[0][1] or
+            np.amin(geometry[:,0]) > self.bbox[0][1] or
             np.amax(geometry[:,1]) < self.bbox[1][0] or
             np.amin(geometry[:,1]) > self.bbox[1][1]
             ): return False
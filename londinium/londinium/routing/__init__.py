@@ -0,0 +1,6 @@
+from .router import Router, Path
+from .matrix import TravelTimeMatrix
+from .csa import ConnectionScan, Journey, Leg
+from .raptor import Raptor, Itinerary, Ride, Walk
+from .isochrones import Isochrones, Isochrone
+from .assignment import Assignment, Loads
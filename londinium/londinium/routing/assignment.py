@@ -0,0 +1,232 @@
+""" Passenger flows of an origin-destination matrix over a network. """
+
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from . import matrix
+
+
+Loads = namedtuple('Loads', ['links', 'boardings', 'alightings', 'unassigned', 'gap'])
+
+
+class Assignment(object):
+    """ Loads trips between stops onto the search graph of a
+    :class:`~londinium.routing.router.Router`.
+
+    All-or-nothing assignment puts every trip on the fastest path between
+    its stops. A one-to-all search is run from each origin, and the trips to
+    its destinations are summed up the tree of fastest paths, so each origin
+    costs one search however many destinations it has.
+
+    The equilibrium variant uses the method of successive averages. Link
+    times grow with their load as ``time * (1 + alpha * (load / capacity) **
+    beta)``, each direction of a link on its own. Each iteration assigns all
+    or nothing under the times of the current loads and moves the loads
+    ``1 / (k + 1)`` of the way towards the result. It stops when the
+    relative gap, the share of the cost of the current loads that shortest
+    paths would save, falls below ``tolerance``.
+
+    Results are :class:`Loads`. ``links`` is (L, 2), aligned to the network's
+    links, of the load from ``stop_1`` to ``stop_2`` and back. ``boardings``
+    and ``alightings`` are (S,) per network stop, counting the first boarding
+    and the last alighting of each trip. ``unassigned`` is the number of
+    trips between stops off the routed lines or with no path. Trips back to
+    the stop they started from are left out.
+
+    Args:
+        router:     A :class:`~londinium.routing.router.Router`.
+        capacity:   Trips each link carries each way before slowing, as one
+                    value or one per network link. Needed for equilibrium.
+        alpha:      Slowdown at capacity.
+        beta:       Steepness of the slowdown.
+        batch_size: Origins searched per task.
+    """
+
+    def __init__(self, router, capacity=None, alpha=0.15, beta=4.0, batch_size=64):
+        self.router = router
+        self.alpha = alpha
+        self.beta = beta
+        self.batch_size = batch_size
+
+        network = router.network
+        self.capacity = None if capacity is None else np.broadcast_to(
+            np.asarray(capacity, dtype=np.float64), (network.n_links,))
+
+        # Edges of the search graph by kind, and the direction of each link edge
+        sources = router.edge_sources
+        targets = router.indices
+        self.link_edges = np.flatnonzero(router.edge_links >= 0)
+        links = router.edge_links[self.link_edges]
+        self.link_directions = (router.node_stop[sources[self.link_edges]]
+                                != network['link_stops'][links, 0]).astype(np.int64)
+        is_station = np.arange(router.n_nodes) < router.n_stations
+        self.boarding_edges = np.flatnonzero(is_station[sources] & ~is_station[targets])
+        self.alighting_edges = np.flatnonzero(~is_station[sources] & is_station[targets])
+
+    def all_or_nothing(self, demand, workers=None):
+        """ :class:`Loads` of an :class:`~londinium.network.ODMatrix`, each
+        trip on its fastest path. Every band of ``demand`` is assigned
+        together; select one with :meth:`~londinium.network.ODMatrix.band`.
+
+        With ``workers``, batches of origins are searched in a pool of that
+        many processes, each holding its own copy of the router.
+        """
+        batches, off_network = self._batches(demand)
+        with _Runner(self.router, workers) as run:
+            edges, first, unassigned = run(batches, self.router._weights)
+        return self._loads(edges, first, unassigned + off_network)
+
+    def equilibrium(self, demand, iterations=20, tolerance=1e-3, workers=None):
+        """ :class:`Loads` of ``demand`` after at most ``iterations`` rounds
+        of successive averages, with the relative gap of the last.
+        """
+
+        if self.capacity is None:
+            raise ValueError('Equilibrium assignment needs link capacities.')
+
+        batches, off_network = self._batches(demand)
+        base = np.asarray(self.router.weights, dtype=np.float64)
+        capacity = self.capacity[self.router.edge_links[self.link_edges]]
+        gap = np.inf
+        with _Runner(self.router, workers) as run:
+            edges, first, unassigned = run(batches, self.router._weights)
+            for k in range(1, iterations):
+                weights = base.copy()
+                load = edges[self.link_edges] / capacity
+                weights[self.link_edges] *= 1 + self.alpha * load ** self.beta
+
+                new_edges, new_first, _ = run(batches, weights.tolist())
+                cost = np.dot(edges, weights)
+                gap = (cost - np.dot(new_edges, weights)) / cost if cost > 0 else 0.0
+                if gap < tolerance:
+                    break
+                edges += (new_edges - edges) / (k + 1)
+                first += (new_first - first) / (k + 1)
+
+        return self._loads(edges, first, unassigned + off_network, gap)
+
+    def _batches(self, demand):
+        """ Tasks of up to :attr:`batch_size` origins, each a tuple of origin
+        nodes, offsets of their destinations, destination nodes and trips.
+        Also gives the trips with an end off the routed lines.
+        """
+
+        router = self.router
+        if demand.n_bands != 1:
+            demand = demand.combined()
+        origins = router.stop_node[demand.origins]
+        destinations = router.stop_node[demand.destinations]
+        routed = (origins >= 0) & (destinations >= 0) & (origins != destinations)
+        off_network = float(demand.counts[(origins < 0) | (destinations < 0)].sum())
+
+        origins, destinations = origins[routed], destinations[routed]
+        counts = demand.counts[routed].astype(np.float64)
+        starts = np.flatnonzero(np.r_[True, origins[1:] != origins[:-1]]) if len(origins) else []
+        bounds = np.r_[starts, len(origins)].astype(np.int64)
+
+        batches = []
+        for lo in range(0, len(bounds) - 1, self.batch_size):
+            hi = min(lo + self.batch_size, len(bounds) - 1)
+            a, b = bounds[lo], bounds[hi]
+            batches.append((origins[bounds[lo:hi]].tolist(), (bounds[lo:hi+1] - a).tolist(),
+                            destinations[a:b].tolist(), counts[a:b].tolist()))
+        return batches, off_network
+
+    def _loads(self, edges, first, unassigned, gap=None):
+        router = self.router
+        network = router.network
+        n_stops = network.n_stops
+
+        links = np.zeros((network.n_links, 2))
+        np.add.at(links, (router.edge_links[self.link_edges], self.link_directions),
+                  edges[self.link_edges])
+
+        boarded = router.node_stop[router.indices[self.boarding_edges]]
+        alighted = router.node_stop[router.edge_sources[self.alighting_edges]]
+        boardings = np.bincount(boarded, weights=edges[self.boarding_edges], minlength=n_stops)
+        alightings = np.bincount(alighted, weights=edges[self.alighting_edges], minlength=n_stops)
+        boardings += np.bincount(router.node_stop, weights=first, minlength=n_stops)
+
+        return Loads(links=links, boardings=boardings, alightings=alightings,
+                     unassigned=unassigned, gap=gap)
+
+
+class _Runner(object):
+    """ Sums the flows of batches in batch order, serially or in a process
+    pool kept open for its context, so that equilibrium iterations reuse the
+    same workers.
+    """
+
+    def __init__(self, router, workers):
+        self.router = router
+        self.workers = workers
+        self.pool = None
+
+    def __enter__(self):
+        if self.workers is not None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=matrix._set_router,
+                                            initargs=(self.router,))
+        return self
+
+    def __exit__(self, *args):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def __call__(self, batches, weights):
+        if self.pool is None:
+            results = (_batch_flows(self.router, weights, b) for b in batches)
+        else:
+            results = self.pool.map(partial(_pooled_flows, weights), batches)
+
+        edges = np.zeros(len(self.router.indices))
+        first = np.zeros(self.router.n_nodes)
+        unassigned = 0.0
+        for e, f, u in results:
+            edges += e
+            first += f
+            unassigned += u
+        return edges, first, unassigned
+
+
+def _batch_flows(router, weights, batch):
+    """ Flow on each edge, boardings at each origin platform and trips with
+    no path, for one batch of origins.
+    """
+
+    origins, offsets, destinations, counts = batch
+    edge_source = router.edge_sources.tolist()
+    edges = [0.0] * len(edge_source)
+    first = [0.0] * router.n_nodes
+    unassigned = 0.0
+
+    for k, origin in enumerate(origins):
+        sources = router._sources(origin)
+        settled = []
+        dist, pred = router._search(sources, weights=weights, settled=settled)
+
+        flow = [0.0] * router.n_nodes
+        for i in range(offsets[k], offsets[k+1]):
+            d = destinations[i]
+            if dist[d] == np.inf:
+                unassigned += counts[i]
+            else:
+                flow[d] += counts[i]
+
+        # Children are settled after their parents
+        for v in reversed(settled):
+            x = flow[v]
+            e = pred[v]
+            if x and e >= 0:
+                edges[e] += x
+                flow[edge_source[e]] += x
+        for p in sources[1:]:
+            first[p] += flow[p]
+
+    return np.array(edges), np.array(first), unassigned
+
+
+def _pooled_flows(weights, batch):
+    """ :func:`_batch_flows` on the router a pool worker was started with. """
+    return _batch_flows(matrix._ROUTER, weights, batch)
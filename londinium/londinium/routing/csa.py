@@ -0,0 +1,497 @@
+""" Earliest-arrival and latest-departure queries by Connection Scan. """
+
+import numpy as np
+from collections import namedtuple
+
+from ..geodesy.projections import NationalGrid
+from ..util.cached_property import cached_property
+
+
+Journey = namedtuple('Journey', ['departure', 'arrival', 'legs'])
+Leg = namedtuple('Leg', ['trip', 'stops', 'connections', 'departure', 'arrival'])
+
+
+class ConnectionScan(object):
+    """ Connection Scan Algorithm (CSA) over a network's
+    :class:`~londinium.network.Timetable`.
+
+    A query scans the connections in departure order from the departure
+    time, boarding any whose stop has been reached or whose trip has already
+    been boarded. The scan stops once connections leave after the best
+    arrival at the destination, so a query touches only the part of the day
+    it needs.
+
+    Connections are scanned in blocks rather than one at a time. A block
+    is a run of connections that all leave before any of them arrives, so
+    none can be caught from another, and the whole block is taken in a few
+    array operations. Blocks are found once, when the scanner is built.
+    Latest departures are the same scan over the timetable reversed in time.
+
+    Walks join every pair of stops in each interchange, such as the
+    out-of-station interchanges of a snapshot, taking their straight-line
+    distance at ``walk_speed`` plus ``interchange_penalty``. Changing trips
+    at a stop takes ``transfer_time``.
+
+    Times are seconds after midnight. Arrival times are ``inf``, and
+    departure times ``-inf``, where there is no journey.
+
+    Args:
+        network:                A :class:`~londinium.network.NetworkArrays`.
+        timetable:              Connections to scan, by default the network's
+                                :attr:`~londinium.network.NetworkArrays.timetable`.
+        projection:             Projects stop locations to metres, for walks.
+                                ``None`` if they are already projected.
+        walk_speed:             Metres per second on interchange walks.
+        interchange_penalty:    Seconds added to each interchange walk.
+        transfer_time:          Seconds to change between trips at a stop.
+    """
+
+    def __init__(self, network, timetable=None, projection=NationalGrid(),
+                 walk_speed=1.3, interchange_penalty=60.0, transfer_time=0.0):
+        self.network = network
+        self.timetable = network.timetable if timetable is None else timetable
+        self.walk_speed = walk_speed
+        self.interchange_penalty = interchange_penalty
+        self.transfer_time = transfer_time
+
+        locations = np.asarray(network.coordinates, dtype=np.float64)
+        if projection is not None:
+            locations = projection.ll_to_en(locations)
+        self.positions = locations
+
+        self.walk_indptr, self.walk_targets, self.walk_times = interchange_walks(
+            network, self.positions, walk_speed, interchange_penalty)
+
+    @cached_property
+    def _forward(self):
+        t = self.timetable
+        return _Scan(t.dep_stop, t.arr_stop, t.dep_time, t.arr_time, t.trip,
+                     np.arange(len(t)))
+
+    @cached_property
+    def _backward(self):
+        """ The timetable reversed in time, to scan for latest departures. """
+        t = self.timetable
+        order = np.lexsort((t.dep_time, t.arr_time))[::-1]
+        return _Scan(t.arr_stop[order], t.dep_stop[order], -t.arr_time[order],
+                     -t.dep_time[order], t.trip[order], order)
+
+    @cached_property
+    def _trip_connections(self):
+        """ Connections grouped by trip in time order, with offsets per trip. """
+        trip = self.timetable.trip
+        order = np.argsort(trip, kind='stable')
+        offsets = np.zeros(int(trip.max(initial=-1)) + 2, dtype=np.int64)
+        np.cumsum(np.bincount(trip, minlength=len(offsets) - 1), out=offsets[1:])
+        return order, offsets
+
+
+    @cached_property
+    def components(self):
+        """ Label of each stop, shared by stops joined by any connection or
+        walk, regardless of time. Stops with different labels can never
+        reach each other.
+        """
+
+        t = self.timetable
+        a = np.concatenate((t.dep_stop, np.repeat(np.arange(self.network.n_stops),
+                                                  np.diff(self.walk_indptr))))
+        b = np.concatenate((t.arr_stop, self.walk_targets))
+        labels = np.arange(self.network.n_stops)
+        while True:
+            joined = np.minimum(labels[a], labels[b])
+            new = labels.copy()
+            np.minimum.at(new, a, joined)
+            np.minimum.at(new, b, joined)
+            new = new[new]
+            if np.array_equal(new, labels):
+                return labels
+            labels = new
+
+    def _stop(self, stop):
+        """ Stop index of a stop index or id. """
+        if isinstance(stop, str):
+            return self.network.stop_index[stop]
+        return int(stop)
+
+    def _walk(self, arrival, ready, stops, queries, pointers=None):
+        """ Relax walks from ``stops`` reached in ``queries``, in (S, Q) times. """
+
+        starts, counts = self.walk_indptr[stops], np.diff(self.walk_indptr)[stops]
+        edges = _ranges(starts, counts)
+        if not len(edges):
+            return
+        source, query = np.repeat(stops, counts), np.repeat(queries, counts)
+        target = self.walk_targets[edges]
+        times = arrival[source, query] + self.walk_times[edges]
+
+        better = times < arrival[target, query]
+        source, target, query, times = source[better], target[better], query[better], times[better]
+        np.minimum.at(arrival, (target, query), times)
+        if ready is not arrival:
+            np.minimum.at(ready, (target, query), times)
+        if pointers is not None:
+            won = times == arrival[target, query]
+            pointers[1][target[won]] = source[won]
+
+    def _scan(self, scan, origins, times, targets=None, pointers=False, until=np.inf):
+        """ Earliest arrivals at every stop for each (origin, time) query,
+        scanning no connection that leaves after ``until``.
+
+        Times are kept stop by query, so that each connection reads one
+        contiguous row of queries. Queries are dropped from the scan once
+        nothing later can improve their arrival at their target.
+
+        Returns (Q, S) arrival times and, for one query with ``pointers``,
+        the exit connection and walk origin of each stop and the entry
+        connection of each trip, all as scan positions.
+        """
+
+        n_stops = self.network.n_stops
+        n_trips = int(scan.trip.max(initial=-1)) + 1
+        origins = np.asarray(origins, dtype=np.int64)
+        times = np.asarray(times, dtype=np.float64)
+        if targets is not None:
+            targets = np.asarray(targets, dtype=np.int64)
+        result = np.full((n_stops, len(origins)), np.inf)
+
+        # Columns of the queries still being scanned
+        active = np.arange(len(origins))
+        arrival = np.full((n_stops, len(active)), np.inf)
+        arrival[origins, active] = times
+        # Without a transfer time, a stop can be left as soon as it is reached
+        ready = arrival.copy() if self.transfer_time else arrival
+        on_trip = np.zeros((n_trips, len(active)), dtype=bool)
+        if pointers:
+            exits = np.full(n_stops, -1, dtype=np.int64)
+            walks = np.full(n_stops, -1, dtype=np.int64)
+            entries = np.full(n_trips, -1, dtype=np.int64)
+            pointers = (exits, walks)
+        else:
+            pointers = None
+        self._walk(arrival, ready, origins, active, pointers)
+
+        bounds = scan.bounds
+        lo = np.searchsorted(scan.dep_time, np.min(times, initial=np.inf), side='left')
+        k = max(np.searchsorted(bounds, lo, side='right') - 1, 0)
+        for k in range(k, len(bounds) - 1):
+            a, b = max(bounds[k], lo), bounds[k+1]
+            if scan.dep_time[a] > until:
+                break
+
+            if targets is not None:
+                done = arrival[targets[active], np.arange(len(active))] <= scan.dep_time[a]
+                if done.all():
+                    break
+                if 4 * done.sum() >= len(active):
+                    result[:, active[done]] = arrival[:, done]
+                    active, arrival, on_trip = active[~done], arrival[:, ~done], on_trip[:, ~done]
+                    ready = ready[:, ~done] if self.transfer_time else arrival
+
+            dep_stop, arr_stop = scan.dep_stop[a:b], scan.arr_stop[a:b]
+            dep_time, arr_time, trip = scan.dep_time[a:b], scan.arr_time[a:b], scan.trip[a:b]
+            board = ready[dep_stop] <= dep_time[:, None]
+            board |= on_trip[trip]
+            c, query = np.nonzero(board)
+            if not len(c):
+                continue
+
+            if pointers is not None:
+                new = ~on_trip[trip[c], query]
+                entries[trip[c[new]]] = a + c[new]
+            on_trip[trip[c], query] = True
+
+            stop, time = arr_stop[c], arr_time[c]
+            better = time < arrival[stop, query]
+            if not better.any():
+                continue
+            c, stop, query, time = c[better], stop[better], query[better], time[better]
+            np.minimum.at(arrival, (stop, query), time)
+            if self.transfer_time:
+                np.minimum.at(ready, (stop, query), time + self.transfer_time)
+            if pointers is not None:
+                won = time == arrival[stop, query]
+                exits[stop[won]] = a + c[won]
+                walks[stop[won]] = -1
+
+            # Walk on from each stop reached, once per query
+            key = np.unique(query * n_stops + stop)
+            self._walk(arrival, ready, key % n_stops, key // n_stops, pointers)
+
+        result[:, active] = arrival
+        if pointers is not None:
+            return result.T, exits, walks, entries
+        return result.T
+
+
+    def earliest_arrival(self, origin, departure_time, destination=None):
+        """ Earliest arrival leaving ``origin`` at ``departure_time``.
+
+        ``origin`` and ``destination`` are stop indices or ids. Gives the
+        arrival time at ``destination``, or without one, an (S,) array of
+        arrival times at every stop.
+        """
+
+        origin = self._stop(origin)
+        if destination is None:
+            return self._scan(self._forward, [origin], [departure_time])[0]
+        destination = self._stop(destination)
+        arrival = self._scan(self._forward, [origin], [departure_time], [destination])
+        return float(arrival[0, destination])
+
+    def latest_departure(self, destination, arrival_time, origin=None):
+        """ Latest departure reaching ``destination`` by ``arrival_time``.
+
+        Gives the departure time from ``origin``, or without one, an (S,)
+        array of latest departure times from every stop.
+        """
+
+        destination = self._stop(destination)
+        if origin is None:
+            return -self._scan(self._backward, [destination], [-arrival_time])[0]
+        origin = self._stop(origin)
+        departure = self._scan(self._backward, [destination], [-arrival_time], [origin])
+        return -float(departure[0, origin])
+
+    def one_to_all(self, origins, departure_times, max_duration=None, batch_size=128):
+        """ Earliest arrival at every stop for each (origin, time) query.
+
+        Queries are batched as for :meth:`earliest_arrivals`. With
+        ``max_duration``, connections leaving more than that after a batch's
+        latest departure are not scanned, and arrivals more than that after
+        their departure are ``inf``.
+
+        Args:
+            origins:            (Q,) origin stop indices, or one for all.
+            departure_times:    (Q,) departure times.
+            max_duration:       Seconds of travel to search.
+            batch_size:         Queries per pass.
+
+        Returns:
+            (Q, S) arrival times.
+        """
+
+        times = np.asarray(departure_times, dtype=np.float64).reshape(-1)
+        origins = np.broadcast_to(np.asarray(origins, dtype=np.int64), times.shape)
+        limit = np.inf if max_duration is None else max_duration
+
+        result = np.full((len(times), self.network.n_stops), np.inf)
+        order = np.argsort(times, kind='stable')
+        for lo in range(0, len(order), batch_size):
+            q = order[lo:lo+batch_size]
+            result[q] = self._scan(self._forward, origins[q], times[q],
+                                   until=times[q].max() + limit)
+        if max_duration is not None:
+            result[result > times[:, None] + max_duration] = np.inf
+        return result
+
+    def earliest_arrivals(self, origins, destinations, departure_times, batch_size=128):
+        """ Earliest arrival for each of many (origin, destination, time) queries.
+
+        Queries are sorted by departure time and scanned ``batch_size`` at a
+        time, each batch in one pass over the connections, as (S, Q) arrays.
+        Queries between stops in different :attr:`components` are not scanned.
+
+        On a synthetic full-day timetable over the TfL lines, of 381k
+        connections, this answers about 1,300 to 1,500 random queries a
+        second on one core, against about 330 a second for
+        :meth:`earliest_arrival` one at a time.
+
+        Args:
+            origins:            (Q,) origin stop indices.
+            destinations:       (Q,) destination stop indices.
+            departure_times:    (Q,) departure times.
+            batch_size:         Queries per pass.
+
+        Returns:
+            (Q,) arrival times.
+        """
+        return self._batch(self._forward, origins, destinations, departure_times, batch_size)
+
+    def latest_departures(self, origins, destinations, arrival_times, batch_size=128):
+        """ Latest departure for each of many (origin, destination, time)
+        queries, batched as for :meth:`earliest_arrivals`.
+        """
+        return -self._batch(self._backward, destinations, origins,
+                            -np.asarray(arrival_times, dtype=np.float64), batch_size)
+
+    def _batch(self, scan, origins, destinations, times, batch_size):
+        origins = np.asarray(origins, dtype=np.int64)
+        destinations = np.asarray(destinations, dtype=np.int64)
+        times = np.asarray(times, dtype=np.float64)
+
+        result = np.full(len(times), np.inf)
+        components = self.components
+        order = np.flatnonzero(components[origins] == components[destinations])
+        order = order[np.argsort(times[order], kind='stable')]
+        for lo in range(0, len(order), batch_size):
+            q = order[lo:lo+batch_size]
+            arrival = self._scan(scan, origins[q], times[q], destinations[q])
+            result[q] = arrival[np.arange(len(q)), destinations[q]]
+        return result
+
+
+    def journey(self, origin, destination, departure_time=None, arrival_time=None):
+        """ Fastest :class:`Journey` leaving at ``departure_time``, or the
+        latest one arriving by ``arrival_time``.
+
+        Each :class:`Leg` rides one trip, giving its index in the network,
+        the stops it calls at from boarding to alighting, the timetable
+        connections ridden and the times, or is a walk with trip ``-1``.
+        Gives ``None`` if there is no journey.
+        """
+
+        if (departure_time is None) == (arrival_time is None):
+            raise ValueError('Give one of departure_time or arrival_time.')
+        origin, destination = self._stop(origin), self._stop(destination)
+
+        if departure_time is not None:
+            scan, source, target, time = self._forward, origin, destination, departure_time
+        else:
+            scan, source, target, time = self._backward, destination, origin, -arrival_time
+        arrival, exits, walks, entries = self._scan(scan, [source], [time], [target],
+                                                    pointers=True)
+        if not np.isfinite(arrival[0, target]):
+            return None
+
+        # Walk back from the target, each step to an earlier reached stop
+        steps, stop = [], target
+        for _ in range(self.network.n_stops):
+            if stop == source:
+                break
+            if walks[stop] >= 0:
+                steps.append((walks[stop], stop, None, None))
+                stop = int(walks[stop])
+            else:
+                exit = int(exits[stop])
+                entry = int(entries[scan.trip[exit]])
+                steps.append((scan.dep_stop[entry], stop, entry, exit))
+                stop = int(scan.dep_stop[entry])
+
+        # Reversed in time, the steps are already in travel order, each backwards
+        forward = scan is self._forward
+        legs = []
+        for a, b, entry, exit in (steps[::-1] if forward else steps):
+            a, b = (int(a), int(b)) if forward else (int(b), int(a))
+            if entry is None:
+                lo, hi = self.walk_indptr[a:a+2]
+                walk = self.walk_times[lo + np.flatnonzero(self.walk_targets[lo:hi] == b)[0]]
+                legs.append((-1, [a, b], None, float(walk)))
+            else:
+                first, last = scan.order[entry], scan.order[exit]
+                if not forward:
+                    first, last = last, first
+                legs.append((int(self.timetable.trip[first]), None,
+                             self._ride(first, last), None))
+
+        return self._timed(legs, departure_time, arrival_time)
+
+    def _ride(self, first, last):
+        """ Connections of one trip from connection ``first`` to ``last``. """
+        order, offsets = self._trip_connections
+        trip = self.timetable.trip[first]
+        ridden = order[offsets[trip]:offsets[trip+1]]
+        i, j = np.flatnonzero(ridden == first)[0], np.flatnonzero(ridden == last)[0]
+        return ridden[i:j+1]
+
+    def _timed(self, legs, departure_time, arrival_time):
+        """ :class:`Journey` of legs, walking as early as possible after
+        ``departure_time`` or as late as possible before ``arrival_time``.
+        """
+
+        t = self.timetable
+        result = []
+        time = departure_time if arrival_time is None else arrival_time
+        for trip, stops, connections, walk in (legs if arrival_time is None else legs[::-1]):
+            if trip >= 0:
+                departure, arrival = int(t.dep_time[connections[0]]), int(t.arr_time[connections[-1]])
+                stops = t.dep_stop[connections].tolist() + [int(t.arr_stop[connections[-1]])]
+                result.append(Leg(trip, stops, connections.tolist(), departure, arrival))
+                time = arrival if arrival_time is None else departure
+            elif arrival_time is None:
+                result.append(Leg(-1, stops, [], time, time + walk))
+                time = time + walk
+            else:
+                result.append(Leg(-1, stops, [], time - walk, time))
+                time = time - walk
+
+        if arrival_time is not None:
+            result = result[::-1]
+        if not result:
+            return Journey(departure=time, arrival=time, legs=[])
+        return Journey(departure=result[0].departure, arrival=result[-1].arrival, legs=result)
+
+
+def interchange_walks(network, positions, walk_speed, interchange_penalty):
+    """ Walks between every pair of stops in each interchange of a network.
+
+    Each walk takes its straight-line distance between ``positions`` at
+    ``walk_speed``, plus ``interchange_penalty``, keeping the quickest
+    between any two stops.
+
+    Returns:
+        indptr:     (S + 1,) offsets of the walks from each stop.
+        targets:    Stop each walk reaches.
+        times:      Seconds each walk takes.
+    """
+
+    offsets, members = network['interchange_offsets'], network['interchange_stops']
+    walk_a, walk_b = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for k in range(len(offsets) - 1):
+        group = members[offsets[k]:offsets[k+1]]
+        i, j = np.meshgrid(group, group)
+        mask = i != j
+        walk_a.append(i[mask])
+        walk_b.append(j[mask])
+    walk_a, walk_b = np.concatenate(walk_a), np.concatenate(walk_b)
+    if not len(walk_a):
+        return (np.zeros(network.n_stops + 1, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.float64))
+
+    times = (np.linalg.norm(positions[walk_a] - positions[walk_b], axis=1)
+             / walk_speed + interchange_penalty)
+    order = np.lexsort((times, walk_b, walk_a))
+    walk_a, walk_b, times = walk_a[order], walk_b[order], times[order]
+    first = np.r_[True, (walk_a[1:] != walk_a[:-1]) | (walk_b[1:] != walk_b[:-1])]
+
+    indptr = np.zeros(network.n_stops + 1, dtype=np.int64)
+    np.cumsum(np.bincount(walk_a[first], minlength=network.n_stops), out=indptr[1:])
+    return indptr, walk_b[first], times[first]
+
+
+class _Scan(object):
+    """ Connections in scan order, with the bounds of blocks of connections
+    that cannot reach one another.
+    """
+
+    def __init__(self, dep_stop, arr_stop, dep_time, arr_time, trip, order):
+        self.dep_stop = np.asarray(dep_stop, dtype=np.int64)
+        self.arr_stop = np.asarray(arr_stop, dtype=np.int64)
+        self.dep_time = np.asarray(dep_time, dtype=np.float64)
+        self.arr_time = np.asarray(arr_time, dtype=np.float64)
+        self.trip = np.asarray(trip, dtype=np.int64)
+        self.order = order
+        self.bounds = _blocks(self.dep_time, self.arr_time)
+
+
+def _blocks(dep_time, arr_time):
+    """ Bounds of maximal runs of connections that all leave before any of
+    them arrives, so that none can be caught from another.
+    """
+
+    bounds = [0]
+    earliest = np.inf
+    for k, (d, a) in enumerate(zip(dep_time.tolist(), arr_time.tolist())):
+        if d >= earliest:
+            bounds.append(k)
+            earliest = np.inf
+        earliest = min(earliest, a)
+    if len(dep_time):
+        bounds.append(len(dep_time))
+    return np.array(bounds, dtype=np.int64)
+
+
+def _ranges(starts, counts):
+    """ Concatenated ``arange(start, start + count)`` for each pair. """
+    ends = np.cumsum(counts)
+    return np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - counts - starts, counts)
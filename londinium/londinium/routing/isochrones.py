@@ -0,0 +1,191 @@
+""" Areas reachable from a stop within given travel times. """
+
+import numpy as np
+import geojson
+from collections import namedtuple
+from contourpy import contour_generator, FillType
+
+from ..geodesy.projections import NationalGrid
+from ..geodesy.spatial import SpatialIndex
+
+
+Isochrone = namedtuple('Isochrone', ['origin', 'departure_time', 'budgets', 'times'])
+
+
+class Isochrones(object):
+    """ Travel times from a stop to every cell of a raster grid.
+
+    A one-to-all search by a
+    :class:`~londinium.routing.csa.ConnectionScan` gives the arrival at each
+    stop. From there, the time to a cell is that of the best stop plus a
+    straight-line walk at the scanner's walk speed. Every (cell, stop) pair
+    within ``max_walk`` seconds of walking is found once, when the grid is
+    built, so each query is one gather and one segmented minimum over those
+    pairs. Cells further than that from any stop are only reached by walking
+    from the origin itself. All the rasters of a batch are evaluated
+    together, over runs of cells holding about :attr:`chunk_size` pairs, so
+    that the gathered times stay in cache.
+
+    The grid is square in projected metres over ``bbox``. Its cell centres
+    are :attr:`locations`, in longitude and latitude, and rasters are
+    (H, W) arrays over them, row 0 at the south. Cells outside ``mask`` are
+    NaN.
+
+    Args:
+        scanner:        A :class:`~londinium.routing.csa.ConnectionScan`.
+        bbox:           ``[[lon_min, lon_max], [lat_min, lat_max]]`` to cover.
+        cell_size:      Cell width in metres.
+        max_walk:       Longest walk from a stop, in seconds.
+        mask:           (H, W) bool of the cells to keep, or a callable
+                        giving it from (N, 2) longitudes and latitudes.
+        projection:     Projects longitudes and latitudes to metres. Should
+                        be the one the scanner uses.
+    """
+
+    chunk_size = 2**14
+
+    def __init__(self, scanner, bbox, cell_size=200.0, max_walk=1200.0, mask=None,
+                 projection=NationalGrid()):
+        self.scanner = scanner
+        self.cell_size = cell_size
+        self.max_walk = max_walk
+        self.projection = projection
+
+        # Projected bounds of the box, whose edges may curve
+        (x0, x1), (y0, y1) = bbox
+        t = np.linspace(0, 1, 16)
+        edges = np.concatenate([np.stack((x0 + (x1 - x0) * t, np.full(16, y)), axis=1) for y in (y0, y1)]
+                               + [np.stack((np.full(16, x), y0 + (y1 - y0) * t), axis=1) for x in (x0, x1)])
+        en = projection.ll_to_en(edges)
+        lo, hi = en.min(axis=0), en.max(axis=0)
+        self.shape = tuple(int(n) for n in np.ceil((hi - lo) / cell_size)[::-1] + 1)
+        self.x = lo[0] + cell_size * np.arange(self.shape[1])
+        self.y = lo[1] + cell_size * np.arange(self.shape[0])
+
+        centres = np.stack(np.meshgrid(self.x, self.y), axis=2).reshape(-1, 2)
+        self.locations = projection.en_to_ll(centres).reshape(self.shape + (2,))
+
+        if callable(mask):
+            mask = mask(self.locations.reshape(-1, 2)).reshape(self.shape)
+        self.mask = None if mask is None else np.asarray(mask, dtype=bool)
+
+        # Every stop within a walk of each cell
+        positions = scanner.positions
+        index = SpatialIndex(positions, projection=None)
+        stops, offsets = index.within(centres, max_walk * scanner.walk_speed)
+        cells = np.repeat(np.arange(len(centres)), np.diff(offsets))
+        self.pair_stops = stops
+        self.pair_walks = np.linalg.norm(positions[stops] - centres[cells], axis=1) / scanner.walk_speed
+        self.pair_cells = np.flatnonzero(np.diff(offsets) > 0)
+        self.pair_starts = offsets[self.pair_cells]
+        self._centres = centres
+
+    @classmethod
+    def from_areas(cls, scanner, areas, **kwargs):
+        """ Grid over a :class:`~londinium.parsing.geojson.areas.GeoJSONAreasFile`,
+        such as the fare zones, keeping only cells inside one of its areas.
+        """
+        bboxes = areas.bboxes
+        bbox = [[bboxes[:, 0, 0].min(), bboxes[:, 0, 1].max()],
+                [bboxes[:, 1, 0].min(), bboxes[:, 1, 1].max()]]
+        kwargs.setdefault('mask', lambda points: areas.locate(points) >= 0)
+        return cls(scanner, bbox, **kwargs)
+
+
+    def rasterise(self, arrivals, origin=None, departure_time=None):
+        """ (..., H, W) arrival time at each cell from (..., S) stop arrivals.
+
+        Given the ``origin`` and ``departure_time`` of each row, cells may
+        also be walked to straight from the origin.
+        """
+
+        arrivals = np.asarray(arrivals, dtype=np.float64)
+        batch = arrivals.shape[:-1]
+        arrivals = arrivals.reshape(-1, arrivals.shape[-1])
+        result = np.full((len(arrivals), len(self._centres)), np.inf)
+
+        # Every row at once, over runs of cells of about chunk_size pairs
+        bounds = np.r_[self.pair_starts, len(self.pair_stops)]
+        chunks = np.unique(np.r_[np.searchsorted(bounds, np.arange(0, len(self.pair_stops),
+                                                                   self.chunk_size)),
+                                 len(self.pair_cells)])
+        for lo, hi in zip(chunks[:-1], chunks[1:]):
+            a, b = bounds[lo], bounds[hi]
+            times = np.take(arrivals, self.pair_stops[a:b], axis=1)
+            times += self.pair_walks[a:b]
+            result[:, self.pair_cells[lo:hi]] = np.minimum.reduceat(
+                times, self.pair_starts[lo:hi] - a, axis=1)
+
+        if origin is not None:
+            origin = np.broadcast_to(origin, batch).reshape(-1)
+            start = np.broadcast_to(departure_time, batch).reshape(-1, 1)
+            d = np.linalg.norm(self._centres[None] - self.scanner.positions[origin][:, None], axis=2)
+            np.minimum(result, start + d / self.scanner.walk_speed, out=result)
+
+        result = result.reshape(batch + self.shape)
+        if self.mask is not None:
+            result[..., ~self.mask] = np.nan
+        return result
+
+    def isochrone(self, origin, departure_time, budgets):
+        """ :class:`Isochrone` of travel times in seconds from ``origin``,
+        searching only as far as the largest of ``budgets``.
+        """
+        origin = self.scanner._stop(origin)
+        budgets = np.sort(np.atleast_1d(budgets))
+        arrivals = self.scanner.one_to_all([origin], [departure_time], max_duration=budgets[-1])
+        times = self.rasterise(arrivals[0], origin, departure_time) - departure_time
+        return Isochrone(origin, departure_time, budgets, times.astype(np.float32))
+
+    def sweep(self, origin, start, end, budgets, step=300, batch_size=12):
+        """ Yield an :class:`Isochrone` every ``step`` seconds from ``start``
+        to ``end``.
+
+        Departures are searched ``batch_size`` at a time, in one pass of the
+        scanner over the connections each batch could use.
+        """
+
+        origin = self.scanner._stop(origin)
+        budgets = np.sort(np.atleast_1d(budgets))
+        times = np.arange(start, end + 1, step)
+        for lo in range(0, len(times), batch_size):
+            t = times[lo:lo+batch_size]
+            arrivals = self.scanner.one_to_all(origin, t, max_duration=budgets[-1],
+                                               batch_size=batch_size)
+            rasters = self.rasterise(arrivals, origin, t) - t[:, None, None]
+            for time, raster in zip(t, rasters.astype(np.float32)):
+                yield Isochrone(origin, int(time), budgets, raster)
+
+
+    def polygons(self, isochrone):
+        """ Area within each budget of an isochrone, as a list per budget of
+        polygons, each a list of (N, 2) longitude and latitude rings, outer
+        ring first.
+        """
+
+        # Cells out of reach or out of the mask are beyond every budget
+        times = np.nan_to_num(isochrone.times, nan=np.inf)
+        times = np.minimum(times, isochrone.budgets[-1] + 1).astype(np.float64)
+        generator = contour_generator(self.x, self.y, times, fill_type=FillType.OuterOffset)
+
+        result = []
+        for budget in isochrone.budgets:
+            points, offsets = generator.filled(-1.0, float(budget))
+            polygons = []
+            for xy, rings in zip(points, offsets):
+                ll = self.projection.en_to_ll(xy)
+                polygons.append([ll[rings[k]:rings[k+1]] for k in range(len(rings) - 1)])
+            result.append(polygons)
+        return result
+
+    def geojson(self, isochrone):
+        """ Feature collection of one MultiPolygon per budget, with properties
+        ``budget`` and ``departure_time``.
+        """
+        features = []
+        for budget, polygons in zip(isochrone.budgets, self.polygons(isochrone)):
+            geometry = geojson.MultiPolygon([[ring.tolist() for ring in polygon]
+                                             for polygon in polygons])
+            features.append(geojson.Feature(geometry=geometry, properties={
+                'budget': float(budget), 'departure_time': int(isochrone.departure_time)}))
+        return geojson.FeatureCollection(features)
@@ -0,0 +1,135 @@
+""" Precomputed all-pairs station travel times. """
+
+import os
+import json
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .router import Router
+
+
+class TravelTimeMatrix(object):
+    """ Travel times between every pair of stations, as float32 seconds.
+
+    Row and column ``i`` belong to network stop ``stops[i]``. Unreachable
+    pairs are ``inf``. Lookups are array indexing, with no graph search.
+
+    Args:
+        times:  (S, S) array of travel times.
+        stops:  (S,) network stop indices of the rows and columns.
+        n_stops: Number of stops in the network, to size the stop lookup.
+    """
+
+    def __init__(self, times, stops, n_stops=None):
+        self.times = np.asarray(times, dtype=np.float32)
+        self.stops = np.asarray(stops, dtype=np.int64)
+
+        n_stops = n_stops or (int(self.stops.max()) + 1 if len(self.stops) else 0)
+        self.rows = np.full(n_stops, -1, dtype=np.int64)
+        self.rows[self.stops] = np.arange(len(self.stops))
+
+    def __call__(self, origins, destinations):
+        """ Times between network stop indices, broadcast elementwise. """
+        return self.times[self.rows[origins], self.rows[destinations]]
+
+    def row(self, origin):
+        """ Times from one stop to every station of the matrix. """
+        return self.times[self.rows[origin]]
+
+
+    @classmethod
+    def compute(cls, router, workers=None):
+        """ Run a one-to-all search from every station of ``router``.
+
+        With ``workers``, origins are split across a pool of that many
+        processes, each holding its own copy of the router. Each search takes
+        only milliseconds on a network of a few thousand stops, so copying the
+        router to the workers can outweigh the gain; on the TfL network the
+        pool has given no measurable speedup.
+        """
+
+        stops = router.node_stop[:router.n_stations]
+        if workers is None:
+            times = np.stack([router.one_to_all(s)[stops] for s in stops])
+        else:
+            chunks = [c for c in np.array_split(stops, 4 * workers) if len(c)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=_set_router,
+                                     initargs=(router,)) as pool:
+                times = np.concatenate(list(pool.map(_rows, chunks)))
+
+        return cls(times, stops, n_stops=router.network.n_stops)
+
+
+    @classmethod
+    def for_snapshot(cls, snapshot, lines=None, mode=None, workers=None, **router_kwargs):
+        """ Matrix for a snapshot's lines, reusing one saved beside it.
+
+        The matrix is saved next to the snapshot file under a name derived from
+        the snapshot's digest, the lines and the router settings, so it is
+        recomputed only when the network or the question changes.
+
+        Args:
+            snapshot:       A :class:`~londinium.snapshot.NetworkSnapshot`.
+            lines:          Names of lines to route over.
+            mode:           Name of a mode whose lines to route over, instead.
+            workers:        Process pool size for computing the matrix.
+            router_kwargs:  Passed to :class:`~londinium.routing.router.Router`.
+        """
+
+        if mode is not None:
+            lines = list(snapshot.modes[mode].lines)
+
+        key = json.dumps([snapshot.digest, sorted(lines) if lines is not None else None,
+                          [(k, _parameter(v)) for k, v in sorted(router_kwargs.items())]])
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        filename = '{}.{}.ttm.npz'.format(snapshot.filename, digest[:16])
+
+        if os.path.exists(filename):
+            return cls.load(filename, n_stops=snapshot.n_stops)
+
+        matrix = cls.compute(Router(snapshot, lines=lines, **router_kwargs), workers=workers)
+        matrix.save(filename)
+        return matrix
+
+    def save(self, filename):
+        with open(filename, 'wb') as f:
+            np.savez(f, times=self.times, stops=self.stops)
+
+    @classmethod
+    def load(cls, filename, n_stops=None):
+        with np.load(filename) as f:
+            return cls(f['times'], f['stops'], n_stops=n_stops)
+
+
+def _parameter(value):
+    """ JSON form of a router argument that is the same in every process.
+
+    Projections are identified by their ``_key()`` and other objects by
+    their class name and attributes, never by ``repr``, which may hold an
+    address.
+    """
+    if hasattr(value, '_key'):
+        return _parameter(value._key())
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_parameter(v) for v in value]
+    if isinstance(value, dict):
+        return [[str(k), _parameter(v)] for k, v in sorted(value.items())]
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return [type(value).__name__, _parameter(vars(value))]
+
+
+_ROUTER = None
+
+def _set_router(router):
+    global _ROUTER
+    _ROUTER = router
+
+def _rows(origins):
+    stops = _ROUTER.node_stop[:_ROUTER.n_stations]
+    return np.stack([_ROUTER.one_to_all(s)[stops] for s in origins]).astype(np.float32)
@@ -0,0 +1,390 @@
+""" Pareto-optimal journeys over arrival time and transfers by RAPTOR. """
+
+import numpy as np
+from collections import namedtuple
+
+from .csa import interchange_walks, _ranges
+from ..geodesy.projections import NationalGrid
+from ..util.cached_property import cached_property
+
+
+Itinerary = namedtuple('Itinerary', ['departure', 'arrival', 'transfers', 'legs'])
+Ride = namedtuple('Ride', ['line', 'pattern', 'trip', 'stops', 'links', 'departure', 'arrival'])
+Walk = namedtuple('Walk', ['stops', 'departure', 'arrival'])
+
+
+class Raptor(object):
+    """ Round-based public transit routing (RAPTOR) over a network's patterns.
+
+    Round ``k`` finds the earliest arrival at every stop using at most ``k``
+    trips, by scanning each pattern that calls at a stop improved in the
+    round before, and then walking on through interchanges. Each round can
+    only improve on the last by taking one more trip, so the rounds in which
+    the arrival at the destination improves give the Pareto-optimal
+    journeys over arrival time and number of transfers.
+
+    A pattern's trips share its run and wait times, so a trip is its
+    departure from the first stop and trips are ordered the same at every
+    stop. Scanning a pattern is then a running minimum over its stops of the
+    earliest trip catchable at each, and one round scans every pattern at
+    once as a segmented running minimum over the flat pattern arrays, with
+    no Python loop over patterns or stops.
+
+    Range queries (rRAPTOR) run once per departure in a window, latest
+    first, keeping the arrival times of later departures as bounds, so each
+    run only does the work that an earlier start changes.
+
+    The pattern arrays are rearranged once, when the planner is built, and
+    shared by every query, so many origins can be planned with one planner.
+    Walks and times are as for
+    :class:`~londinium.routing.csa.ConnectionScan`.
+
+    Args:
+        network:                A :class:`~londinium.network.NetworkArrays`.
+        projection:             Projects stop locations to metres, for walks.
+                                ``None`` if they are already projected.
+        walk_speed:             Metres per second on interchange walks.
+        interchange_penalty:    Seconds added to each interchange walk.
+        transfer_time:          Seconds to change between trips at a stop.
+        max_rounds:             Most trips in a journey.
+    """
+
+    def __init__(self, network, projection=NationalGrid(), walk_speed=1.3,
+                 interchange_penalty=60.0, transfer_time=0.0, max_rounds=8):
+        self.network = network
+        self.walk_speed = walk_speed
+        self.interchange_penalty = interchange_penalty
+        self.transfer_time = transfer_time
+        self.max_rounds = max_rounds
+
+        locations = np.asarray(network.coordinates, dtype=np.float64)
+        if projection is not None:
+            locations = projection.ll_to_en(locations)
+        self.positions = locations
+
+        self.walk_indptr, self.walk_targets, self.walk_times = interchange_walks(
+            network, self.positions, walk_speed, interchange_penalty)
+
+        self._build()
+
+
+    def _build(self):
+        """ Flat pattern positions, trips sorted within each pattern, and
+        the positions at each stop.
+        """
+
+        n = self.network
+        self.stop_offsets = n['pattern_stop_offsets'].astype(np.int64)
+        self.trip_offsets = n['pattern_trip_offsets'].astype(np.int64)
+        n_patterns = len(self.stop_offsets) - 1
+        counts = np.diff(self.stop_offsets)
+
+        # Pattern positions: one per stop of each pattern
+        self.position_stop = n['pattern_stops'].astype(np.int64)
+        self.position_pattern = np.repeat(np.arange(n_patterns), counts)
+        self.arrival_offsets = n['pattern_arrivals'].astype(np.int64)
+        self.departure_offsets = n['pattern_departures'].astype(np.int64)
+        self.last = np.zeros(len(self.position_stop), dtype=bool)
+        self.last[self.stop_offsets[1:][counts > 0] - 1] = True
+
+        # Trips in departure order within each pattern, by their network index
+        trip_pattern = np.repeat(np.arange(n_patterns), np.diff(self.trip_offsets))
+        self.trips = np.lexsort((n['trip_departures'], trip_pattern))
+        self.trip_starts = n['trip_departures'][self.trips].astype(np.int64)
+
+        # Trips of all patterns as one sorted key, to search them all at once
+        self._span = int(self.trip_starts.max(initial=0)) + 3
+        self._trip_keys = trip_pattern[self.trips] * self._span + self.trip_starts + 1
+
+        # Keys for the segmented running minimum of trips along patterns
+        self._width = int(np.diff(self.trip_offsets).max(initial=0)) + 1
+        self._n_positions = max(len(self.position_stop), 1)
+
+        order = np.argsort(self.position_stop, kind='stable')
+        self.stop_positions = order
+        self.stop_indptr = np.zeros(n.n_stops + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.position_stop, minlength=n.n_stops),
+                  out=self.stop_indptr[1:])
+
+    @cached_property
+    def _links(self):
+        """ Sorted keys of (line, stop, stop) for every link, both ways, and
+        the link of each.
+        """
+        n = self.network
+        a, b = n['link_stops'][:, 0].astype(np.int64), n['link_stops'][:, 1].astype(np.int64)
+        line = n['link_line'].astype(np.int64)
+        keys = np.concatenate(((line * n.n_stops + a) * n.n_stops + b,
+                               (line * n.n_stops + b) * n.n_stops + a))
+        links = np.tile(np.arange(n.n_links), 2)
+        order = np.argsort(keys, kind='stable')
+        return keys[order], links[order]
+
+
+    def _stop(self, stop):
+        """ Stop index of a stop index or id. """
+        if isinstance(stop, str):
+            return self.network.stop_index[stop]
+        return int(stop)
+
+    def _labels(self, rounds):
+        """ Fresh search state for ``rounds`` rounds. """
+        n_stops = self.network.n_stops
+        shape = (rounds + 1, n_stops)
+        return dict(
+            arrival=np.full(shape, np.inf),
+            ready=np.full(shape, np.inf),
+            board=np.full(shape, -1, dtype=np.int64),
+            alight=np.full(shape, -1, dtype=np.int64),
+            trip=np.full(shape, -1, dtype=np.int64),
+            walk=np.full(shape, -1, dtype=np.int64),
+        )
+
+    def _improve(self, state, k, stops, times, target):
+        """ Lower round ``k`` arrivals at ``stops`` to ``times`` where that
+        beats them and the arrival at ``target``, returning the mask of
+        updates that won.
+
+        Round ``k`` arrivals are the best with at most ``k`` trips, from
+        this or any later departure, so they bound both the stop and the
+        target without losing journeys with fewer trips.
+        """
+        arrival = state['arrival'][k]
+        bound = arrival[stops] if target is None else np.minimum(arrival[stops], arrival[target])
+        better = times < bound
+        np.minimum.at(arrival, stops[better], times[better])
+        return better & (times == arrival[stops])
+
+    def _walk(self, state, k, stops, target):
+        """ Walk on from ``stops`` in round ``k``, returning the stops improved. """
+
+        starts, counts = self.walk_indptr[stops], np.diff(self.walk_indptr)[stops]
+        edges = _ranges(starts, counts)
+        source = np.repeat(stops, counts)
+        reached = self.walk_targets[edges]
+        times = state['arrival'][k, source] + self.walk_times[edges]
+
+        won = self._improve(state, k, reached, times, target)
+        np.minimum.at(state['ready'][k], reached[won], times[won])
+        state['walk'][k, reached[won]] = source[won]
+        return np.unique(reached[won])
+
+    def _run(self, state, origin, time, target=None, rounds=None):
+        """ Rounds from ``origin`` at ``time``, on top of any earlier state. """
+
+        rounds = self.max_rounds if rounds is None else rounds
+        P, W, N = len(self.stop_offsets) - 1, self._width, self._n_positions
+        arrival, ready = state['arrival'], state['ready']
+
+        marked = np.zeros(0, dtype=np.int64)
+        if time < arrival[0, origin]:
+            arrival[0, origin] = ready[0, origin] = time
+            state['walk'][0, origin] = -1
+            marked = np.r_[origin, self._walk(state, 0, np.array([origin]), target)]
+
+        for k in range(1, rounds + 1):
+            if not len(marked):
+                break
+            arrival[k] = np.minimum(arrival[k], arrival[k-1])
+            ready[k] = np.minimum(ready[k], ready[k-1])
+
+            # Earliest trip catchable at each position of a marked stop
+            counts = self.stop_indptr[marked + 1] - self.stop_indptr[marked]
+            pos = self.stop_positions[_ranges(self.stop_indptr[marked], counts)]
+            pos = pos[~self.last[pos]]
+            p = self.position_pattern[pos]
+            earliest = np.ceil(ready[k-1, self.position_stop[pos]] - self.departure_offsets[pos])
+            earliest = np.clip(earliest, -1, self._span - 2).astype(np.int64)
+            g = np.searchsorted(self._trip_keys, p * self._span + earliest + 1)
+            ok = g < self.trip_offsets[p + 1]
+            pos, p, g = pos[ok], p[ok], g[ok]
+            if not len(pos):
+                break
+
+            # Scan each pattern from its first boarding to its end
+            first = np.full(P, N, dtype=np.int64)
+            np.minimum.at(first, p, pos)
+            patterns = np.flatnonzero(first < N)
+            counts = self.stop_offsets[patterns + 1] - first[patterns]
+            scan = _ranges(first[patterns], counts)
+            scan_pattern = np.repeat(patterns, counts)
+
+            # Running minimum of (pattern, trip, boarding position), with
+            # later patterns keyed lower so that no minimum leaks across
+            key = (P - scan_pattern) * W + (W - 1)
+            at = (np.cumsum(counts) - counts)[np.searchsorted(patterns, p)] + pos - first[p]
+            key[at] = (P - p) * W + (g - self.trip_offsets[p])
+            running = np.minimum.accumulate(key * N + scan)
+            previous = np.r_[-1, running[:-1]]
+            same = np.r_[False, scan_pattern[1:] == scan_pattern[:-1]]
+            local = previous // N - (P - scan_pattern) * W
+            riding = same & (local < W - 1)
+
+            alight, previous = scan[riding], previous[riding]
+            pattern = scan_pattern[riding]
+            trip = self.trip_offsets[pattern] + local[riding]
+            times = self.trip_starts[trip] + self.arrival_offsets[alight]
+            stops = self.position_stop[alight]
+
+            won = self._improve(state, k, stops, times, target)
+            winners = stops[won]
+            state['board'][k, winners] = previous[won] % N
+            state['alight'][k, winners] = alight[won]
+            state['trip'][k, winners] = trip[won]
+            state['walk'][k, winners] = -1
+            np.minimum.at(ready[k], winners, times[won] + self.transfer_time)
+
+            improved = np.unique(winners)
+            marked = np.union1d(improved, self._walk(state, k, improved, target))
+
+        # Rounds not reached still allow everything the ones before do
+        np.minimum.accumulate(arrival, axis=0, out=arrival)
+        np.minimum.accumulate(ready, axis=0, out=ready)
+        return state
+
+
+    def arrivals(self, origin, departure_time, rounds=None):
+        """ (K + 1, S) earliest arrival at every stop from ``origin`` with at
+        most ``k`` trips, for each round ``k``.
+        """
+        rounds = self.max_rounds if rounds is None else rounds
+        state = self._run(self._labels(rounds), self._stop(origin), departure_time,
+                          rounds=rounds)
+        return state['arrival']
+
+    def journeys(self, origin, destination, departure_time, rounds=None):
+        """ Pareto-optimal :class:`Itinerary` list leaving at ``departure_time``,
+        fewest transfers first, each arriving earlier than the last.
+        """
+
+        rounds = self.max_rounds if rounds is None else rounds
+        origin, destination = self._stop(origin), self._stop(destination)
+        state = self._run(self._labels(rounds), origin, departure_time, destination, rounds)
+        return self._pareto(state, origin, destination, departure_time, np.inf)
+
+    def profile(self, origin, destination, start, end, rounds=None):
+        """ Pareto-optimal :class:`Itinerary` list over departure, arrival and
+        transfers, for departures from ``start`` to ``end``.
+
+        Each trip leaving ``origin``, or a stop within a walk of it, in the
+        window gives a departure time. These are run latest first, after the
+        first departure past the window, keeping every label, so an earlier
+        departure is only kept where it arrives earlier or with fewer
+        transfers than any later one.
+        """
+
+        rounds = self.max_rounds if rounds is None else rounds
+        origin, destination = self._stop(origin), self._stop(destination)
+
+        # Stops boarded from the origin, and the walk to each
+        lo, hi = self.walk_indptr[origin:origin+2]
+        stops = np.r_[origin, self.walk_targets[lo:hi]]
+        walks = np.r_[0.0, self.walk_times[lo:hi]]
+        counts = self.stop_indptr[stops + 1] - self.stop_indptr[stops]
+        pos = self.stop_positions[_ranges(self.stop_indptr[stops], counts)]
+        walk = np.repeat(walks, counts)[~self.last[pos]]
+        pos = pos[~self.last[pos]]
+        p = self.position_pattern[pos]
+        n_trips = self.trip_offsets[p + 1] - self.trip_offsets[p]
+        trips = _ranges(self.trip_offsets[p], n_trips)
+        times = (self.trip_starts[trips] + np.repeat(self.departure_offsets[pos], n_trips)
+                 - np.repeat(walk, n_trips))
+        times = np.unique(times[times >= start])
+        later = times[times > end]
+        times = times[times <= end][::-1]
+
+        # The first departure after the window only bounds those in it, so
+        # that a journey leaving after the window is not reported as one in it
+        state = self._labels(rounds)
+        if len(later):
+            self._run(state, origin, later[0], destination, rounds)
+        result = []
+        for time in times:
+            before = state['arrival'][:, destination].copy()
+            self._run(state, origin, time, destination, rounds)
+            result.extend(self._pareto(state, origin, destination, time, before))
+
+        # Keep those that no other leaves later, arrives earlier and changes less
+        kept = []
+        for option in sorted(result, key=lambda o: (-o.departure, o.arrival, o.transfers)):
+            if not any(o.arrival <= option.arrival and o.transfers <= option.transfers
+                       for o in kept):
+                kept.append(option)
+        return sorted(kept, key=lambda o: (o.departure, o.transfers))
+
+    def _pareto(self, state, origin, destination, time, before):
+        """ Itineraries for each round that improved on both the round
+        before and ``before``.
+        """
+
+        arrival = state['arrival'][:, destination]
+        previous = np.r_[np.inf, arrival[:-1]]
+        rounds = np.flatnonzero((arrival < previous) & (arrival < before))
+        return [self._itinerary(state, origin, destination, time, k) for k in rounds]
+
+
+    def _itinerary(self, state, origin, destination, time, k):
+        """ The journey to ``destination`` found by round ``k``. """
+
+        # A round's label at a stop is current only where that round improved
+        # on the one before, else the arrival was carried over
+        arrival = state['arrival']
+        steps, stop = [], destination
+        while stop != origin and k >= 0:
+            if k > 0 and arrival[k, stop] >= arrival[k-1, stop]:
+                k -= 1
+            elif state['walk'][k, stop] >= 0:
+                steps.append(('walk', int(state['walk'][k, stop]), stop))
+                stop = int(state['walk'][k, stop])
+            elif state['alight'][k, stop] >= 0:
+                board = int(state['board'][k, stop])
+                steps.append(('ride', board, int(state['alight'][k, stop]),
+                              int(state['trip'][k, stop])))
+                stop = int(self.position_stop[board])
+                k -= 1
+            else:
+                k -= 1
+
+        n = self.network
+        legs = []
+        for step in steps[::-1]:
+            if step[0] == 'walk':
+                _, a, b = step
+                lo, hi = self.walk_indptr[a:a+2]
+                walk = float(self.walk_times[lo + np.flatnonzero(self.walk_targets[lo:hi] == b)[0]])
+                legs.append(Walk(stops=[n.stop(a), n.stop(b)], departure=time,
+                                 arrival=time + walk))
+                time = time + walk
+                continue
+
+            _, board, alight, trip = step
+            pattern = int(self.position_pattern[board])
+            line = int(n['pattern_line'][pattern])
+            stops = self.position_stop[board:alight+1]
+            departure = int(self.trip_starts[trip] + self.departure_offsets[board])
+            arrival = int(self.trip_starts[trip] + self.arrival_offsets[alight])
+            legs.append(Ride(
+                line=n.line(line),
+                pattern=str(n['pattern_ids'][pattern]),
+                trip=str(n['trip_ids'][self.trips[trip]]),
+                stops=[n.stop(s) for s in stops],
+                links=self._ride_links(line, stops),
+                departure=departure,
+                arrival=arrival
+            ))
+            time = arrival
+
+        rides = sum(isinstance(leg, Ride) for leg in legs)
+        if not legs:
+            return Itinerary(departure=time, arrival=time, transfers=0, legs=[])
+        return Itinerary(departure=legs[0].departure, arrival=legs[-1].arrival,
+                         transfers=max(rides - 1, 0), legs=legs)
+
+    def _ride_links(self, line, stops):
+        """ Link of the line between each pair of stops, ``None`` where it has none. """
+        n = self.network
+        keys, links = self._links
+        wanted = (line * n.n_stops + stops[:-1]) * n.n_stops + stops[1:]
+        at = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        return [n.link(links[i]) if len(keys) and keys[i] == w else None
+                for i, w in zip(at, wanted)]
@@ -0,0 +1,265 @@
+""" Shortest paths over a network's lines, links and interchanges. """
+
+import numpy as np
+from heapq import heappush, heappop
+from collections import namedtuple
+
+from ..geodesy.projections import NationalGrid
+from ..util.cached_property import cached_property
+
+
+Path = namedtuple('Path', ['time', 'stops', 'links'])
+
+
+class Router(object):
+    """ Dijkstra and A* search over :class:`~londinium.network.NetworkArrays`.
+
+    The search graph has a station node for every stop on the routed lines and
+    a platform node for every stop of every line. Links join platforms of the same line,
+    boarding a line from a station costs ``transfer_penalty`` and alighting is
+    free, so changing lines at a shared stop is penalised while staying on a
+    line is not. Stops tied by an interchange are joined station to station by
+    a walk at ``walk_speed`` plus ``interchange_penalty``. The first boarding of
+    a journey is free.
+
+    Costs are in seconds. Links use their time if known, or else their
+    distance at ``speed``.
+
+    Args:
+        network:                A :class:`~londinium.network.NetworkArrays`.
+        lines:                  Names of lines to route over. Defaults to all.
+        projection:             Projects stop locations to metres, for walks and
+                                the A* heuristic. ``None`` if they are already
+                                projected.
+        speed:                  Metres per second on links with no time.
+        walk_speed:             Metres per second on interchange walks.
+        transfer_penalty:       Seconds to board a line at a stop.
+        interchange_penalty:    Seconds added to each interchange walk.
+    """
+
+    def __init__(self, network, lines=None, projection=NationalGrid(),
+                 speed=9.0, walk_speed=1.3, transfer_penalty=180.0,
+                 interchange_penalty=60.0):
+        self.network = network
+        self.speed = speed
+        self.walk_speed = walk_speed
+        self.transfer_penalty = transfer_penalty
+        self.interchange_penalty = interchange_penalty
+
+        locations = np.asarray(network.coordinates, dtype=np.float64)
+        if projection is not None:
+            locations = projection.ll_to_en(locations)
+        self.positions = locations
+
+        line_names = [str(x) for x in network['line_names']]
+        if lines is None:
+            self.line_indices = np.arange(len(line_names))
+        else:
+            self.line_indices = np.array([line_names.index(x) for x in lines], dtype=np.int64)
+
+        self._build()
+
+
+    def _build(self):
+        """ Expand the network into a CSR search graph. """
+
+        n = self.network
+        n_stops = n.n_stops
+
+        # Platform nodes, numbered after the station nodes
+        platform_stop, platform_line = [], []
+        for l in self.line_indices:
+            lo, hi = n['line_stop_offsets'][l:l+2]
+            members = np.unique(n['line_stops'][lo:hi])
+            platform_stop.append(members)
+            platform_line.append(np.full(len(members), l))
+        platform_stop = np.concatenate(platform_stop or [np.zeros(0, dtype=np.int64)]).astype(np.int64)
+        platform_line = np.concatenate(platform_line or [np.zeros(0, dtype=np.int64)]).astype(np.int64)
+        platform_key = platform_line * n_stops + platform_stop
+        order = np.argsort(platform_key)
+        platform_key, platform_stop, platform_line = (
+            platform_key[order], platform_stop[order], platform_line[order])
+
+        # Station nodes first, then platforms
+        node_stop = np.unique(platform_stop)
+        stop_node = np.full(n_stops, -1, dtype=np.int64)
+        stop_node[node_stop] = np.arange(len(node_stop))
+        n_stations = len(node_stop)
+        platforms = n_stations + np.arange(len(platform_key))
+
+        def platform(line, stop):
+            return platforms[np.searchsorted(platform_key, line * n_stops + stop)]
+
+        # Links between platforms, both ways
+        links = np.flatnonzero(np.isin(n['link_line'], self.line_indices))
+        a, b = n['link_stops'][links, 0], n['link_stops'][links, 1]
+        line = n['link_line'][links].astype(np.int64)
+        cost = n['link_time'][links]
+        distance = n['link_distance'][links]
+        no_time = np.isnan(cost)
+        cost = np.where(no_time, distance / self.speed, cost)
+        cost = np.where(np.isnan(cost), np.linalg.norm(
+            self.positions[a] - self.positions[b], axis=1) / self.speed, cost)
+        pa, pb = platform(line, a), platform(line, b)
+
+        sources = [pa, pb]
+        targets = [pb, pa]
+        weights = [cost, cost]
+        edge_links = [links, links]
+
+        # Boarding and alighting
+        sources += [stop_node[platform_stop], platforms]
+        targets += [platforms, stop_node[platform_stop]]
+        weights += [np.full(len(platforms), self.transfer_penalty), np.zeros(len(platforms))]
+        edge_links += [np.full(len(platforms), -1)] * 2
+
+        # Interchange walks between every pair of stops in each interchange
+        offsets, members = n['interchange_offsets'], n['interchange_stops']
+        walk_a, walk_b = [], []
+        for k in range(len(offsets) - 1):
+            group = members[offsets[k]:offsets[k+1]]
+            group = group[stop_node[group] >= 0]
+            i, j = np.meshgrid(group, group)
+            mask = i != j
+            walk_a.append(i[mask])
+            walk_b.append(j[mask])
+        if walk_a:
+            walk_a, walk_b = np.concatenate(walk_a), np.concatenate(walk_b)
+            walk = (np.linalg.norm(self.positions[walk_a] - self.positions[walk_b], axis=1)
+                    / self.walk_speed + self.interchange_penalty)
+            sources.append(stop_node[walk_a])
+            targets.append(stop_node[walk_b])
+            weights.append(walk)
+            edge_links.append(np.full(len(walk_a), -1))
+
+        sources = np.concatenate(sources).astype(np.int64)
+        targets = np.concatenate(targets).astype(np.int64)
+        weights = np.concatenate(weights).astype(np.float64)
+        edge_links = np.concatenate(edge_links).astype(np.int64)
+
+        n_nodes = n_stations + len(platforms)
+        order = np.argsort(sources, kind='stable')
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n_nodes), out=indptr[1:])
+
+        self.n_nodes = n_nodes
+        self.n_stations = n_stations
+        self.node_stop = np.r_[node_stop, platform_stop]
+        self.node_positions = self.positions[self.node_stop]
+        self.stop_node = stop_node
+        self.indptr = indptr
+        self.indices = targets[order]
+        self.weights = weights[order]
+        self.edge_links = edge_links[order]
+
+        # Fastest straight-line speed over any edge keeps A* admissible
+        straight = np.linalg.norm(self.positions[self.node_stop[sources]]
+                                  - self.positions[self.node_stop[targets]], axis=1)
+        moving = weights > 0
+        self.max_speed = max(self.walk_speed, self.speed,
+                             float(np.max(straight[moving] / weights[moving], initial=0)))
+
+        # Python lists are much faster than arrays to index in the search loop
+        self._indptr = indptr.tolist()
+        self._indices = self.indices.tolist()
+        self._weights = self.weights.tolist()
+
+
+    def _node(self, stop):
+        """ Station node of a stop index or id. """
+        if isinstance(stop, str):
+            stop = self.network.stop_index[stop]
+        node = int(self.stop_node[stop])
+        if node < 0:
+            raise ValueError('Stop {} is not on a routed line.'.format(stop))
+        return node
+
+    def _sources(self, origin):
+        """ Origin station and its platforms, all boarded for free. """
+        return [origin] + np.flatnonzero(self.node_stop == self.node_stop[origin])[1:].tolist()
+
+    def _search(self, sources, target=None, heuristic=None, weights=None, settled=None):
+        """ Heap-based Dijkstra, or A* if given a heuristic list per node.
+
+        ``weights`` may replace the edge costs with a list of others, and
+        nodes are appended to a ``settled`` list in the order they are fixed.
+        """
+
+        indptr, indices = self._indptr, self._indices
+        weights = self._weights if weights is None else weights
+        dist = [np.inf] * self.n_nodes
+        pred = [-1] * self.n_nodes
+        done = [False] * self.n_nodes
+
+        heap = []
+        for s in sources:
+            dist[s] = 0.0
+            heappush(heap, (heuristic[s] if heuristic else 0.0, 0.0, s))
+
+        while heap:
+            _, d, u = heappop(heap)
+            if done[u]:
+                continue
+            done[u] = True
+            if settled is not None:
+                settled.append(u)
+            if u == target:
+                break
+            for e in range(indptr[u], indptr[u+1]):
+                v = indices[e]
+                nd = d + weights[e]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    pred[v] = e
+                    heappush(heap, (nd + heuristic[v] if heuristic else nd, nd, v))
+
+        return dist, pred
+
+    def _heuristic(self, target):
+        d = np.linalg.norm(self.node_positions - self.node_positions[target], axis=1)
+        return (d / self.max_speed).tolist()
+
+    @cached_property
+    def edge_sources(self):
+        """ Node each edge leaves from, for walking back along a path. """
+        return np.repeat(np.arange(self.n_nodes), np.diff(self.indptr))
+
+
+    def shortest_path(self, origin, destination, algorithm='astar'):
+        """ Fastest path between two stops, as a :class:`Path`.
+
+        ``origin`` and ``destination`` are stop indices or ids. ``stops`` and
+        ``links`` of the result are indices into the network, and ``time`` is
+        ``inf`` if the destination cannot be reached.
+        """
+
+        if algorithm not in ('astar', 'dijkstra'):
+            raise ValueError('algorithm must be one of {}.'.format(('astar', 'dijkstra')))
+        origin, destination = self._node(origin), self._node(destination)
+        heuristic = self._heuristic(destination) if algorithm == 'astar' else None
+
+        dist, pred = self._search(self._sources(origin), destination, heuristic)
+        if dist[destination] == np.inf:
+            return Path(time=np.inf, stops=[], links=[])
+
+        edge_source = self.edge_sources
+        stops, links = [int(self.node_stop[destination])], []
+        node = destination
+        while pred[node] != -1:
+            e = pred[node]
+            if self.edge_links[e] >= 0:
+                links.append(int(self.edge_links[e]))
+            node = int(edge_source[e])
+            stop = int(self.node_stop[node])
+            if stop != stops[-1]:
+                stops.append(stop)
+
+        return Path(time=dist[destination], stops=stops[::-1], links=links[::-1])
+
+    def one_to_all(self, origin):
+        """ Fastest time from ``origin`` to every stop, ``inf`` if unreachable. """
+
+        dist, _ = self._search(self._sources(self._node(origin)))
+        times = np.full(self.network.n_stops, np.inf)
+        times[self.node_stop[:self.n_stations]] = dist[:self.n_stations]
+        return times
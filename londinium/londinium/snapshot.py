@@ -0,0 +1,197 @@
+""" Compiled, memory-mappable snapshot of the whole transport network.
+
+A snapshot is a single file holding the arrays of a
+:class:`~londinium.network.NetworkArrays`, plus geometry layers for drawing.
+Loading it maps the file read-only, so many processes reading the same
+snapshot share its pages rather than each parsing the GeoJSON and
+TransXChange sources again.
+
+Layout::
+
+    MAGIC | version (uint32) | header length (uint32) | JSON header | arrays
+
+Each array starts on a 64-byte boundary, at the offset given in the header.
+"""
+
+import os
+import json
+import struct
+import hashlib
+import tempfile
+import numpy as np
+from glob import glob
+
+from .network import Stop, Interchange, NetworkArrays
+from .util.ragged import flatten
+from .parsing.read import read_repo_data_files, read_tfl_data, read_geojson_network
+
+
+MAGIC = b'LONDSNAP'
+VERSION = 3
+ALIGN = 64
+
+
+def build_snapshot(filename, repo_paths, tfl_paths=None, cache=None, workers=None):
+    """ Read the network sources and compile them into one snapshot file.
+
+    From ``repo_paths`` this takes the TfL lines and stations as a ``'tfl'``
+    mode, National Rail and disused stations as stops outside any line,
+    out-of-station interchanges, and the National Rail lines as a geometry
+    layer. From ``tfl_paths``, if given, every timetable folder with files in
+    it becomes a mode of its own.
+
+    Args:
+        filename:   Where to write the snapshot.
+        repo_paths: A :class:`~londinium.parsing.datapaths.RepoDataPaths`.
+        tfl_paths:  A :class:`~londinium.parsing.datapaths.TfLDataPaths`.
+        cache:      A :class:`~londinium.util.cache.ParseCache` for the parsers.
+        workers:    Process pool size for reading timetables.
+    """
+
+    (tfl_lines, nr_lines, tfl_stations, nr_stations, disused, osis) = read_repo_data_files(
+        repo_paths.lines.tfl,
+        repo_paths.lines.nr,
+        repo_paths.stations.tfl,
+        repo_paths.stations.nr.all,
+        repo_paths.stations.disused,
+        repo_paths.osis.json,
+        cache=cache
+    )
+    sources = [f.path for f in (tfl_lines, nr_lines, tfl_stations, nr_stations, disused, osis)]
+
+    modes = [read_geojson_network(tfl_lines, tfl_stations, name='tfl', way='rail')]
+
+    if tfl_paths is not None:
+        present = [m for m, pattern in tfl_paths.timetables._asdict().items() if glob(pattern)]
+        for m, mode in read_tfl_data(tfl_paths, modes=present, workers=workers, cache=cache).items():
+            modes.append(mode)
+            sources.extend(sorted(glob(tfl_paths.timetables._asdict()[m])))
+
+    stops = [Stop(id='NR_{}'.format(s.tlc_id), name=s.name, location=tuple(s.location))
+             for s in nr_stations.stations]
+    stops += [Stop(id=s.id, name=s.name, location=s.location, disused=True)
+              for s in disused.stations]
+
+    by_id = {stop.id:stop for mode in modes for line in mode.lines.values()
+             for stop in line.stops.values()}
+    interchanges = []
+    for osi in osis.osis:
+        ids = [x for x in [osi.a, osi.b] + list(osi.e[3:]) if x in by_id]
+        if len(ids) > 1:
+            interchanges.append(Interchange([by_id[x] for x in ids]))
+
+    layers = {'nr_lines': [link.geometry for link in nr_lines.links]}
+
+    write_snapshot(filename, modes, stops=stops, interchanges=interchanges,
+                   layers=layers, sources=sources)
+
+
+def write_snapshot(filename, modes, stops=(), interchanges=(), layers=None, sources=()):
+    """ Compile network objects to arrays and write them as a snapshot.
+
+    See :meth:`~londinium.network.NetworkArrays.from_modes`.
+
+    Args:
+        filename:       Where to write the snapshot. Written atomically.
+        modes:          Iterable of :class:`~londinium.network.Mode`.
+        stops:          Extra :class:`~londinium.network.Stop` objects.
+        interchanges:   Iterable of :class:`~londinium.network.Interchange`.
+        layers:         Dict of name to a list of geometries, for drawing only.
+        sources:        Paths of source files, recorded with size and mtime.
+    """
+
+    arrays = dict(NetworkArrays.from_modes(modes, stops, interchanges).arrays)
+    for name, geometries in (layers or {}).items():
+        coordinates, offsets = flatten(geometries)
+        arrays['layer:{}:coordinates'.format(name)] = coordinates
+        arrays['layer:{}:offsets'.format(name)] = offsets
+
+    meta = {
+        'sources': [[os.path.abspath(p), os.path.getsize(p), os.stat(p).st_mtime_ns]
+                    for p in sources],
+        'layers': sorted(layers or {}),
+    }
+    _write(filename, arrays, meta)
+
+
+def load_snapshot(filename):
+    """ Memory-map a snapshot file. """
+    return NetworkSnapshot(filename)
+
+
+def _aligned(n):
+    return -(-n // ALIGN) * ALIGN
+
+
+def _write(filename, arrays, meta):
+    entries = dict()
+    digest = hashlib.sha1()
+    offset = 0
+    for name, array in arrays.items():
+        array = arrays[name] = np.ascontiguousarray(array)
+        offset = _aligned(offset)
+        entries[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes
+        digest.update(name.encode('utf-8'))
+        digest.update(array.tobytes())
+
+    header = json.dumps(dict(meta, arrays=entries, digest=digest.hexdigest())).encode('utf-8')
+    preamble = MAGIC + struct.pack('<II', VERSION, len(header)) + header
+    start = _aligned(len(preamble))
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(preamble.ljust(start, b'\0'))
+        for name, array in arrays.items():
+            f.seek(start + entries[name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, filename)
+
+
+class NetworkSnapshot(NetworkArrays):
+    """ NetworkArrays over a memory-mapped snapshot file.
+
+    Every array in :attr:`arrays` is a read-only view into the shared mapping,
+    so the :attr:`modes` views read pages shared with any other process that
+    has loaded the same file.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+        with open(filename, 'rb') as f:
+            preamble = f.read(len(MAGIC) + 8)
+            if preamble[:len(MAGIC)] != MAGIC:
+                raise ValueError('{} is not a network snapshot.'.format(filename))
+            version, length = struct.unpack('<II', preamble[len(MAGIC):])
+            if version != VERSION:
+                raise ValueError('Snapshot version {} is not {}.'.format(version, VERSION))
+            self.header = json.loads(f.read(length).decode('utf-8'))
+
+        start = _aligned(len(MAGIC) + 8 + length)
+        self._map = np.memmap(filename, dtype=np.uint8, mode='r')
+        super().__init__({
+            name: np.ndarray(tuple(e['shape']), dtype=np.dtype(e['dtype']),
+                             buffer=self._map, offset=start + e['offset'])
+            for name, e in self.header['arrays'].items()
+        })
+
+    def __reduce__(self):
+        # Unpickle by mapping the file again, so worker processes share pages
+        return (self.__class__, (self.filename,))
+
+    @property
+    def digest(self):
+        """ Hash of the array contents, identifying this network. """
+        return self.header['digest']
+
+    @property
+    def sources(self):
+        return self.header['sources']
+
+    def layer(self, name):
+        """ Coordinates and offsets of a geometry layer, as views. """
+        return (self['layer:{}:coordinates'.format(name)],
+                self['layer:{}:offsets'.format(name)])
@@ -0,0 +1,115 @@
+""" Persistent on-disk cache for records extracted by file parsers. """
+
+import os
+import glob
+import pickle
+import hashlib
+import tempfile
+
+
+class ParseCache(object):
+    """ Content-addressed store of parsed records, one pickle per entry.
+
+    An entry is keyed by the absolute path, size and modification time of the
+    source file together with the name and ``PARSER_VERSION`` of the parser
+    class, so editing a file or bumping a parser's version makes old entries
+    unreachable. Entries are named ``<path hash>-<parser hash>-<key
+    hash>.pickle``, so that everything stored for one source file, or by one
+    parser and version for it, can be found and removed.
+
+    Storing an entry removes only the stale entries of the same parser and
+    version for the same file, so different parsers of one file keep their
+    own entries. Entries of other parser versions stay until
+    :meth:`invalidate` or :meth:`clear`.
+    """
+
+    SUFFIX = '.pickle'
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _path_hash(path):
+        return hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _parser_hash(parser):
+        ident = '\0'.join([type(parser).__name__, str(parser.PARSER_VERSION)])
+        return hashlib.sha1(ident.encode('utf-8')).hexdigest()[:16]
+
+    def key(self, path, parser):
+        """ Cache key for the records ``parser`` extracts from ``path``. """
+
+        stat = os.stat(path)
+        ident = '\0'.join([
+            os.path.abspath(path),
+            str(stat.st_size),
+            str(stat.st_mtime_ns),
+            type(parser).__name__,
+            str(parser.PARSER_VERSION),
+        ])
+        digest = hashlib.sha1(ident.encode('utf-8')).hexdigest()
+        return '{}-{}-{}'.format(self._path_hash(path), self._parser_hash(parser), digest)
+
+    def filename(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def __contains__(self, key):
+        return os.path.exists(self.filename(key))
+
+    def load(self, key):
+        with open(self.filename(key), 'rb') as f:
+            return pickle.load(f)
+
+    def store(self, key, value):
+        """ Write an entry atomically, then remove stale entries of the same
+        path, parser and version.
+        """
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.filename(key))
+
+        prefix = key.rsplit('-', 1)[0]
+        for filename in glob.glob(os.path.join(self.directory, prefix + '-*' + self.SUFFIX)):
+            if filename != self.filename(key):
+                _remove(filename)
+
+    def fetch(self, path, parser, func):
+        """ Load the entry for ``path`` if present, else store ``func()``. """
+
+        key = self.key(path, parser)
+        try:
+            return self.load(key)
+        except FileNotFoundError:
+            # Absent, or removed as stale by another process since
+            pass
+
+        value = func()
+        self.store(key, value)
+        return value
+
+    def invalidate(self, path):
+        """ Remove every entry stored for ``path``. Returns how many. """
+
+        pattern = os.path.join(self.directory, self._path_hash(path) + '-*' + self.SUFFIX)
+        return sum(_remove(filename) for filename in glob.glob(pattern))
+
+    def clear(self):
+        """ Remove every entry. Returns how many. """
+
+        filenames = glob.glob(os.path.join(self.directory, '*' + self.SUFFIX))
+        return sum(_remove(filename) for filename in filenames)
+
+
+def _remove(filename):
+    """ Remove a file unless another process already has. Returns whether
+    this call removed it.
+    """
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        return False
+    return True
@@ -0,0 +1,33 @@
+""" Ragged arrays: many variable-length geometries in one flat buffer.
+
+Geometry ``k`` of ``(coordinates, offsets)`` is
+``coordinates[offsets[k]:offsets[k+1]]``, so whole layers can be passed to
+vectorised functions in one call and split up again afterwards.
+"""
+
+import numpy as np
+
+
+def flatten(geometries):
+    """ Stack geometries into an (M, 2) float array and (K + 1,) offsets. """
+
+    geometries = [np.reshape(np.asarray(g, dtype=np.float64), (-1, 2)) for g in geometries]
+    offsets = np.zeros(len(geometries) + 1, dtype=np.int64)
+    np.cumsum([len(g) for g in geometries], out=offsets[1:])
+    if geometries:
+        coordinates = np.concatenate(geometries)
+    else:
+        coordinates = np.zeros((0, 2))
+    return coordinates, offsets
+
+
+def split(coordinates, offsets):
+    """ List of views of each geometry in a flat buffer. """
+    if len(offsets) < 2:
+        return []
+    return np.split(coordinates, offsets[1:-1])
+
+
+def lengths(offsets):
+    """ Number of points in each geometry. """
+    return np.diff(offsets)
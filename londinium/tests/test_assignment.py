@@ -0,0 +1,80 @@
+import numpy as np
+
+from londinium.network import Line, Link, Mode, NetworkArrays, ODMatrix, Stop
+from londinium.routing.assignment import Assignment
+from londinium.routing.router import Router
+
+
+def two_routes():
+    """ Two lines from A to B, a fast one through C and a slow one through D,
+    with locations already in metres.
+    """
+
+    stops = {k: Stop(id=k, name=k, location=x) for k, x in
+             [('A', (0, 0)), ('B', (2000, 0)), ('C', (1000, 500)), ('D', (1000, -500))]}
+    mode = Mode('test')
+    for name, via, time in [('Fast', 'C', 200.0), ('Slow', 'D', 250.0)]:
+        line = Line(name)
+        members = [stops['A'], stops[via], stops['B']]
+        for stop in members:
+            line.add_stop(stop)
+        for a, b in zip(members[:-1], members[1:]):
+            line.add_link(Link(a, b, time=time))
+        mode.add_line(line)
+
+    network = NetworkArrays.from_modes([mode])
+    return network, Router(network, projection=None)
+
+
+def demand(network, trips):
+    index = network.stop_index
+    origins, destinations, counts = zip(*[(index[a], index[b], n) for a, b, n in trips])
+    return ODMatrix(np.zeros(len(counts)), origins, destinations, counts, network.n_stops)
+
+
+def link_index(network, line):
+    names = [str(x) for x in network['line_names']]
+    return np.flatnonzero(network['link_line'] == names.index(line))
+
+
+def test_all_or_nothing_takes_the_fastest_route():
+    network, router = two_routes()
+    loads = Assignment(router).all_or_nothing(demand(network, [('A', 'B', 1000), ('B', 'A', 10)]))
+
+    index = network.stop_index
+    assert loads.boardings.sum() == loads.alightings.sum() == 1010
+    assert loads.boardings[index['A']] == 1000 and loads.alightings[index['B']] == 1000
+    assert loads.unassigned == 0
+    fast, slow = link_index(network, 'Fast'), link_index(network, 'Slow')
+    assert np.allclose(loads.links[fast].sum(axis=1), 1010)
+    assert np.all(loads.links[slow] == 0)
+
+
+def test_equilibrium_conserves_trips_and_splits_them():
+    network, router = two_routes()
+    assignment = Assignment(router, capacity=500)
+    loads = assignment.equilibrium(demand(network, [('A', 'B', 1000)]), iterations=200,
+                                   tolerance=1e-3)
+
+    assert loads.gap < 1e-3
+    assert np.isclose(loads.boardings.sum(), 1000)
+    assert np.isclose(loads.alightings[network.stop_index['B']], 1000)
+
+    # Both routes are used and take about as long under their loads
+    fast, slow = link_index(network, 'Fast'), link_index(network, 'Slow')
+    on_fast, on_slow = loads.links[fast[0], 0], loads.links[slow[0], 0]
+    assert np.isclose(on_fast + on_slow, 1000)
+    assert 500 < on_fast < 1000
+    times = [2 * time * (1 + 0.15 * (load / 500) ** 4)
+             for time, load in [(200.0, on_fast), (250.0, on_slow)]]
+    assert abs(times[0] - times[1]) / times[0] < 0.02
+
+
+def test_pooled_assignment_matches_serial():
+    network, router = two_routes()
+    trips = demand(network, [('A', 'B', 1000), ('C', 'D', 40), ('D', 'B', 7)])
+    assignment = Assignment(router, batch_size=1)
+    serial = assignment.all_or_nothing(trips)
+    pooled = assignment.all_or_nothing(trips, workers=2)
+    assert np.allclose(serial.links, pooled.links)
+    assert np.allclose(serial.boardings, pooled.boardings)
@@ -0,0 +1,100 @@
+import os
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+
+from londinium.geodesy.projections import NationalGrid, WGS84NationalGrid
+from londinium.plotting.cache import ProjectedGeometryCache
+from londinium.plotting.distortions import PolarDistortion
+from londinium.plotting.plotter import Canvas
+from londinium.util.cache import ParseCache
+
+
+class AreasReader(object):
+    PARSER_VERSION = 1
+
+
+class LinesReader(object):
+    PARSER_VERSION = 1
+
+
+def entries(cache):
+    return sorted(f for f in os.listdir(cache.directory) if f.endswith(ParseCache.SUFFIX))
+
+
+def test_parsers_of_one_file_keep_their_entries(tmp_path):
+    source = tmp_path / 'source.xml'
+    source.write_text('a')
+    cache = ParseCache(str(tmp_path / 'cache'))
+    areas, lines = AreasReader(), LinesReader()
+    calls = []
+
+    for _ in range(2):
+        assert cache.fetch(str(source), areas, lambda: calls.append('areas') or 'areas') == 'areas'
+        assert cache.fetch(str(source), lines, lambda: calls.append('lines') or 'lines') == 'lines'
+    assert calls == ['areas', 'lines']
+    assert len(entries(cache)) == 2
+
+
+def test_store_replaces_only_stale_entries_of_its_parser(tmp_path):
+    source = tmp_path / 'source.xml'
+    source.write_text('a')
+    cache = ParseCache(str(tmp_path / 'cache'))
+    areas, lines = AreasReader(), LinesReader()
+    cache.fetch(str(source), areas, lambda: 1)
+    cache.fetch(str(source), lines, lambda: 1)
+    kept = cache.filename(cache.key(str(source), lines))
+
+    source.write_text('changed')
+    os.utime(str(source), ns=(0, 0))
+    assert cache.fetch(str(source), areas, lambda: 2) == 2
+    assert len(entries(cache)) == 2
+    assert os.path.exists(kept)
+
+    assert cache.invalidate(str(source)) == 2
+    assert entries(cache) == []
+
+
+LINES = [np.array([[-0.1, 51.5], [0.1, 51.6]]), np.array([[-0.1, 51.4], [0.0, 51.5], [0.1, 51.5]])]
+
+
+def test_geometry_cache_projects_each_feature_once():
+    cache = ProjectedGeometryCache()
+    first = cache.project(['a', 'b'], LINES, NationalGrid())
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert all(np.array_equal(g, NationalGrid().ll_to_en(x)) for g, x in zip(first, LINES))
+
+    # Equal projections share entries; only 'c' is projected, so the
+    # geometries of the others are never read
+    again = cache.project(['b', 'c', 'a'], {1: LINES[0]}, NationalGrid())
+    assert (cache.hits, cache.misses) == (2, 3)
+    assert again[0] is first[1] and again[2] is first[0]
+
+    cache.project(['a'], LINES, WGS84NationalGrid())
+    assert len(cache) == 4 and cache.n_points == 9
+    assert not first[0].flags.writeable
+
+
+def test_geometry_cache_evicts_least_recently_used():
+    cache = ProjectedGeometryCache(max_points=5)
+    cache.project(['a', 'b'], LINES, NationalGrid())
+    assert len(cache) == 2
+    cache.project(['a'], LINES, NationalGrid())
+    cache.project(['c'], LINES[1:], NationalGrid())
+    assert ('a', NationalGrid()) in cache and ('b', NationalGrid()) not in cache
+    assert cache.n_points == 5
+
+    cache.clear()
+    assert len(cache) == 0 and cache.n_points == 0
+
+
+def test_canvas_redraws_through_the_cache():
+    cache = ProjectedGeometryCache()
+    for distortion in (PolarDistortion(), PolarDistortion(centre=[520000, 180000])):
+        cached = Canvas(distortion=distortion, geometry_cache=cache)
+        drawn = cached.plot_lines(LINES, ids=['a', 'b'])[0].get_segments()
+        expected = Canvas(distortion=distortion).plot_lines(LINES)[0].get_segments()
+        assert all(np.allclose(a, b) for a, b in zip(drawn, expected))
+    assert (cache.hits, cache.misses) == (2, 2)
@@ -0,0 +1,19 @@
+import numpy as np
+
+from londinium.network import NetworkArrays
+from londinium.routing.csa import ConnectionScan
+
+from test_transxchange import bus_mode, write
+
+
+def test_network_without_interchanges(tmp_path):
+    network = NetworkArrays.from_modes([bus_mode(write(tmp_path, ''))])
+    scan = ConnectionScan(network)
+    assert np.array_equal(scan.walk_indptr, np.zeros(network.n_stops + 1))
+    assert len(scan.walk_targets) == len(scan.walk_times) == 0
+
+    # VJ1 leaves A at 07:00 and VJ2 at 08:00, each taking two minutes to B
+    assert scan.earliest_arrival('A', 6.5 * 3600, 'B') == 7 * 3600 + 120
+    assert scan.earliest_arrival('A', 7.5 * 3600, 'B') == 8 * 3600 + 120
+    assert scan.latest_departure('B', 7.5 * 3600, 'A') == 7 * 3600
+    assert scan.earliest_arrival('B', 6 * 3600, 'A') == np.inf
@@ -0,0 +1,63 @@
+import numpy as np
+
+from londinium.geodesy.datums import WGS84_TO_OSGB36
+from londinium.geodesy.projections import NationalGrid, WGS84NationalGrid
+
+
+def dms(d, m, s):
+    return d + m/60 + s/3600
+
+
+# Worked example of the Ordnance Survey guide to coordinate systems in
+# Great Britain: one point in ETRS89, which is WGS84 to within a metre, in
+# OSGB36, and on the National Grid
+ETRS89 = [dms(1, 42, 57.79), dms(52, 39, 28.71), 108.05]
+OSGB36 = [dms(1, 43, 4.5177), dms(52, 39, 27.2531)]
+GRID = [651409.903, 313177.270]
+
+METRES_PER_DEGREE = 111e3
+
+
+def uk_points(n=10000, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.stack((rng.uniform(-8, 2, n), rng.uniform(50, 59, n)), axis=1)
+
+
+def test_national_grid_reference_point():
+    grid = NationalGrid()
+    assert np.allclose(grid.ll_to_en([OSGB36]), [GRID], rtol=0, atol=1e-3)
+    assert np.allclose(grid.en_to_ll([GRID]), [OSGB36], rtol=0, atol=1e-3 / METRES_PER_DEGREE)
+
+
+def test_helmert_reference_point():
+    # The Helmert parameters are good to a few metres; here well under one
+    osgb36 = WGS84_TO_OSGB36.forward([ETRS89])
+    error = (osgb36[0,:2] - OSGB36) * METRES_PER_DEGREE
+    assert np.all(np.abs(error) < 1)
+
+
+def test_wgs84_national_grid_reference_point():
+    grid = WGS84NationalGrid()
+    assert np.allclose(grid.ll_to_en([ETRS89[:2]]), [GRID], rtol=0, atol=1)
+
+
+def test_datum_round_trip():
+    # Exact with heights; without, the height each way is taken as zero
+    ll = uk_points()
+    llh = np.c_[ll, np.linspace(-50, 1000, len(ll))]
+    back = WGS84_TO_OSGB36.backward(WGS84_TO_OSGB36.forward(llh))
+    assert np.allclose(back[:,:2], ll, rtol=0, atol=1e-6 / METRES_PER_DEGREE)
+    assert np.allclose(back[:,2], llh[:,2], rtol=0, atol=1e-6)
+
+    back = WGS84_TO_OSGB36.backward(WGS84_TO_OSGB36.forward(ll))
+    assert np.allclose(back, ll, rtol=0, atol=5e-3 / METRES_PER_DEGREE)
+
+
+def test_national_grid_round_trips():
+    # Within millimetres, the series being truncated farthest from the
+    # central meridian
+    ll = uk_points()
+    for grid in (NationalGrid(), WGS84NationalGrid()):
+        en = grid.ll_to_en(ll)
+        assert np.allclose(grid.en_to_ll(en), ll, rtol=0, atol=1e-2 / METRES_PER_DEGREE)
+        assert np.allclose(grid.ll_to_en(grid.en_to_ll(en)), en, rtol=0, atol=1e-2)
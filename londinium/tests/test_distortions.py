@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from londinium.plotting.distortions import GridDistortion, PolarDistortion, TravelTimeDistortion
+from londinium.routing.matrix import TravelTimeMatrix
+
+
+BBOX = [[520000, 540000], [170000, 190000]]
+
+
+def points(n=20000, bbox=BBOX, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.c_[rng.uniform(*bbox[0], n), rng.uniform(*bbox[1], n)]
+
+
+def test_grid_follows_analytic_distortion():
+    polar, p = PolarDistortion(), points()
+    errors = {}
+    for order in (1, 3):
+        grid = GridDistortion.from_distortion(polar, BBOX, shape=(128, 128), order=order)
+        errors[order] = np.linalg.norm(grid(p) - polar(p), axis=1)
+
+    # The fisheye squeezes the box to about 2.2 units across
+    assert np.max(errors[1]) < 2e-4
+    assert np.max(errors[3]) < np.max(errors[1])
+    assert np.median(errors[3]) < np.median(errors[1]) / 100
+
+
+def test_grid_reproduces_affine_maps():
+    def affine(x):
+        return np.reshape(x, (-1, 2)) @ [[1.5, -0.2], [0.3, 0.8]] + [10, 20]
+
+    # Inside the grid and beyond it, where the edge cells are extended
+    p = np.r_[points(1000), [[500000, 160000], [560000, 200000]]]
+    for order in (1, 3):
+        grid = GridDistortion.from_distortion(affine, BBOX, shape=(16, 16), order=order)
+        assert np.allclose(grid(p), affine(p), rtol=0, atol=1e-6)
+        assert np.allclose(grid.inverse(affine(p)), p, rtol=0, atol=1e-3)
+
+
+def test_inverse_finds_preimages():
+    polar, p = PolarDistortion(), points(seed=1)
+    for order in (1, 3):
+        grid = GridDistortion.from_distortion(polar, BBOX, shape=(128, 128), order=order)
+        q = grid.inverse(grid(p))
+        assert np.max(np.linalg.norm(q - p, axis=1)) < 1e-3
+        assert np.max(np.linalg.norm(grid(q) - grid(p), axis=1)) < 1e-8
+
+
+def test_bicubic_is_continuous():
+    grid = GridDistortion.from_distortion(PolarDistortion(), BBOX, shape=(128, 128), order=3)
+    spacing = grid.spacing[0, 1]
+    # Across the grid's edge and the first and last cell boundaries in from it
+    for y in (170000, 170000 + spacing, 190000 - spacing, 190000):
+        x = np.c_[np.full(3, 530123.4), y + np.array([-1e-6, 0, 1e-6])]
+        assert np.max(np.ptp(grid(x), axis=0)) < 1e-9
+
+
+def test_grid_rejects_bad_arguments():
+    with pytest.raises(ValueError):
+        GridDistortion(np.zeros((4, 4, 2)), origin=[0, 0], spacing=1, order=2)
+    # Bicubic needs four nodes a side
+    with pytest.raises(ValueError):
+        GridDistortion(np.zeros((3, 3, 2)), origin=[0, 0], spacing=1, order=3)
+
+
+def test_travel_time_places_stations_by_time():
+    # Stations on grid nodes, so each takes its own time alone, and a stop
+    # that is not a station
+    positions = np.array([[0, 0], [1000, 0], [0, 2000], [9999, 9999]], dtype=np.float64)
+    times = [[0, 100, 400], [100, 0, 300], [400, 300, 0]]
+    matrix = TravelTimeMatrix(times, stops=[0, 1, 2], n_stops=4)
+    warp = TravelTimeDistortion(positions, matrix, [[0, 2000], [0, 2000]], speed=10.0,
+                                shape=(3, 3))
+    stations = positions[:3]
+
+    # Each station moves along its bearing from the origin to speed * time
+    assert np.allclose(warp(stations), [[0, 0], [1000, 0], [0, 4000]])
+    warp.station = 1
+    offset = stations[2] - stations[1]
+    assert np.allclose(warp(stations), [[0, 0], [1000, 0],
+                                        stations[1] + offset / np.linalg.norm(offset) * 3000])
+
+    # Nearby points are pushed out by their walk to the nearest stations
+    assert np.linalg.norm(warp([[1000, 10]]) - stations[1]) > 10
+
+    with pytest.raises(ValueError):
+        warp.station = 3
+
+
+def test_travel_time_defaults_keep_the_map_size():
+    positions = np.array([[0, 0], [1000, 0], [0, 2000]], dtype=np.float64)
+    # Twice as fast in every direction, so the median speed draws true distances
+    times = [[0, 50, 100], [50, 0, 150], [100, 150, 0]]
+    warp = TravelTimeDistortion(positions, TravelTimeMatrix(times, stops=[0, 1, 2]),
+                                [[0, 2000], [0, 2000]], shape=(3, 3))
+    assert warp.station == 0
+    assert np.allclose(warp(positions), positions)
@@ -0,0 +1,57 @@
+import json
+
+import numpy as np
+
+from londinium.parsing.geojson.areas import GeoJSONAreasFile
+from londinium.parsing.geojson.lines import GeoJSONLinesFile
+
+
+def write(tmp_path, features):
+    path = tmp_path / 'lines.json'
+    path.write_text(json.dumps({'type': 'FeatureCollection', 'features': features}))
+    return str(path)
+
+
+def feature(id, coordinates, line='Central'):
+    return {'type': 'Feature',
+            'properties': {'id': id, 'lines': [{'name': line, 'start_sid': 'a', 'end_sid': 'b'}]},
+            'geometry': {'type': 'LineString', 'coordinates': coordinates}}
+
+
+def test_empty_feature_collection(tmp_path):
+    lines = GeoJSONLinesFile(write(tmp_path, []))
+    assert lines.records.coordinates.shape == (0, 2)
+    assert list(lines.records.offsets) == [0]
+    assert list(lines.links) == []
+    assert list(lines.lines) == []
+
+
+def test_records_are_ragged(tmp_path):
+    path = write(tmp_path, [feature('L1', [[-0.1, 51.5], [-0.09, 51.51], [-0.08, 51.5]]),
+                            feature('L2', [[0.0, 51.4], [0.01, 51.41]], 'Victoria')])
+    lines = GeoJSONLinesFile(path)
+    assert list(lines.records.offsets) == [0, 3, 5]
+
+    links = list(lines.links)
+    assert [link.id for link in links] == ['L1', 'L2']
+    assert np.array_equal(links[1].geometry, [[0.0, 51.4], [0.01, 51.41]])
+    assert sorted(line.name for line in lines.lines) == ['Central', 'Victoria']
+
+
+def square(x, y, size):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+
+def test_areas_contain_points(tmp_path):
+    zone = {'type': 'Feature', 'properties': {'name': 'Zone'},
+            'geometry': {'type': 'MultiPolygon', 'coordinates': [
+                [square(0, 0, 4), square(1, 1, 2)], [square(10, 0, 1)]]}}
+    river = {'type': 'Feature', 'properties': {'name': 'River'},
+             'geometry': {'type': 'Polygon', 'coordinates': [square(3, -1, 8)]}}
+    areas = GeoJSONAreasFile(write(tmp_path, [zone, river]))
+
+    points = [[0.5, 0.5], [2, 2], [10.5, 0.5], [3.5, 0.5], [20, 20]]
+    assert areas.contains(points).tolist() == [[True, False], [False, False], [True, True],
+                                                [True, True], [False, False]]
+    assert areas.locate(points).tolist() == [0, -1, 0, 0, -1]
+    assert np.array_equal(areas.bboxes[0], [[0, 11], [0, 4]])
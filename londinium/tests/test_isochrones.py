@@ -0,0 +1,64 @@
+import numpy as np
+from matplotlib.path import Path
+
+from londinium.routing.csa import ConnectionScan
+from londinium.routing.isochrones import Isochrones
+
+from test_raptor import random_network
+
+
+BBOX = [[-0.22, 0.02], [51.44, 51.56]]
+
+
+def brute_force(isochrones, arrivals, origin, departure_time):
+    """ Best stop arrival plus walk within max_walk, or the walk from the
+    origin, for every cell.
+    """
+
+    scanner = isochrones.scanner
+    centres = np.stack(np.meshgrid(isochrones.x, isochrones.y), axis=2).reshape(-1, 2)
+    walks = np.linalg.norm(centres[:, None] - scanner.positions[None], axis=2) / scanner.walk_speed
+    times = np.where(walks <= isochrones.max_walk, arrivals + walks, np.inf).min(axis=1)
+    direct = departure_time + walks[:, origin]
+    return np.minimum(times, direct).reshape(isochrones.shape)
+
+
+def test_rasterise_matches_brute_force():
+    scanner = ConnectionScan(random_network())
+    isochrones = Isochrones(scanner, BBOX, cell_size=250.0, max_walk=600.0)
+    rng = np.random.default_rng(4)
+    arrivals = rng.uniform(7 * 3600, 8 * 3600, (3, scanner.network.n_stops))
+    arrivals[rng.random(arrivals.shape) < 0.3] = np.inf
+    origins, departures = [0, 5, 9], [7 * 3600, 7 * 3600 + 60, 7 * 3600 + 120]
+
+    expected = [brute_force(isochrones, *args) for args in zip(arrivals, origins, departures)]
+    assert np.allclose(isochrones.rasterise(arrivals, origins, departures), expected)
+
+    # Chunks of a few pairs split cells across the same runs
+    isochrones.chunk_size = 7
+    assert np.allclose(isochrones.rasterise(arrivals, origins, departures), expected)
+
+
+def test_isochrone_band_edges():
+    scanner = ConnectionScan(random_network())
+    isochrones = Isochrones(scanner, BBOX, cell_size=250.0, max_walk=600.0)
+    origin, departure = 3, 7 * 3600
+    isochrone = isochrones.isochrone(origin, departure, [1800, 900])
+    assert list(isochrone.budgets) == [900, 1800]
+
+    arrivals = scanner.one_to_all([origin], [departure])[0]
+    expected = brute_force(isochrones, arrivals, origin, departure) - departure
+    within = expected <= 1800
+    assert np.allclose(isochrone.times[within], expected[within], atol=1e-2)
+    assert np.all(isochrone.times[~within] > 1800)
+
+    centres = np.stack(np.meshgrid(isochrones.x, isochrones.y), axis=2).reshape(-1, 2)
+    times = isochrone.times.ravel()
+    for budget, polygons in zip(isochrone.budgets, isochrones.polygons(isochrone)):
+        inside = np.zeros(len(centres), dtype=bool)
+        for polygon in polygons:
+            for ring in polygon:
+                inside ^= Path(isochrones.projection.ll_to_en(ring)).contains_points(centres)
+        assert inside[times < budget].all()
+        assert not inside[times > budget].any()
+        assert 0 < (times < budget).sum() < len(times)
@@ -0,0 +1,42 @@
+import numpy as np
+
+from londinium.plotting.distortions import GridDistortion, SplineDistortion, _ThinPlateSpline
+from londinium.plotting.layout import StressLayout
+
+
+def clustered_stations(seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.uniform(0, 20000, (20, 2)) + [500000, 180000]
+    return np.repeat(centres, 5, axis=0) + rng.normal(0, 50, (100, 2))
+
+
+def test_layout_distortion_meets_stations():
+    positions = clustered_stations()
+    rng = np.random.default_rng(1)
+    distances = np.linalg.norm(positions[:, None] - positions[None], axis=2)
+    layout = StressLayout(distances * rng.uniform(0.7, 1.3, distances.shape), positions)
+    layout.run(max_iter=50)
+
+    distortion = layout.distortion()
+    assert np.allclose(distortion(positions), layout.aligned(), rtol=0, atol=1e-3)
+
+
+def test_spline_matches_kernel():
+    sources = clustered_stations()
+    targets = sources + np.random.default_rng(2).normal(0, 200, sources.shape)
+    distortion = SplineDistortion(sources, targets)
+    spline = distortion._spline
+
+    points = sources.min(axis=0) + np.random.default_rng(3).random((1000, 2)) * 20000
+    n = len(sources)
+    expected = (points + _ThinPlateSpline._kernel(points, sources) @ spline.coeffs[:n]
+                + spline.coeffs[n] + points @ spline.coeffs[n+1:])
+    assert np.allclose(distortion(points), expected, rtol=0, atol=1e-3)
+
+
+def test_grid_keeps_a_translation():
+    sources = clustered_stations()
+    targets = sources + 100
+    bbox = [[495000, 525000], [175000, 205000]]
+    grid = GridDistortion.from_control_points(sources, targets, bbox)
+    assert np.allclose(grid(sources), targets, rtol=0, atol=1e-3)
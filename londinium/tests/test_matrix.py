@@ -0,0 +1,15 @@
+import json
+
+from londinium.geodesy.projections import NationalGrid, WGS84NationalGrid
+from londinium.routing.matrix import _parameter
+
+
+def test_parameter_is_stable():
+    for make in (NationalGrid, WGS84NationalGrid):
+        a, b = json.dumps(_parameter(make())), json.dumps(_parameter(make()))
+        assert a == b
+        assert '0x' not in a
+
+
+def test_parameter_distinguishes_projections():
+    assert _parameter(NationalGrid()) != _parameter(WGS84NationalGrid())
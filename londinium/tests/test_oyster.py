@@ -0,0 +1,97 @@
+import numpy as np
+from collections import Counter
+
+from londinium.network import Line, Link, Mode, NetworkArrays, Stop
+from londinium.parsing.csv.oyster import DAYS, SLOT, OysterJourneysFile, station_key
+
+
+STATIONS = ['Hammersmith D', 'Kings Cross St Pancras', 'Elephant and Castle', 'Bank',
+            'Bus', 'Unstarted', 'Nowhere']
+
+
+def write(tmp_path, n=3000, seed=0):
+    """ A journey export with a byte order mark, padded exit names and some
+    rows lacking a day or an entry time, and the expected counts by day,
+    slot, entry and exit.
+    """
+
+    rng = np.random.default_rng(seed)
+    lines = ['\ufeffdowno,daytype,SubSystem,StartStn,EndStation,EntTime,EntTimeHHMM']
+    expected = Counter()
+    for k in range(n):
+        day = DAYS[rng.integers(7)] if rng.random() > 0.02 else 'Xyz'
+        start, end = (STATIONS[i] for i in rng.integers(len(STATIONS), size=2))
+        time = str(rng.integers(1440)) if rng.random() > 0.02 else ''
+        lines.append('{},{},LUL,{},{} ,{},00:00'.format(k, day, start, end, time))
+        if day in DAYS and time:
+            expected[(DAYS.index(day), int(time) // SLOT, start, end)] += 1
+
+    path = tmp_path / 'journeys.csv'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(path), expected
+
+
+def counts(records):
+    return Counter({(int(day), int(slot), str(records.stations[o]), str(records.stations[d])):
+                    int(c) for day, slot, o, d, c in zip(records.days, records.slots,
+                                                         records.origins,
+                                                         records.destinations,
+                                                         records.counts)})
+
+
+def test_chunked_and_pooled_reads_match_serial(tmp_path):
+    path, expected = write(tmp_path)
+    serial = OysterJourneysFile(path).records
+    assert counts(serial) == expected
+    assert serial.rows == 3000
+    assert serial.rows - serial.dropped == sum(expected.values())
+
+    for reader in (OysterJourneysFile(path, chunk_bytes=1000),
+                   OysterJourneysFile(path, chunk_bytes=1),
+                   OysterJourneysFile(path, chunk_bytes=4000, workers=2)):
+        records = reader.records
+        for field in serial._fields:
+            assert np.array_equal(getattr(records, field), getattr(serial, field)), field
+
+
+def test_station_key():
+    assert station_key("King's Cross St. Pancras") == 'kings cross st pancras'
+    assert station_key('Elephant & Castle') == station_key('Elephant and Castle')
+    assert station_key('  Hammersmith   (H&C Line) ') == 'hammersmith h and c line'
+
+
+def network():
+    stops = [Stop(id='S{}'.format(k), name=name, location=(-0.1 + k * 0.01, 51.5))
+             for k, name in enumerate(["King's Cross St. Pancras", 'Hammersmith',
+                                       'Elephant & Castle', 'Bank', 'Hammersmith'])]
+    mode = Mode('test')
+    line = Line('Test')
+    for stop in stops:
+        line.add_stop(stop)
+    for a, b in zip(stops[:-1], stops[1:]):
+        line.add_link(Link(a, b, time=60.0))
+    mode.add_line(line)
+    return NetworkArrays.from_modes([mode])
+
+
+def test_station_stops_strip_line_suffixes(tmp_path):
+    path, expected = write(tmp_path)
+    oyster = OysterJourneysFile(path)
+    net = network()
+
+    stops = dict(zip(oyster.stations, oyster.station_stops(net)))
+    # The first of two stops with a name takes it
+    assert stops == {'Hammersmith D': 1, 'Kings Cross St Pancras': 0, 'Elephant and Castle': 2,
+                     'Bank': 3, 'Bus': -1, 'Unstarted': -1, 'Nowhere': -1}
+    assert oyster.unmatched(net)[0][0] == 'Nowhere'
+
+    stops = dict(zip(oyster.stations, oyster.station_stops(net, aliases={'Nowhere': 'S4'})))
+    assert stops['Nowhere'] == 4 and oyster.unmatched(net, aliases={'Nowhere': 'S4'}) == []
+
+    # Afternoon journeys on Mondays from Kings Cross to Bank
+    matrix = oyster.od_matrix(net, band_starts=(0, 720), days=['Mon'])
+    total = sum(c for (day, slot, a, b), c in expected.items()
+                if (day, a, b) == (0, 'Kings Cross St Pancras', 'Bank') and slot * SLOT >= 720)
+    band = matrix.band(1)
+    entry = (band.origins == 0) & (band.destinations == 3)
+    assert band.counts[entry].sum() == total > 0
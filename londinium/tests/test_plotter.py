@@ -0,0 +1,83 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+
+from londinium.plotting.plotter import Canvas
+from londinium.util.ragged import split
+
+
+def test_split_empty():
+    assert split(np.zeros((0, 2)), np.zeros(1, dtype=np.int64)) == []
+
+
+def test_plot_lines_nothing_in_view():
+    canvas = Canvas()
+    assert canvas.plot_lines([[[5, 60], [5.1, 60.1]]], check_bbox=True) == []
+    assert canvas.plot_lines([]) == []
+
+
+def test_plot_lines_in_view():
+    canvas = Canvas()
+    collections = canvas.plot_lines([[[-0.1, 51.5], [0.1, 51.6]]], check_bbox=True)
+    assert len(collections) == 1
+
+
+def test_plot_flows_no_load():
+    canvas = Canvas()
+    line = [[-0.1, 51.5], [0.1, 51.6]]
+    assert canvas.plot_flows([line], [0.0]) == []
+    assert canvas.plot_flows([], []) == []
+
+
+def test_plot_flows_widths():
+    canvas = Canvas()
+    lines = [[[-0.1, 51.5], [0.1, 51.6]], [[-0.1, 51.4], [0.1, 51.5]], [[0, 51.4], [0, 51.6]]]
+    collections = canvas.plot_flows(lines, [10.0, 0.0, 5.0], max_width=4.0)
+    assert len(collections) == 1
+    assert np.allclose(collections[0].get_linewidths(), [4.0, 2.0])
+
+
+def test_plot_lines_level_of_detail():
+    # A wiggle of a few centimetres is dropped, the corner of a kilometre is not
+    line = [[-0.1, 51.5], [-0.05, 51.5000001], [0.0, 51.5], [0.0, 51.51]]
+    canvas = Canvas(figsize=(2, 2), dpi=50)
+    full = canvas.plot_lines([line])[0].get_segments()[0]
+    simplified = canvas.plot_lines([line], lod=True)[0].get_segments()[0]
+    assert len(full) == 4
+    assert np.allclose(simplified, full[[0, 2, 3]])
+
+    canvas = Canvas(figsize=(2, 2), dpi=50, lod_pixels=None)
+    assert len(canvas.plot_lines([line], lod=True)[0].get_segments()[0]) == 4
+
+
+def test_plot_lines_batches_by_zorder():
+    canvas = Canvas()
+    lines = [[[-0.1, 51.5], [0.1, 51.6]], [[-0.1, 51.4], [0.0, 51.5], [0.1, 51.5]],
+             [[0, 51.4], [0, 51.6]]]
+    collections = canvas.plot_lines(lines, colors=['#ff0000', '#00ff00', '#0000ff'],
+                                    linewidths=[1, 2, 3], zorders=[5, 1, 5])
+
+    assert [c.get_zorder() for c in collections] == [1, 5]
+    low, high = collections
+    assert np.allclose(low.get_segments()[0], canvas.transform(np.array(lines[1])))
+    assert np.allclose(high.get_segments()[1], canvas.transform(np.array(lines[2])))
+    assert np.allclose(high.get_colors()[:, :3], [[1, 0, 0], [0, 0, 1]])
+    assert np.allclose(high.get_linewidths(), [1, 3])
+
+
+def test_plot_lines_ragged_input_matches_lists():
+    canvas = Canvas()
+    lines = [[[-0.1, 51.5], [0.1, 51.6]], [[-0.1, 51.4], [0.0, 51.5], [0.1, 51.5]]]
+    listed = canvas.plot_lines(lines)[0].get_segments()
+    ragged = canvas.plot_lines(np.concatenate(lines), offsets=[0, 2, 5])[0].get_segments()
+    assert all(np.allclose(a, b) for a, b in zip(listed, ragged))
+
+
+def test_plot_points_batches_by_zorder():
+    canvas = Canvas()
+    points = [[-0.1, 51.5], [0.0, 51.5], [5.0, 60.0]]
+    collections = canvas.plot_points(points, sizes=[2, 4, 6], zorders=[0, 1, 0], check_bbox=True)
+    assert [c.get_zorder() for c in collections] == [0, 1]
+    assert np.allclose(collections[0].get_offsets(), canvas.transform(np.array(points[:1])))
+    assert np.allclose(collections[1].get_sizes(), [16])
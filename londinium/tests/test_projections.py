@@ -0,0 +1,84 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+
+from londinium.geodesy.projections import (FastNationalGrid, NationalGrid, UTM29,
+                                          WGS84NationalGrid)
+from londinium.plotting.plotter import Canvas
+from londinium.util.ragged import flatten
+
+
+BBOX = [[-0.54, 0.28], [51.3, 51.7]]
+
+
+def points(n=10000, bbox=BBOX, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.c_[rng.uniform(*bbox[0], n), rng.uniform(*bbox[1], n)]
+
+
+def test_fit_within_documented_error():
+    fast, exact = FastNationalGrid(), NationalGrid()
+    assert fast.max_error < 1e-5
+    assert fast.max_inverse_error < 1e-4
+
+    ll = points()
+    en = exact.ll_to_en(ll)
+    assert np.max(np.linalg.norm(fast.ll_to_en(ll) - en, axis=1)) <= fast.max_error * 1.5
+    assert np.max(np.linalg.norm(exact.ll_to_en(fast.en_to_ll(en)) - en, axis=1)) \
+        <= fast.max_inverse_error * 1.5
+
+
+def test_lower_degree_is_looser():
+    fast = FastNationalGrid(degree=3)
+    assert 1e-5 < fast.max_error < 1e-2
+    ll = points(seed=1)
+    error = np.linalg.norm(fast.ll_to_en(ll) - NationalGrid().ll_to_en(ll), axis=1)
+    assert np.max(error) <= fast.max_error * 1.5
+
+
+def test_outside_region_is_exact():
+    fast, exact = FastNationalGrid(), NationalGrid()
+    # Half inside the region and half around Manchester, in blocks of both
+    ll = np.concatenate((points(20000), points(20000, [[-2.4, -2.1], [53.3, 53.6]])))
+    ll = ll[np.random.default_rng(2).permutation(len(ll))]
+    outside = ll[:, 1] > 52
+
+    en = fast.ll_to_en(ll)
+    assert np.array_equal(en[outside], exact.ll_to_en(ll[outside]))
+    assert np.allclose(en, exact.ll_to_en(ll), rtol=0, atol=1e-5)
+    assert np.allclose(fast.en_to_ll(en), exact.en_to_ll(en), rtol=0, atol=1e-8)
+
+
+def test_drop_in_projection():
+    fast, exact = FastNationalGrid(), NationalGrid()
+    assert np.allclose(fast.ll_to_en([-0.1, 51.5]), exact.ll_to_en([-0.1, 51.5]), atol=1e-5)
+    assert fast.ll_to_en(np.zeros((0, 2))).shape == (0, 2)
+    assert fast == FastNationalGrid() and fast != exact
+    assert fast != FastNationalGrid(bbox=[[-0.5, 0.2], [51.3, 51.7]])
+
+    geometries = [points(5), points(3, seed=1)]
+    projected = fast.ll_to_en_geometries(geometries)
+    assert all(np.allclose(a, exact.ll_to_en(g), atol=1e-5) for a, g in zip(projected, geometries))
+
+    line = [[-0.1, 51.5], [0.1, 51.6]]
+    assert np.allclose(Canvas(projection=fast).transform(line),
+                       Canvas(projection=exact).transform(line), atol=1e-5)
+    assert len(Canvas(projection=fast).plot_lines([line], check_bbox=True)) == 1
+
+
+def test_ragged_matches_each_geometry():
+    geometries = [points(5), np.zeros((0, 2)), points(1, seed=1), points(40, seed=2)]
+    coordinates, offsets = flatten(geometries)
+    for projection in (NationalGrid(), WGS84NationalGrid(), UTM29()):
+        en, en_offsets = projection.ll_to_en_ragged(coordinates, offsets)
+        assert np.array_equal(en_offsets, offsets)
+        for k, geometry in enumerate(geometries):
+            assert np.allclose(en[offsets[k]:offsets[k+1]],
+                               projection.ll_to_en(geometry).reshape(-1, 2), rtol=0, atol=1e-6)
+
+        ll, _ = projection.en_to_ll_ragged(en, offsets)
+        assert np.array_equal(ll, projection.en_to_ll(en))
+        assert np.allclose(ll, coordinates, rtol=0, atol=1e-6)
+        projected = projection.ll_to_en_geometries(geometries)
+        assert [len(g) for g in projected] == [5, 0, 1, 40]
@@ -0,0 +1,99 @@
+import numpy as np
+
+from londinium.network import Interchange, Line, Link, Mode, NetworkArrays, Pattern, Stop
+from londinium.routing.csa import ConnectionScan
+from londinium.routing.raptor import Raptor
+
+from test_transxchange import bus_mode, write
+
+
+def random_network(seed=0, n_stops=30, n_lines=8, n_interchanges=5):
+    """ Lines over random stops around London, each run by a pattern and its
+    reverse every few minutes, with some interchanges.
+    """
+
+    rng = np.random.default_rng(seed)
+    lon_lat = np.c_[rng.uniform(-0.2, 0.0, n_stops), rng.uniform(51.45, 51.55, n_stops)]
+    stops = [Stop(id='S{}'.format(k), name='Stop {}'.format(k), location=tuple(x))
+             for k, x in enumerate(lon_lat)]
+
+    mode = Mode('test')
+    for l in range(n_lines):
+        line = Line('L{}'.format(l))
+        members = [stops[k] for k in rng.choice(n_stops, rng.integers(3, 7), replace=False)]
+        for stop in members:
+            line.add_stop(stop)
+        for a, b in zip(members[:-1], members[1:]):
+            line.add_link(Link(a, b))
+
+        run_times = rng.integers(60, 400, len(members) - 1)
+        headway = int(rng.integers(300, 1200))
+        for direction, sequence in enumerate((members, members[::-1])):
+            line.add_pattern(Pattern(
+                id='L{}:{}'.format(l, direction),
+                stops=sequence,
+                run_times=run_times if direction == 0 else run_times[::-1],
+                wait_times=np.full(len(sequence), 30),
+                departures=np.arange(6 * 3600, 10 * 3600, headway) + int(rng.integers(headway))
+            ))
+        mode.add_line(line)
+
+    interchanges = [Interchange([stops[k] for k in rng.choice(n_stops, 2, replace=False)])
+                    for _ in range(n_interchanges)]
+    return NetworkArrays.from_modes([mode], interchanges=interchanges)
+
+
+def test_network_without_interchanges(tmp_path):
+    network = NetworkArrays.from_modes([bus_mode(write(tmp_path, ''))])
+    raptor = Raptor(network)
+    arrival = raptor.arrivals('A', 6.5 * 3600)[-1]
+    assert arrival[network.stop_index['B']] == 7 * 3600 + 120
+
+
+def test_arrivals_match_connection_scan():
+    network = random_network()
+    raptor = Raptor(network)
+    scan = ConnectionScan(network)
+
+    rng = np.random.default_rng(1)
+    for origin in rng.choice(network.n_stops, 10, replace=False):
+        time = float(rng.integers(6 * 3600, 8 * 3600))
+        arrivals = raptor.arrivals(origin, time)
+        assert np.array_equal(arrivals[-1], scan.earliest_arrival(origin, time))
+        # More trips never arrive later
+        assert np.all(arrivals[1:] <= arrivals[:-1])
+
+
+def profiles(network, start, end):
+    raptor = Raptor(network)
+    rng = np.random.default_rng(2)
+    for origin, destination in rng.choice(network.n_stops, (10, 2)):
+        if origin != destination:
+            yield origin, destination, raptor.profile(origin, destination, start, end)
+
+
+def test_profile_is_pareto_optimal():
+    network = random_network()
+    start, end = 7 * 3600, 8 * 3600
+    for origin, destination, profile in profiles(network, start, end):
+        for option in profile:
+            assert start <= option.departure <= end
+            assert len(option.legs) >= option.transfers + 1
+            # No other option leaves later, arrives earlier and changes less
+            assert not any(o is not option and o.departure >= option.departure
+                           and o.arrival <= option.arrival and o.transfers <= option.transfers
+                           for o in profile)
+
+
+def test_profile_matches_connection_scan():
+    # Over a window holding every trip, waiting for the quickest option
+    # leaving from any time is the earliest arrival from that time
+    network = random_network()
+    scan = ConnectionScan(network)
+    checked = 0
+    for origin, destination, profile in profiles(network, 0, 24 * 3600):
+        for departure in {o.departure for o in profile}:
+            best = min(o.arrival for o in profile if o.departure >= departure)
+            assert best == scan.earliest_arrival(origin, departure, destination)
+            checked += 1
+    assert checked
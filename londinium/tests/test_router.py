@@ -0,0 +1,91 @@
+import numpy as np
+from heapq import heappush, heappop
+
+from londinium.network import Interchange, Line, Link, Mode, NetworkArrays, Stop
+from londinium.routing.router import Router
+
+from test_raptor import random_network
+
+
+def reference_dijkstra(router, origin):
+    """ Textbook Dijkstra over the router's CSR arrays, from all the
+    sources of an origin node.
+    """
+
+    dist = np.full(router.n_nodes, np.inf)
+    heap = []
+    for s in router._sources(origin):
+        dist[s] = 0.0
+        heap.append((0.0, s))
+    while heap:
+        d, u = heappop(heap)
+        if d > dist[u]:
+            continue
+        for e in range(router.indptr[u], router.indptr[u+1]):
+            v, nd = router.indices[e], d + router.weights[e]
+            if nd < dist[v]:
+                dist[v] = nd
+                heappush(heap, (nd, v))
+    return dist
+
+
+def test_fixed_network_path_costs():
+    """ A line A-B-C, a line C-D and a line E-F, with a walk from B to E. """
+
+    stops = {k: Stop(id=k, name=k, location=x) for k, x in
+             [('A', (0, 0)), ('B', (1000, 0)), ('C', (2000, 0)), ('D', (2000, 1000)),
+              ('E', (1000, 130)), ('F', (1000, 1130))]}
+    mode = Mode('test')
+    for name, members, times in [('One', 'ABC', [100.0, 150.0]), ('Two', 'CD', [90.0]),
+                                 ('Three', 'EF', [60.0])]:
+        line = Line(name)
+        for k in members:
+            line.add_stop(stops[k])
+        for (a, b), time in zip(zip(members[:-1], members[1:]), times):
+            line.add_link(Link(stops[a], stops[b], time=time))
+        mode.add_line(line)
+    network = NetworkArrays.from_modes([mode], interchanges=[Interchange([stops['B'], stops['E']])])
+    router = Router(network, projection=None, transfer_penalty=180.0, walk_speed=1.3,
+                    interchange_penalty=60.0)
+
+    for algorithm in ('astar', 'dijkstra'):
+        path = router.shortest_path('A', 'C', algorithm)
+        assert path.time == 250.0
+        assert [str(network['stop_ids'][s]) for s in path.stops] == ['A', 'B', 'C']
+
+        # Changing lines at C costs a boarding
+        assert router.shortest_path('A', 'D', algorithm).time == 100.0 + 150.0 + 180.0 + 90.0
+        # Walking 130 m costs 100 s plus the interchange penalty
+        assert router.shortest_path('A', 'F', algorithm).time == 100.0 + 160.0 + 180.0 + 60.0
+
+    times = router.one_to_all('A')
+    assert times[network.stop_index['C']] == 250.0
+    assert times[network.stop_index['E']] == 260.0
+
+    only_one = Router(network, lines=['One'], projection=None)
+    assert np.isinf(only_one.one_to_all('A')[network.stop_index['D']])
+
+
+def test_search_matches_reference_dijkstra():
+    network = random_network()
+    router = Router(network)
+    for origin in range(router.n_stations):
+        dist, _ = router._search(router._sources(origin))
+        assert np.allclose(dist, reference_dijkstra(router, origin))
+
+
+def test_astar_heuristic_is_admissible():
+    network = random_network()
+    router = Router(network)
+    rng = np.random.default_rng(3)
+    for target in rng.choice(router.n_stations, 10, replace=False):
+        heuristic = np.array(router._heuristic(target))
+        to_target = np.array([router._search(router._sources(n), target)[0][target]
+                              for n in range(router.n_stations)])
+        assert np.all(heuristic[:router.n_stations] <= to_target + 1e-9)
+
+        for origin in rng.choice(router.n_stations, 5, replace=False):
+            stops = router.node_stop[origin], router.node_stop[target]
+            astar = router.shortest_path(*stops)
+            dijkstra = router.shortest_path(*stops, algorithm='dijkstra')
+            assert astar.time == dijkstra.time or np.isclose(astar.time, dijkstra.time)
@@ -0,0 +1,92 @@
+import numpy as np
+from matplotlib.path import Path
+
+from londinium.geodesy.spatial import PolygonIndex, SpatialIndex
+
+
+def clustered_points(rng):
+    """ A sparse spread with a dense cluster and a pile of coincident points. """
+    spread = rng.uniform(0, 100000, (300, 2))
+    cluster = rng.normal(50000, 300, (700, 2))
+    pile = np.full((40, 2), 20000.0)
+    return np.concatenate((spread, cluster, pile))
+
+
+def brute_distances(index, queries):
+    return np.linalg.norm(queries[:, None] - index.points[None], axis=2)
+
+
+def test_nearest_matches_brute_force():
+    rng = np.random.default_rng(0)
+    index = SpatialIndex(clustered_points(rng), projection=None)
+    queries = np.concatenate((rng.uniform(-20000, 120000, (2000, 2)),
+                              rng.normal(50000, 500, (2000, 2)),
+                              np.full((5, 2), 20000.0)))
+    d = brute_distances(index, queries)
+    for k in (1, 3, 8):
+        distances, indices = index.nearest(queries, k)
+        assert np.allclose(distances, np.sort(d, axis=1)[:, :k])
+        assert np.allclose(np.take_along_axis(d, indices, axis=1), distances)
+
+
+def test_nearest_more_than_indexed():
+    index = SpatialIndex([[0, 0], [3, 4]], projection=None)
+    distances, indices = index.nearest([[0, 0]], k=3)
+    assert np.allclose(distances, [[0, 5, np.inf]])
+    assert indices.tolist() == [[0, 1, -1]]
+
+
+def test_within_matches_brute_force():
+    rng = np.random.default_rng(1)
+    index = SpatialIndex(clustered_points(rng), projection=None)
+    queries = rng.uniform(0, 100000, (500, 2))
+    indices, offsets = index.within(queries, 2500.0)
+    d = brute_distances(index, queries)
+    for q in range(len(queries)):
+        found = indices[offsets[q]:offsets[q+1]]
+        assert sorted(found) == sorted(np.flatnonzero(d[q] <= 2500.0))
+        assert np.all(np.diff(d[q, found]) >= 0)
+
+
+def test_in_bbox_matches_brute_force():
+    rng = np.random.default_rng(2)
+    points = clustered_points(rng)
+    index = SpatialIndex(points, projection=None)
+    corners = rng.uniform(0, 100000, (200, 2, 2))
+    bboxes = np.stack((corners.min(axis=1), corners.max(axis=1)), axis=1)
+    indices, offsets = index.in_bbox(bboxes)
+    for b, (lo, hi) in enumerate(bboxes):
+        expected = np.flatnonzero(np.all((points >= lo) & (points <= hi), axis=1))
+        assert indices[offsets[b]:offsets[b+1]].tolist() == expected.tolist()
+
+
+def star(rng, centre, radius, n):
+    """ A ring of ``n`` vertices at random radii, so deeply concave. """
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    radii = radius * rng.uniform(0.2, 1.0, n)
+    return centre + np.c_[radii * np.cos(angles), radii * np.sin(angles)]
+
+
+def test_polygon_contains_matches_matplotlib():
+    rng = np.random.default_rng(3)
+    # Area 0 has two parts, one with a hole, area 1 overlaps them both, and
+    # area 2 is a closed ring with its first vertex repeated
+    rings = [star(rng, [0, 0], 10, 60), star(rng, [0, 0], 1.5, 20), star(rng, [15, 5], 4, 30),
+             star(rng, [8, 2], 9, 200)]
+    closed = star(rng, [-5, -5], 3, 12)
+    rings.append(np.r_[closed, closed[:1]])
+    ring_areas = [0, 0, 0, 1, 2]
+    coordinates = np.concatenate(rings)
+    offsets = np.r_[0, np.cumsum([len(r) for r in rings])]
+
+    points = rng.uniform(-12, 20, (20000, 2))
+    expected = np.zeros((len(points), 3), dtype=bool)
+    for ring, area in zip(rings, ring_areas):
+        expected[:, area] ^= Path(ring).contains_points(points)
+
+    for cells in (None, 1, 7, 100):
+        index = PolygonIndex(coordinates, offsets, ring_areas, cells=cells)
+        assert np.array_equal(index.contains(points), expected)
+
+    located = index.locate(points)
+    assert np.array_equal(located, np.where(expected.any(axis=1), np.argmax(expected, axis=1), -1))
@@ -0,0 +1,170 @@
+import tracemalloc
+
+import numpy as np
+
+from londinium.network import Mode, NetworkArrays
+from londinium.parsing.transxchange.files import TransXChangeFile, TransXChangeLinesFromFiles
+from londinium.routing.router import Router
+
+
+STOP = """
+    <StopPoint>
+      <AtcoCode>{0}</AtcoCode>
+      <Descriptor><CommonName>Stop {0}</CommonName></Descriptor>
+      <Place><Location><Easting>{1}</Easting><Northing>{2}</Northing></Location></Place>
+    </StopPoint>"""
+
+JOURNEY = """
+    <VehicleJourney>
+      <VehicleJourneyCode>{0}</VehicleJourneyCode>
+      {1}
+      <JourneyPatternRef>JP1</JourneyPatternRef>
+      <DepartureTime>{2}</DepartureTime>
+    </VehicleJourney>"""
+
+SUNDAY = """<OperatingProfile><RegularDayType><DaysOfWeek><Sunday/></DaysOfWeek>
+      </RegularDayType></OperatingProfile>"""
+
+DOCUMENT = """<?xml version="1.0" encoding="UTF-8"?>
+<TransXChange xmlns="http://www.transxchange.org.uk/">
+  <StopPoints>{stops}
+  </StopPoints>
+  <RouteSections>
+    <RouteSection id="RS1">
+      <RouteLink id="RL1">
+        <From><StopPointRef>A</StopPointRef></From>
+        <To><StopPointRef>B</StopPointRef></To>
+      </RouteLink>
+    </RouteSection>
+  </RouteSections>
+  <Routes>
+    <Route id="R1"><RouteSectionRef>RS1</RouteSectionRef></Route>
+  </Routes>
+  <JourneyPatternSections>
+    <JourneyPatternSection id="JPS1">
+      <JourneyPatternTimingLink id="JPTL1">
+        <From><StopPointRef>A</StopPointRef></From>
+        <To><StopPointRef>B</StopPointRef></To>
+        <RouteLinkRef>RL1</RouteLinkRef>
+        <RunTime>PT2M</RunTime>
+      </JourneyPatternTimingLink>
+    </JourneyPatternSection>
+  </JourneyPatternSections>
+  <Services>
+    <Service>
+      <ServiceCode>S1</ServiceCode>
+      <PrivateCode>S1</PrivateCode>
+      <Lines><Line id="S1"><LineName>Test</LineName></Line></Lines>
+      {profile}
+      <StandardService>
+        <JourneyPattern id="JP1">
+          <RouteRef>R1</RouteRef>
+          <JourneyPatternSectionRefs>JPS1</JourneyPatternSectionRefs>
+        </JourneyPattern>
+      </StandardService>
+    </Service>
+  </Services>
+  <VehicleJourneys>{journeys}
+  </VehicleJourneys>
+</TransXChange>
+"""
+
+WEEKDAYS = """<OperatingProfile><RegularDayType><DaysOfWeek><MondayToFriday/></DaysOfWeek>
+      </RegularDayType></OperatingProfile>"""
+
+
+# Eastings and northings of two stops about a kilometre apart in London
+LOCATIONS = {'A': (529300, 181200), 'B': (530100, 181800)}
+
+
+def write(tmp_path, profile):
+    path = tmp_path / 'service.xml'
+    path.write_text(DOCUMENT.format(
+        stops=''.join(STOP.format(x, *LOCATIONS[x]) for x in 'AB'),
+        profile=profile,
+        journeys=JOURNEY.format('VJ1', '', '07:00:00') + JOURNEY.format('VJ2', SUNDAY, '08:00:00')))
+    return str(path)
+
+
+def trips(path, day):
+    lines = TransXChangeLinesFromFiles([path], day=day).network
+    return [trip for pattern in lines[0].patterns for trip in pattern.trip_ids]
+
+
+def test_journeys_follow_service_profile(tmp_path):
+    path = write(tmp_path, WEEKDAYS)
+    assert trips(path, 'Monday') == ['VJ1']
+    assert trips(path, 'Sunday') == ['VJ2']
+    assert trips(path, None) == ['VJ1', 'VJ2']
+
+
+def test_journeys_without_profiles_run_every_day(tmp_path):
+    path = write(tmp_path, '')
+    assert trips(path, 'Monday') == ['VJ1']
+    assert trips(path, 'Sunday') == ['VJ1', 'VJ2']
+
+
+def bus_mode(path):
+    mode = Mode('bus', way='road')
+    for line in TransXChangeLinesFromFiles([path]).network:
+        mode.add_line(line)
+    return mode
+
+
+def test_stops_are_located_by_longitude_and_latitude(tmp_path):
+    mode = bus_mode(write(tmp_path, ''))
+
+    lon_lat = [stop.location for stop in mode.lines['Test'].stops.values()]
+    assert np.allclose(lon_lat, [[-0.14, 51.52], [-0.13, 51.52]], atol=0.01)
+
+    network = NetworkArrays.from_modes([mode])
+    router = Router(network)
+    positions = router.positions[[network.stop_index[x] for x in 'AB']]
+    assert np.allclose(positions, [LOCATIONS[x] for x in 'AB'], rtol=0, atol=1e-3)
+
+
+def test_missing_link_distance_is_the_straight_line(tmp_path):
+    path = write(tmp_path, '')
+    stop_points = TransXChangeLinesFromFiles([path]).stop_points['Test']
+    assert stop_points['A'].location == (529300.0, 181200.0)
+
+    mode = bus_mode(path)
+    assert mode.lines['Test'].links[0].distance == 1000.0
+    assert np.allclose(NetworkArrays.from_modes([mode])['link_distance'], [1000.0])
+
+
+def test_streaming_lowers_peak_memory(tmp_path):
+    path = tmp_path / 'journeys.xml'
+    path.write_text(DOCUMENT.format(
+        stops=''.join(STOP.format(x, *LOCATIONS[x]) for x in 'AB'),
+        profile='',
+        journeys=''.join(JOURNEY.format('VJ{}'.format(k), '', '07:00:00') for k in range(2000))))
+
+    peaks, records = [], []
+    for streaming in (False, True):
+        tracemalloc.start()
+        records.append(TransXChangeFile(str(path), streaming=streaming).records)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    assert len(records[1].vehicle_journeys) == len(records[0].vehicle_journeys) == 2000
+    assert peaks[1] < peaks[0] / 2
+
+
+def summary(lines):
+    return [(line.name, [(p.id, [s.id for s in p.stops], list(p.run_times), list(p.departures),
+                          list(p.trip_ids)) for p in line.patterns],
+             sorted((s.id, s.location) for s in line.stops.values()))
+            for line in lines]
+
+
+def test_pooled_reading_matches_serial(tmp_path):
+    paths = []
+    for k, profile in enumerate((WEEKDAYS, '', SUNDAY)):
+        (tmp_path / str(k)).mkdir()
+        paths.append(write(tmp_path / str(k), profile))
+
+    serial = TransXChangeLinesFromFiles(paths, day='Sunday').network
+    pooled = TransXChangeLinesFromFiles(paths, day='Sunday', workers=2).network
+    assert summary(pooled) == summary(serial)
+    assert len(serial) == 1